@@ -0,0 +1,118 @@
+"""
+Times the placement engine of two versions of server.py on the same random
+manifest: end to end (calculate_placement) and, where the version has one,
+the solve phase alone with its peak memory.
+
+    python benchmarks/placement.py                          # 9ebe448^ against 9ebe448
+    python benchmarks/placement.py --after WORKTREE         # against the working tree
+    python benchmarks/placement.py --items 20000 --containers 2000
+
+Revisions are read with git show, so run it from inside the repository.
+"""
+import argparse
+import copy
+import importlib.util
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKTREE = 'WORKTREE'
+
+
+def load_server(revision):
+    # A private copy of server.py at the revision; importing it opens no database
+    if revision == WORKTREE:
+        path = os.path.join(BACKEND_DIR, 'server.py')
+    else:
+        source = subprocess.run(
+            ['git', 'show', f"{revision}:Backend/server.py"], cwd=BACKEND_DIR, check=True, capture_output=True
+        ).stdout
+        handle, path = tempfile.mkstemp(suffix='.py')
+        with os.fdopen(handle, 'wb') as copy_file:
+            copy_file.write(source)
+    os.environ.setdefault('STORAGE_BACKEND', 'sqlite')
+    name = f"server_{revision.replace('^', '_parent').replace('~', '_')}"
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        if revision != WORKTREE:
+            os.remove(path)
+    return module
+
+
+def manifest(num_items, num_containers, zones, seed):
+    rng = random.Random(seed)
+    zone_names = [f"Zone {n}" for n in range(zones)]
+    containers = [
+        {
+            'containerId': f"c{n}", 'zone': zone_names[n % zones],
+            'width': rng.randint(50, 200), 'depth': rng.randint(50, 200), 'height': rng.randint(50, 200)
+        }
+        for n in range(num_containers)
+    ]
+    items = [
+        {
+            'itemId': f"i{n}", 'name': f"Item {n}",
+            'width': rng.randint(5, 40), 'depth': rng.randint(5, 40), 'height': rng.randint(5, 40),
+            'priority': rng.randint(1, 100), 'preferredZone': rng.choice(zone_names)
+        }
+        for n in range(num_items)
+    ]
+    return containers, items
+
+
+def measure(run, prepare):
+    # Wall time from one run, peak traced memory from a second one
+    arguments = prepare()
+    started = time.perf_counter()
+    run(*arguments)
+    elapsed = time.perf_counter() - started
+
+    arguments = prepare()
+    tracemalloc.start()
+    run(*arguments)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def benchmark(server, containers, items):
+    # The older engine sorts and annotates its inputs, so every run gets fresh copies
+    results = {'end to end': measure(
+        lambda c, i: server.calculate_placement(c, i), lambda: (copy.deepcopy(containers), copy.deepcopy(items))
+    )}
+    if hasattr(server, 'solve_placement'):
+        def prepare():
+            table = server.ContainerTable(copy.deepcopy(containers))
+            return table, [table.make_item(item) for item in items]
+        results['solve phase'] = measure(server.solve_placement, prepare)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--before', default='9ebe448^')
+    parser.add_argument('--after', default='9ebe448')
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--containers', type=int, default=100)
+    parser.add_argument('--zones', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    containers, items = manifest(args.items, args.containers, args.zones, args.seed)
+    print(f"{args.items} items / {args.containers} containers / {args.zones} zones, Python {sys.version.split()[0]}")
+    for revision in (args.before, args.after):
+        for phase, (elapsed, peak) in benchmark(load_server(revision), containers, items).items():
+            print(f"  {revision:>12}  {phase:<11} {elapsed:8.2f}s  {peak / 2 ** 20:8.1f} MB peak")
+
+
+if __name__ == '__main__':
+    main()
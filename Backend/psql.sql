@@ -31,6 +31,12 @@ CREATE TABLE items (
     is_waste BOOLEAN DEFAULT FALSE -- Whether the item is marked as waste
 );
 
+-- Upcoming expiry events, loaded once into the in-process expiry index
+CREATE INDEX idx_items_expiry ON items (expiry_date) WHERE is_waste = FALSE AND expiry_date IS NOT NULL;
+-- Keyset-paginated listings, optionally filtered by zone
+CREATE INDEX idx_items_listing ON items (is_waste, priority DESC, name, item_id);
+CREATE INDEX idx_items_zone_listing ON items (current_zone, is_waste, priority DESC, name, item_id);
+
 
 CREATE TABLE containers (
     container_id VARCHAR(50) PRIMARY KEY, -- Unique identifier for the container
@@ -41,6 +47,8 @@ CREATE TABLE containers (
     available_volume NUMERIC NOT NULL -- Available volume in the container (cm³)
 );
 
+CREATE INDEX idx_containers_zone ON containers (zone, container_id);
+
 
 CREATE TABLE placements (
     placement_id SERIAL PRIMARY KEY, -- Unique identifier for the placement
@@ -51,6 +59,10 @@ CREATE TABLE placements (
     placed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP -- Timestamp when the item was placed
 );
 
+-- Latest placement per item and everything placed in a container
+CREATE INDEX idx_placements_item ON placements (item_id, placement_id);
+CREATE INDEX idx_placements_container ON placements (container_id);
+
 
 
 CREATE TABLE retrievals (
@@ -75,6 +87,23 @@ CREATE TABLE waste (
 
 
 
+CREATE TABLE item_usage_stats (
+    item_id VARCHAR(50) PRIMARY KEY REFERENCES items(item_id) ON DELETE CASCADE, -- Item the statistics describe
+    total_uses INTEGER NOT NULL DEFAULT 0, -- Uses recorded so far (retrievals and simulated use)
+    usage_rate NUMERIC NOT NULL DEFAULT 0, -- Exponentially decaying uses per day as of last_used_at
+    last_used_at TIMESTAMP NOT NULL, -- Time of the most recent use
+    remaining_uses INTEGER, -- Uses left after the most recent use (NULL when unlimited)
+    projected_depletion_date DATE GENERATED ALWAYS AS (
+        CASE WHEN remaining_uses IS NULL OR usage_rate <= 0 THEN NULL
+        ELSE last_used_at::date + CEIL(remaining_uses / usage_rate)::INTEGER END
+    ) STORED -- When the item runs out at the current rate
+);
+
+CREATE INDEX idx_usage_stats_depletion ON item_usage_stats (projected_depletion_date);
+
+
+
+
 CREATE TABLE return_plans (
     plan_id SERIAL PRIMARY KEY, -- Unique identifier for the return plan
     undocking_container_id VARCHAR(50) REFERENCES containers(container_id) ON DELETE SET NULL, -- Container used for undocking
@@ -87,16 +116,190 @@ CREATE TABLE return_plans (
 
 
 
+CREATE TABLE return_plan_items (
+    plan_id INTEGER REFERENCES return_plans(plan_id) ON DELETE CASCADE, -- Return plan the item belongs to
+    item_id VARCHAR(50) REFERENCES items(item_id) ON DELETE CASCADE, -- Waste item selected for return
+    PRIMARY KEY (plan_id, item_id)
+);
+
+
+
+CREATE TABLE undocked_items (
+    undocked_id SERIAL PRIMARY KEY, -- Unique identifier for the archive entry
+    plan_id INTEGER REFERENCES return_plans(plan_id) ON DELETE SET NULL, -- Return plan that removed the item
+    item_id VARCHAR(50) NOT NULL, -- Item that left the station (no FK, the item row is deleted)
+    name VARCHAR(100) NOT NULL, -- Name of the item
+    mass NUMERIC NOT NULL, -- Mass of the item (kg)
+    volume NUMERIC NOT NULL, -- Volume of the item (cm³)
+    container_id VARCHAR(50), -- Container the item was placed in, if any
+    undocked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP -- Timestamp of the undocking
+);
+
+
+
 CREATE TABLE logs (
-    log_id SERIAL PRIMARY KEY, -- Unique identifier for the log entry
+    log_id SERIAL, -- Unique identifier for the log entry
     action_type VARCHAR(50) NOT NULL, -- Type of action (e.g., "placement", "retrieval", "rearrangement", "disposal")
     item_id VARCHAR(50) REFERENCES items(item_id) ON DELETE SET NULL, -- Item involved in the action
     user_id VARCHAR(50), -- Astronaut who performed the action
     details TEXT, -- Additional details about the action
-    logged_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP -- Timestamp of the action
+    logged_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP, -- Timestamp of the action
+    PRIMARY KEY (log_id, logged_at) -- The partition key must be part of the primary key
+) PARTITION BY RANGE (logged_at); -- One partition per month, named logs_YYYY_MM
+
+-- Catches rows outside every monthly partition
+CREATE TABLE logs_default PARTITION OF logs DEFAULT;
+
+-- Partitions rotated out by the retention policy when archiving instead of dropping
+CREATE SCHEMA log_archive AUTHORIZATION cargo_admin;
+
+-- Creates the monthly partition starting at month_start if it does not exist yet
+CREATE OR REPLACE FUNCTION ensure_log_partition(month_start DATE) RETURNS VOID AS $$
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF logs FOR VALUES FROM (%L) TO (%L)',
+        'logs_' || to_char(month_start, 'YYYY_MM'),
+        month_start,
+        (month_start + INTERVAL '1 month')::date
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Detaches monthly partitions older than keep_months and archives or drops them
+CREATE OR REPLACE FUNCTION apply_log_retention(keep_months INTEGER, archive BOOLEAN) RETURNS INTEGER AS $$
+DECLARE
+    cutoff DATE := (date_trunc('month', CURRENT_DATE) - make_interval(months => keep_months))::date;
+    old_partition RECORD;
+    rotated INTEGER := 0;
+BEGIN
+    FOR old_partition IN
+        SELECT child.relname
+        FROM pg_inherits inh
+        JOIN pg_class child ON child.oid = inh.inhrelid
+        JOIN pg_class parent ON parent.oid = inh.inhparent
+        WHERE parent.relname = 'logs'
+        AND child.relname ~ '^logs_[0-9]{4}_[0-9]{2}$'
+        AND to_date(substring(child.relname from 6), 'YYYY_MM') < cutoff
+    LOOP
+        EXECUTE format('ALTER TABLE logs DETACH PARTITION %I', old_partition.relname);
+        IF archive THEN
+            EXECUTE format('ALTER TABLE %I SET SCHEMA log_archive', old_partition.relname);
+        ELSE
+            EXECUTE format('DROP TABLE %I', old_partition.relname);
+        END IF;
+        rotated := rotated + 1;
+    END LOOP;
+    RETURN rotated;
+END;
+$$ LANGUAGE plpgsql;
+
+
+
+CREATE TABLE log_daily_rollups (
+    day DATE NOT NULL, -- Day the actions were logged
+    action_type VARCHAR(50) NOT NULL, -- Type of action
+    user_id VARCHAR(50) NOT NULL DEFAULT '', -- Astronaut ('' when none)
+    item_id VARCHAR(50) NOT NULL DEFAULT '', -- Item ('' when none, no FK so counts outlive the item)
+    count BIGINT NOT NULL DEFAULT 0, -- Number of log entries
+    PRIMARY KEY (day, action_type, user_id, item_id)
+);
+
+-- Keeps log_daily_rollups current as log entries are written
+CREATE OR REPLACE FUNCTION rollup_log() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO log_daily_rollups (day, action_type, user_id, item_id, count)
+    VALUES (NEW.logged_at::date, NEW.action_type, COALESCE(NEW.user_id, ''), COALESCE(NEW.item_id, ''), 1)
+    ON CONFLICT (day, action_type, user_id, item_id)
+    DO UPDATE SET count = log_daily_rollups.count + 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER logs_rollup
+    AFTER INSERT ON logs
+    FOR EACH ROW EXECUTE FUNCTION rollup_log();
+
+
+
+-- Tells in-process read models which row changed; TG_ARGV[0] names the key column
+CREATE OR REPLACE FUNCTION notify_change() RETURNS TRIGGER AS $$
+DECLARE
+    changed RECORD;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed := OLD;
+    ELSE
+        changed := NEW;
+    END IF;
+    PERFORM pg_notify('cargo_changes', json_build_object(
+        'table', TG_TABLE_NAME,
+        'op', TG_OP,
+        'id', to_jsonb(changed) ->> TG_ARGV[0]
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER items_notify
+    AFTER INSERT OR UPDATE OR DELETE ON items
+    FOR EACH ROW EXECUTE FUNCTION notify_change('item_id');
+
+CREATE TRIGGER containers_notify
+    AFTER INSERT OR UPDATE OR DELETE ON containers
+    FOR EACH ROW EXECUTE FUNCTION notify_change('container_id');
+
+CREATE TRIGGER placements_notify
+    AFTER INSERT OR UPDATE OR DELETE ON placements
+    FOR EACH ROW EXECUTE FUNCTION notify_change('item_id');
+
+
+
+CREATE TABLE change_feed (
+    version BIGSERIAL PRIMARY KEY, -- Order in which the change was recorded
+    txid BIGINT NOT NULL DEFAULT txid_current(), -- Transaction that made the change; readers page by txid horizon
+    table_name VARCHAR(50) NOT NULL, -- Table that changed (items, containers, placements, waste)
+    row_key VARCHAR(50) NOT NULL, -- item_id, or container_id for containers
+    changed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP -- Timestamp of the change
 );
 
+CREATE INDEX idx_change_feed_txid ON change_feed (txid);
+
+-- Appends the changed row's key to change_feed; TG_ARGV[0] names the key column
+CREATE OR REPLACE FUNCTION record_change() RETURNS TRIGGER AS $$
+DECLARE
+    changed RECORD;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed := OLD;
+    ELSE
+        changed := NEW;
+    END IF;
+    INSERT INTO change_feed (table_name, row_key)
+    VALUES (TG_TABLE_NAME, to_jsonb(changed) ->> TG_ARGV[0]);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER items_change
+    AFTER INSERT OR UPDATE OR DELETE ON items
+    FOR EACH ROW EXECUTE FUNCTION record_change('item_id');
+
+CREATE TRIGGER containers_change
+    AFTER INSERT OR UPDATE OR DELETE ON containers
+    FOR EACH ROW EXECUTE FUNCTION record_change('container_id');
+
+CREATE TRIGGER placements_change
+    AFTER INSERT OR UPDATE OR DELETE ON placements
+    FOR EACH ROW EXECUTE FUNCTION record_change('item_id');
 
+CREATE TRIGGER waste_change
+    AFTER INSERT OR UPDATE OR DELETE ON waste
+    FOR EACH ROW EXECUTE FUNCTION record_change('item_id');
+
+
+
+ALTER TABLE IF EXISTS public.change_feed
+    OWNER TO cargo_admin;
 
 ALTER TABLE IF EXISTS public.containers
     OWNER TO cargo_admin;
@@ -104,9 +307,18 @@ ALTER TABLE IF EXISTS public.containers
 ALTER TABLE IF EXISTS public.items
     OWNER TO cargo_admin;
 
+ALTER TABLE IF EXISTS public.item_usage_stats
+    OWNER TO cargo_admin;
+
 ALTER TABLE IF EXISTS public.logs
     OWNER TO cargo_admin;
 
+ALTER TABLE IF EXISTS public.logs_default
+    OWNER TO cargo_admin;
+
+ALTER TABLE IF EXISTS public.log_daily_rollups
+    OWNER TO cargo_admin;
+
 ALTER TABLE IF EXISTS public.placements
     OWNER TO cargo_admin;
 
@@ -116,5 +328,11 @@ ALTER TABLE IF EXISTS public.retrievals
 ALTER TABLE IF EXISTS public.return_plans
     OWNER TO cargo_admin;
 
+ALTER TABLE IF EXISTS public.return_plan_items
+    OWNER TO cargo_admin;
+
+ALTER TABLE IF EXISTS public.undocked_items
+    OWNER TO cargo_admin;
+
 ALTER TABLE IF EXISTS public.waste
     OWNER TO cargo_admin;
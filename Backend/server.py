@@ -1,27 +1,389 @@
-from flask import Flask, request, jsonify, send_file
-from datetime import datetime
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context, make_response, g, has_request_context
+from datetime import datetime, timedelta, date
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import csv
+import io
+import itertools
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values as pg_execute_values
+import sqlite3
 import json
 import os
+import re
+import heapq
+import bisect
+import math
+import statistics
+import threading
+import select
+import functools
+import contextlib
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 from dotenv import load_dotenv
 from flask_cors import CORS
 import uuid
+import atexit
+import random
+import time
+import hashlib
+import base64
+from collections import defaultdict, OrderedDict
 
 load_dotenv()
 
 app = Flask(__name__)
 CORS(app)
 # Database connection
-def get_db_connection():
-    return psycopg2.connect(
-        host="localhost",
-        database="cargo_db",
-        user="cargo_admin",
-        password="admin",
-        port=5432
-    )
+# 'postgres' (default) or 'sqlite' for the embedded engine, which needs no server
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'postgres').lower()
+SQLITE_PATH = os.getenv('SQLITE_PATH', ':memory:')
+SQLITE_SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sqlite.sql')
+
+# Modules (shards): SHARDS="habitat=cargo_habitat,lab=cargo_lab" gives each module its
+# own database holding its items, containers, placements and logs. A target is a
+# Postgres database name, or a file path (':memory:<name>' in memory) with sqlite.
+# Without SHARDS there is one module, 'default', on cargo_db / SQLITE_PATH.
+def parse_shards(spec):
+    shards = {}
+    for entry in filter(None, (part.strip() for part in spec.split(','))):
+        module, _, target = entry.partition('=')
+        shards[module.strip()] = target.strip() or None
+    return shards or {'default': None}
+
+SHARDS = parse_shards(os.getenv('SHARDS', ''))
+DEFAULT_SHARD = next(iter(SHARDS))
+ALL_MODULES = 'all'
+
+shard_override = threading.local()
+
+def current_shard():
+    # Explicit override (workers, scatter-gather), else the request's module, else the default
+    shard = getattr(shard_override, 'name', None)
+    if shard is None and has_request_context():
+        shard = g.get('shard')
+    return shard or DEFAULT_SHARD
+
+@contextlib.contextmanager
+def using_shard(shard):
+    previous = getattr(shard_override, 'name', None)
+    shard_override.name = shard
+    try:
+        yield
+    finally:
+        shard_override.name = previous
+
+class ShardLocal:
+    # One instance of a per-database structure for each module, picked by current_shard()
+    def __init__(self, factory):
+        self.factory = factory
+        self.instances = {}
+        self.lock = threading.Lock()
+
+    def for_shard(self, shard):
+        with self.lock:
+            if shard not in self.instances:
+                self.instances[shard] = self.factory(shard)
+            return self.instances[shard]
+
+    def __getattr__(self, name):
+        return getattr(self.for_shard(current_shard()), name)
+
+_shard_pool = None
+
+def scatter(work, shards=None):
+    # Runs work(shard) against each module in parallel; results come back in module order
+    global _shard_pool
+    shards = list(shards if shards is not None else SHARDS)
+
+    def run(shard):
+        with using_shard(shard):
+            return work(shard)
+
+    if len(shards) <= 1:
+        return [run(shard) for shard in shards]
+    if _shard_pool is None:
+        _shard_pool = ThreadPoolExecutor(max_workers=len(SHARDS), thread_name_prefix='shard')
+    return list(_shard_pool.map(run, shards))
+
+def get_db_connection(shard=None):
+    target = SHARDS[shard or current_shard()]
+    if STORAGE_BACKEND == 'sqlite':
+        conn = SQLiteConnection.open(target or SQLITE_PATH)
+    else:
+        conn = psycopg2.connect(
+            host="localhost",
+            database=target or "cargo_db",
+            user="cargo_admin",
+            password="admin",
+            port=5432
+        )
+    if query_budget_mode() != 'off' and has_request_context():
+        return CountingConnection(conn)
+    return conn
+
+def execute_values(cur, sql, argslist, template=None, page_size=100, fetch=False):
+    # Multi-row VALUES for either backend
+    if isinstance(cur, (SQLiteCursor, CountingCursor)):
+        return cur.execute_values(sql, argslist, template, page_size, fetch)
+    return pg_execute_values(cur, sql, argslist, template=template, page_size=page_size, fetch=fetch)
+
+# Query budgets: statements per request are counted in 'warn' and 'strict' mode
+# (strict whenever app.testing is set) and checked against each route's @query_budget
+QUERY_BUDGET_MODE = os.getenv('QUERY_BUDGET_MODE', 'off').lower()
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+def query_budget_mode():
+    return 'strict' if app.testing else QUERY_BUDGET_MODE
+
+class CountingCursor:
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def execute(self, sql, params=None):
+        g.query_count = g.get('query_count', 0) + 1
+        return self.cursor.execute(sql, params)
+
+    def execute_values(self, sql, argslist, template=None, page_size=100, fetch=False):
+        # One batched statement at the call site, however many pages it is sent in
+        g.query_count = g.get('query_count', 0) + 1
+        return execute_values(self.cursor, sql, argslist, template, page_size, fetch)
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+class CountingConnection:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def cursor(self, *args, **kwargs):
+        return CountingCursor(self.conn.cursor(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+def query_budget(limit):
+    # Most statements a request may run, whatever the size of its input
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            g.query_count = 0
+            response = make_response(view(*args, **kwargs))
+            used = g.get('query_count', 0)
+            if used > limit:
+                message = f"{request.endpoint} ran {used} statements, budget is {limit}"
+                if query_budget_mode() == 'strict':
+                    raise QueryBudgetExceeded(message)
+                app.logger.warning("Query budget exceeded: %s", message)
+            # On the view's own response, so it travels with a coalesced body
+            response.headers['X-Query-Count'] = str(used)
+            return response
+        wrapper.query_budget = limit
+        return wrapper
+    return decorator
+
+def uncounted(cur):
+    # For housekeeping statements that are not part of the request's own work
+    return cur.cursor if isinstance(cur, CountingCursor) else cur
+
+@app.after_request
+def report_query_count(response):
+    if 'query_count' in g:
+        response.headers['X-Query-Count'] = str(g.query_count)
+    return response
+
+# Embedded backend: values round-trip as the types psycopg2 would return
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_converter('DATE', lambda raw: date.fromisoformat(raw.decode()[:10]))
+sqlite3.register_converter('TIMESTAMP', lambda raw: datetime.fromisoformat(raw.decode()))
+sqlite3.register_converter('BOOLEAN', lambda raw: raw not in (b'0', b''))
+sqlite3.register_converter('JSON', json.loads)
+
+def _values_alias(match):
+    # (VALUES %s) AS v(a, b) -> (SELECT column1 AS a, column2 AS b FROM (VALUES %s)) AS v
+    columns = [column.strip() for column in match.group(2).split(',')]
+    selected = ', '.join(f"column{i + 1} AS {column}" for i, column in enumerate(columns))
+    return f"(SELECT {selected} FROM (VALUES %s)) AS {match.group(1)}"
+
+class SQLiteCursor:
+    # Runs the handlers' Postgres SQL on sqlite by rewriting the few dialect differences
+    REWRITES = [
+        (re.compile(r"%s::timestamp\b"), "datetime(%s)"),
+        (re.compile(r"%s::date\b"), "date(%s)"),
+        (re.compile(r"CURRENT_DATE \+ %s"), "date('now', '+' || %s || ' days')"),
+        (re.compile(r"::\w+(\[\])?"), ""),
+        (re.compile(r"\bILIKE\b"), "LIKE"),
+        (re.compile(r"\bGREATEST\("), "MAX("),
+        (re.compile(r"\bLEAST\("), "MIN("),
+        (re.compile(r"EXTRACT\(EPOCH FROM ([\w.]+) - ([\w.]+)\)"), r"((julianday(\1) - julianday(\2)) * 86400)"),
+        (re.compile(r"\bFOR UPDATE\b"), ""),
+        (re.compile(r"\bjson_agg\("), "json_group_array("),
+        (re.compile(r"\bjson_build_object\("), "json_object("),
+        (re.compile(r"^(\s*UPDATE \w+) (?!SET\b)(\w+)"), r"\1 AS \2"),
+        (re.compile(r"\(VALUES %s\) AS (\w+)\(([^)]*)\)"), _values_alias),
+    ]
+
+    def __init__(self, cursor, as_dict, connection):
+        self.cursor = cursor
+        self.connection = connection
+        if as_dict:
+            cursor.row_factory = lambda cur, row: {column[0]: value for column, value in zip(cur.description, row)}
+
+    @classmethod
+    def translate(cls, sql):
+        for pattern, replacement in cls.REWRITES:
+            sql = pattern.sub(replacement, sql)
+        return sql
+
+    def _run(self, sql, params):
+        # %s -> ?, and "= ANY(%s)" with a list -> "IN (?, ?, ...)"
+        parts = sql.split('%s')
+        query = [parts[0]]
+        args = []
+        for value, part in zip(params or (), parts[1:]):
+            if query[-1].rstrip().endswith('ANY('):
+                query[-1] = re.sub(r"=\s*ANY\($", "IN (", query[-1].rstrip())
+                query.append(', '.join(['?'] * len(value)) or 'NULL')
+                args.extend(value)
+            else:
+                query.append('?')
+                args.append(value)
+            query.append(part)
+        self.connection.take_turn()
+        self.cursor.execute(''.join(query), args)
+
+    def execute(self, sql, params=None):
+        # sqlite has no row locks; FOR UPDATE takes the database write lock instead
+        self.connection.take_turn()
+        if 'FOR UPDATE' in sql and not self.cursor.connection.in_transaction:
+            self.cursor.execute("BEGIN IMMEDIATE")
+        self._run(self.translate(sql), params)
+
+    def execute_values(self, sql, argslist, template=None, page_size=100, fetch=False):
+        sql = self.translate(sql)
+        rows = list(argslist)
+        results = []
+        for start in range(0, len(rows), page_size):
+            page = rows[start:start + page_size]
+            row_template = self.translate(template) if template else '(' + ', '.join(['%s'] * len(page[0])) + ')'
+            self._run(
+                sql.replace('%s', ', '.join([row_template] * len(page)), 1),
+                [value for row in page for value in row]
+            )
+            if fetch:
+                results.extend(self.cursor.fetchall())
+        return results if fetch else None
+
+    def fetchone(self):
+        return self.cursor.fetchone()
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+    def fetchmany(self, size=None):
+        return self.cursor.fetchmany(size or self.cursor.arraysize)
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+    @property
+    def rowcount(self):
+        return self.cursor.rowcount
+
+    @property
+    def description(self):
+        return self.cursor.description
+
+    def close(self):
+        self.cursor.close()
+
+class SQLiteConnection:
+    """
+    Connection-shaped wrapper over sqlite3. With a ':memory:' path (optionally
+    ':memory:<name>', one database per name) every caller shares one in-process
+    database; with a file path each caller gets its own connection and the
+    data persists across restarts.
+    A shared connection has a single transaction, so its callers take turns:
+    a caller holds the database from its first statement until it commits,
+    rolls back or closes, and closing rolls back what it did not commit.
+    """
+    _shared = {}
+    _turns = {}
+    _schema_ready = set()
+    _lock = threading.Lock()
+
+    def __init__(self, db, turn=None):
+        self.db = db
+        self.turn = turn
+        self.holding = False
+
+    @property
+    def shared(self):
+        return self.turn is not None
+
+    def take_turn(self):
+        if self.turn is not None and not self.holding:
+            self.turn.acquire()
+            self.holding = True
+
+    def end_turn(self):
+        if self.holding:
+            self.holding = False
+            self.turn.release()
+
+    @classmethod
+    def _connect(cls, path):
+        in_memory = path.startswith(':memory:')
+        db = sqlite3.connect(':memory:' if in_memory else path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False, timeout=30)
+        db.execute("PRAGMA foreign_keys = ON")
+        db.create_function('EXP', 1, math.exp, deterministic=True)
+        if not in_memory:
+            db.execute("PRAGMA journal_mode = WAL")
+        if path not in cls._schema_ready:
+            with open(SQLITE_SCHEMA) as schema:
+                db.executescript(schema.read())
+            cls._schema_ready.add(path)
+        return db
+
+    @classmethod
+    def open(cls, path):
+        with cls._lock:
+            if not path.startswith(':memory:'):
+                return cls(cls._connect(path))
+            if path not in cls._shared:
+                cls._shared[path] = cls._connect(path)
+                cls._turns[path] = threading.RLock()
+            return cls(cls._shared[path], cls._turns[path])
+
+    def cursor(self, cursor_factory=None, **kwargs):
+        return SQLiteCursor(self.db.cursor(), cursor_factory is RealDictCursor, self)
+
+    def commit(self):
+        self.db.commit()
+        self.end_turn()
+
+    def rollback(self):
+        self.db.rollback()
+        self.end_turn()
+
+    def close(self):
+        if not self.shared:
+            self.db.close()
+        elif self.holding:
+            self.rollback()
+
+    def __del__(self):
+        # Handlers that return early without closing still give up their turn
+        with contextlib.suppress(Exception):
+            self.close()
+
 def calculate_retrieval_steps(item_id, container_id):
     # This is a simplified version - in a real implementation, you'd need to:
     # 1. Find all items in front of the target item in the container
@@ -39,7 +401,7 @@ def calculate_retrieval_steps(item_id, container_id):
     
     # Count items in front (with lower depth)
     cur.execute("""
-        SELECT COUNT(*) 
+        SELECT COUNT(*) AS count
         FROM placements 
         WHERE container_id = %s 
         AND (start_coordinates->>'depth')::float < %s
@@ -50,10 +412,32 @@ def calculate_retrieval_steps(item_id, container_id):
     conn.close()
     return steps
 
+# Log partitions: one per month, older ones archived or dropped by apply_log_retention
+LOG_RETENTION_MONTHS = int(os.getenv('LOG_RETENTION_MONTHS', 12))
+LOG_RETENTION_MODE = os.getenv('LOG_RETENTION_MODE', 'archive')
+# Month whose partitions are known to exist, per module database
+_log_partition_months = {}
+
+def ensure_log_partitions(cur):
+    # Runs once per month per process and module: create this and next month's partitions, rotate old ones
+    month = datetime.now().date().replace(day=1)
+    shard = current_shard()
+    if _log_partition_months.get(shard) == month or STORAGE_BACKEND != 'postgres':
+        return
+    # Once a month per module, so outside every route's query budget
+    cur = uncounted(cur)
+    cur.execute(
+        "SELECT ensure_log_partition(%s), ensure_log_partition((%s::date + INTERVAL '1 month')::date)",
+        (month, month)
+    )
+    cur.execute("SELECT apply_log_retention(%s, %s)", (LOG_RETENTION_MONTHS, LOG_RETENTION_MODE == 'archive'))
+    _log_partition_months[shard] = month
+
 # Helper functions
 def log_action(action_type, item_id=None, user_id=None, details=None):
     conn = get_db_connection()
     cur = conn.cursor()
+    ensure_log_partitions(cur)
     cur.execute(
         "INSERT INTO logs (action_type, item_id, user_id, details) VALUES (%s, %s, %s, %s)",
         (action_type, item_id, user_id, details)
@@ -61,161 +445,1261 @@ def log_action(action_type, item_id=None, user_id=None, details=None):
     conn.commit()
     cur.close()
     conn.close()
-def _get_next_position(container, item):
+class PlacementItem:
+    # Dimensions parsed once; the preferred zone is interned to an integer id
+    __slots__ = ('item_id', 'name', 'width', 'depth', 'height', 'volume', 'priority', 'zone', 'fit')
+
+    def __init__(self, item, zone):
+        self.item_id = item['itemId']
+        self.name = item['name']
+        self.width = float(item['width'])
+        self.depth = float(item['depth'])
+        self.height = float(item['height'])
+        self.volume = self.width * self.depth * self.height
+        self.priority = int(item['priority'])
+        self.zone = zone
+        # Sorted dimensions, compared against sorted free slots in ContainerTable.place
+        self.fit = tuple(dimension - 1e-9 for dimension in sorted((self.width, self.depth, self.height)))
+
+class CapacityIndex:
+    """
+    Capacity index over one zone's containers, in the zone's own order.
+    A max segment tree answers first-fit (leftmost slot with capacity >= need)
+    and a sorted key list answers best-fit (smallest capacity >= need), both in
+    O(log n). update() keeps both current as space is consumed or freed.
+    """
+    def __init__(self, capacities=()):
+        self.capacity = []
+        self.keys = []
+        self.size = 1
+        self.tree = [-math.inf, -math.inf]
+        for capacity in capacities:
+            self.append(capacity)
+
+    def __len__(self):
+        return len(self.capacity)
+
+    def clone(self):
+        other = CapacityIndex.__new__(CapacityIndex)
+        other.capacity = list(self.capacity)
+        other.keys = list(self.keys)
+        other.size = self.size
+        other.tree = list(self.tree)
+        return other
+
+    def append(self, capacity):
+        slot = len(self.capacity)
+        self.capacity.append(capacity)
+        if slot == self.size:
+            self._grow()
+        self._set(slot, capacity)
+        bisect.insort(self.keys, (capacity, slot))
+        return slot
+
+    def update(self, slot, capacity):
+        old = self.capacity[slot]
+        if old == capacity:
+            return
+        del self.keys[bisect.bisect_left(self.keys, (old, slot))]
+        bisect.insort(self.keys, (capacity, slot))
+        self.capacity[slot] = capacity
+        self._set(slot, capacity)
+
+    def _grow(self):
+        self.size *= 2
+        tree = [-math.inf] * (2 * self.size)
+        tree[self.size:self.size + len(self.capacity)] = self.capacity
+        for node in range(self.size - 1, 0, -1):
+            tree[node] = max(tree[2 * node], tree[2 * node + 1])
+        self.tree = tree
+
+    def _set(self, slot, capacity):
+        tree = self.tree
+        node = slot + self.size
+        tree[node] = capacity
+        node //= 2
+        while node:
+            best = max(tree[2 * node], tree[2 * node + 1])
+            if tree[node] == best:
+                break  # Ancestors are unchanged too
+            tree[node] = best
+            node //= 2
+
+    def first_fit(self, need):
+        # Leftmost slot with enough capacity, or None
+        tree = self.tree
+        if tree[1] < need:
+            return None
+        node = 1
+        while node < self.size:
+            node = 2 * node if tree[2 * node] >= need else 2 * node + 1
+        return node - self.size
+
+    def best_fit(self, need):
+        # Slot with the least capacity that is still enough, or None
+        position = bisect.bisect_left(self.keys, (need, -1))
+        return self.keys[position][1] if position < len(self.keys) else None
+
+# The six axis-aligned orientations of an item, as permutations of (width, depth, height)
+ORIENTATIONS = ((0, 1, 2), (0, 2, 1), (1, 0, 2), (1, 2, 0), (2, 0, 1), (2, 1, 0))
+
+class ContainerTable:
+    """
+    Struct-of-arrays view of the containers handed to the placement engine.
+    Row i of every column describes the same container. Placement is the same
+    simplified 3D bin-packing as before: items are stacked side by side along
+    the width, so the free slot of a container is (width - cursor, depth, height).
+
+    Each zone also keeps a (3, n) matrix of its free slots with the dimensions
+    sorted. Some orientation of an item fits a slot exactly when the item's
+    sorted dimensions are all <= the slot's sorted dimensions, so one vectorized
+    comparison checks all six orientations against every container in the zone.
+    A CapacityIndex per zone, keyed on free-slot volume, skips the containers
+    at the front of the zone that are already too full before that comparison.
+    """
+    COLUMNS = ('zones', 'zone_index', 'width', 'depth', 'height', 'remaining', 'cursor')
+
+    def __init__(self, containers=()):
+        self.ids = []
+        self.zones = np.zeros(16, dtype=np.int32)
+        self.zone_index = np.zeros(16, dtype=np.intp)
+        self.width = np.zeros(16)
+        self.depth = np.zeros(16)
+        self.height = np.zeros(16)
+        self.remaining = np.zeros(16)
+        self.cursor = np.zeros(16)
+        self.zone_ids = {}
+        self.zone_names = []
+        self.by_zone = []
+        self.zone_free = []
+        self.capacity_index = []
+        for container in containers:
+            self.add(container)
+
+    def clone(self):
+        # Independent copy, e.g. one per forecast trajectory, without re-adding every container
+        other = ContainerTable.__new__(ContainerTable)
+        for column in self.COLUMNS:
+            setattr(other, column, getattr(self, column).copy())
+        other.ids = list(self.ids)
+        other.zone_ids = dict(self.zone_ids)
+        other.zone_names = list(self.zone_names)
+        other.by_zone = [list(rows) for rows in self.by_zone]
+        other.zone_free = [None if free is None else free.copy() for free in self.zone_free]
+        other.capacity_index = [index.clone() for index in self.capacity_index]
+        return other
+
+    def intern_zone(self, zone):
+        zone_id = self.zone_ids.get(zone)
+        if zone_id is None:
+            zone_id = self.zone_ids[zone] = len(self.zone_names)
+            self.zone_names.append(zone)
+            self.by_zone.append([])
+            self.zone_free.append(None)
+            self.capacity_index.append(CapacityIndex())
+        return zone_id
+
+    def add(self, container):
+        row = len(self.ids)
+        if row == len(self.width):
+            # Grow every column geometrically
+            for column in self.COLUMNS:
+                values = getattr(self, column)
+                setattr(self, column, np.concatenate((values, np.zeros_like(values))))
+
+        zone_id = self.intern_zone(container['zone'])
+        width, depth, height = float(container['width']), float(container['depth']), float(container['height'])
+        # Stored containers start stacking after the width their current items use
+        used_width = min(float(container.get('usedWidth') or 0.0), width)
+        self.ids.append(container['containerId'])
+        self.zones[row] = zone_id
+        self.zone_index[row] = len(self.by_zone[zone_id])
+        self.width[row] = width
+        self.depth[row] = depth
+        self.height[row] = height
+        self.remaining[row] = (width - used_width) * depth * height
+        self.cursor[row] = used_width
+        self.by_zone[zone_id].append(row)
+        self.zone_free[zone_id] = None  # Rebuilt on the next fit check
+        self.capacity_index[zone_id].append((width - used_width) * depth * height)
+        return row
+
+    def make_item(self, item):
+        return PlacementItem(item, self.intern_zone(item['preferredZone']))
+
+    def capacity(self, row):
+        return self.width[row] * self.depth[row] * self.height[row]
+
+    def occupy(self, row, width, volume):
+        # Move the cursor of one container and refresh its free slot
+        self.cursor[row] += width
+        self.remaining[row] -= volume
+        self._refresh(row)
+
+    def release(self, row, width, volume):
+        self.cursor[row] -= width
+        self.remaining[row] += volume
+        self._refresh(row)
+
+    def restore(self, row, cursor, remaining):
+        self.cursor[row] = cursor
+        self.remaining[row] = remaining
+        self._refresh(row)
+
+    def _refresh(self, row):
+        zone_id, slot = self.zones[row], self.zone_index[row]
+        slot_width = self.width[row] - self.cursor[row]
+        self.capacity_index[zone_id].update(slot, slot_width * self.depth[row] * self.height[row])
+        free = self.zone_free[zone_id]
+        if free is not None:
+            free[:, slot] = sorted((slot_width, self.depth[row], self.height[row]))
+
+    def free_slots(self, zone_id):
+        free = self.zone_free[zone_id]
+        if free is None:
+            rows = np.array(self.by_zone[zone_id], dtype=np.intp)
+            free = np.stack((self.width[rows] - self.cursor[rows], self.depth[rows], self.height[rows]))
+            free = self.zone_free[zone_id] = np.ascontiguousarray(np.sort(free, axis=0).reshape(3, -1))
+        return free
+
+    def candidates(self, dims, zone_id, start=0):
+        # Mask over the zone's rows from `start` whose free slot takes the item in some
+        # orientation. A slot that fits geometrically always has the volume left, since
+        # every stacked item uses at most its width times the container's depth and height.
+        free = self.free_slots(zone_id)[:, start:]
+        return (free[0] >= dims[0]) & (free[1] >= dims[1]) & (free[2] >= dims[2])
+
+    def orient(self, item, row):
+        # Of the orientations that fit, use the one that consumes the least width
+        dims = (item.width, item.depth, item.height)
+        free = (self.width[row] - self.cursor[row] + 1e-9, self.depth[row] + 1e-9, self.height[row] + 1e-9)
+        return min(
+            (dims[a], dims[b], dims[c]) for a, b, c in ORIENTATIONS
+            if dims[a] <= free[0] and dims[b] <= free[1] and dims[c] <= free[2]
+        )
+
+    def place(self, item):
+        # Try preferred zone first, then the others in the order they were seen
+        zone_order = [item.zone] + [zone_id for zone_id in range(len(self.by_zone)) if zone_id != item.zone]
+        dims = item.fit
+
+        for zone_id in zone_order:
+            # Skip straight to the first container with enough free-slot volume
+            start = self.capacity_index[zone_id].first_fit(item.volume - 1e-9)
+            if start is None:
+                continue
+            fits = self.candidates(dims, zone_id, start)
+            index = int(fits.argmax())
+            if not fits[index]:
+                continue
+
+            # First container in the zone that fits
+            row = self.by_zone[zone_id][start + index]
+            width, depth, height = self.orient(item, row)
+            start = float(self.cursor[row])
+            self.occupy(row, width, item.volume)
+            return row, start, width, depth, height
+
+        return None
+
+    def materialize(self, item, slot):
+        # Build the API response shape for one solved item
+        if slot is None:
+            return {
+                "itemId": item.item_id,
+                "name": item.name,
+                "retrievalSteps": []
+            }
+
+        row, start, width, depth, height = slot
+        return {
+            "itemId": item.item_id,
+            "name": item.name,
+            "containerId": self.ids[row],
+            "zone": self.zone_names[self.zones[row]],
+            "position": {
+                "startCoordinates": {"width": start, "depth": 0, "height": 0},
+                "endCoordinates": {"width": start + width, "depth": depth, "height": height}
+            },
+            "retrievalSteps": [
+                {
+                    "step": 1,
+                    "action": "retrieve",
+                    "itemId": item.item_id,
+                    "itemName": item.name
+                }
+            ]
+        }
+
+def sort_for_placement(records):
+    # Sort items by priority descending and volume descending
+    records.sort(key=lambda record: (-record.priority, -record.volume))
+
+def solve_placement(table, records):
+    sort_for_placement(records)
+    return [(record, table.place(record)) for record in records]
+
+class PlacementSolution:
     """
-    Simplified 3D bin-packing: we try to place item at (0,0,0) if no previous,
-    or at the end of last placed item's end coordinate in a row-wise manner.
+    Mutable placement state for the anytime improvement phase. Each container
+    row keeps its (item, oriented dimensions) entries in stacking order; start
+    positions are derived from the running width when the solution is
+    materialized, so items can be pulled out of the middle of a row without
+    invalidating the others.
     """
-    width, depth, height = float(item['width']), float(item['depth']), float(item['height'])
-    container_w, container_d, container_h = float(container['width']), float(container['depth']), float(container['height'])
-    occupied = container['occupied_positions']
-
-    if not occupied:
-        return (
-            {"width": 0, "depth": 0, "height": 0},
-            {"width": width, "depth": depth, "height": height}
+    def __init__(self, table, solved):
+        self.table = table
+        self.order = [record for record, slot in solved]
+        self.rows = [[] for _ in table.ids]
+        self.unplaced = []
+        for record, slot in solved:
+            if slot is None:
+                self.unplaced.append(record)
+            else:
+                self.rows[slot[0]].append((record, slot[2:]))
+        self.saved = None
+
+    def hit(self, record, row):
+        return 1 if self.table.zones[row] == record.zone else 0
+
+    def _touch(self, row):
+        # Remember a row the first time an iteration changes it
+        if row not in self.saved:
+            self.saved[row] = (list(self.rows[row]), self.table.cursor[row], self.table.remaining[row])
+
+    def _remove(self, row, entry):
+        self._touch(row)
+        self.rows[row].remove(entry)
+        self.table.release(row, entry[1][0], entry[0].volume)
+
+    def ruin_and_recreate(self, rng):
+        # Returns the (priority, preferred-zone hits, volume) gain of the move
+        table = self.table
+        self.saved = {}
+        gain = [0, 0, 0.0]
+
+        # Ruin: empty a few containers plus items spilled out of those containers' zones
+        ruined = rng.sample(range(len(table.ids)), min(len(table.ids), rng.randint(1, 3)))
+        ruined_zones = {table.zones[row] for row in ruined}
+        pool = []
+        for row in ruined:
+            for entry in list(self.rows[row]):
+                self._remove(row, entry)
+                pool.append((entry[0], row))
+        for row, entries in enumerate(self.rows):
+            if table.zones[row] in ruined_zones:
+                continue
+            for entry in [entry for entry in entries if entry[0].zone in ruined_zones]:
+                self._remove(row, entry)
+                pool.append((entry[0], row))
+        for record, row in pool:
+            gain[0] -= record.priority
+            gain[1] -= self.hit(record, row)
+            gain[2] -= record.volume
+
+        # Recreate: noisy greedy order over the freed items and the best unplaced ones
+        candidates = [record for record, row in pool] + self.unplaced[:max(len(pool), 1) * 4]
+        candidates.sort(key=lambda record: (-record.priority - rng.random() * 10, -record.volume))
+        placed = set()
+        for record in candidates:
+            slot = table.place(record)
+            if slot is not None:
+                row = slot[0]
+                self._touch(row)
+                self.rows[row].append((record, slot[2:]))
+                placed.add(record.item_id)
+                gain[0] += record.priority
+                gain[1] += self.hit(record, row)
+                gain[2] += record.volume
+
+        self.unplaced_before = self.unplaced
+        self.unplaced = sorted(
+            [record for record in self.unplaced if record.item_id not in placed] +
+            [record for record, row in pool if record.item_id not in placed],
+            key=lambda record: (-record.priority, -record.volume)
         )
+        return (gain[0], gain[1], round(gain[2], 6))
 
-    # Simple greedy placement heuristic — stack next to last if space allows
-    last_end = occupied[-1][1]
-    new_start = {
-        "width": float(last_end["width"]),
-        "depth": 0,
-        "height": 0
-    }
-    new_end = {
-        "width": new_start["width"] + width,
-        "depth": depth,
-        "height": height
+    def undo(self):
+        for row, (records, cursor, remaining) in self.saved.items():
+            self.rows[row] = records
+            self.table.restore(row, cursor, remaining)
+        self.unplaced = self.unplaced_before
+
+    def slots(self):
+        slots = {}
+        for row, entries in enumerate(self.rows):
+            start = 0.0
+            for record, dims in entries:
+                slots[record.item_id] = (row, start) + tuple(dims)
+                start += dims[0]
+        return [(record, slots.get(record.item_id)) for record in self.order]
+
+def improve_placement(table, solved, deadline, seed=None, stop=None):
+    # Anytime ruin-and-recreate: only non-worsening moves are kept, so the
+    # current solution is always the best one found when the deadline hits
+    solution = PlacementSolution(table, solved)
+    rng = random.Random(seed)
+    iterations = 0
+    if table.ids:
+        while time.monotonic() < deadline and not (stop and stop()):
+            iterations += 1
+            if solution.ruin_and_recreate(rng) < (0, 0, 0.0):
+                solution.undo()
+    return solution.slots(), iterations
+
+def placement_metrics(table, solved, iterations=0):
+    placed = [(record, slot) for record, slot in solved if slot is not None]
+    capacity = float(sum(table.capacity(row) for row in range(len(table.ids))))
+    hits = sum(1 for record, slot in placed if table.zones[slot[0]] == record.zone)
+    return {
+        "fillRatio": sum(record.volume for record, slot in placed) / capacity if capacity else 0,
+        "preferredZoneHitRate": hits / len(placed) if placed else 0,
+        "unplacedCount": len(solved) - len(placed),
+        "iterations": iterations
     }
 
-    if (new_end["width"] <= container_w and
-        new_end["depth"] <= container_d and
-        new_end["height"] <= container_h):
-        return (new_start, new_end)
+PLAN_CACHE_BYTES = int(os.getenv('PLAN_CACHE_BYTES', 64 * 1024 * 1024))
+PLAN_CACHE_MAX_CHANGE = float(os.getenv('PLAN_CACHE_MAX_CHANGE', 0.2))
 
-    return None  # Can't place (naive fallback)
+def content_hash(value):
+    # Canonical JSON, so key order and whitespace in the payload don't matter
+    return hashlib.sha256(json.dumps(value, sort_keys=True, separators=(',', ':'), default=str).encode()).hexdigest()
 
-def calculate_placement(containers, items):
-    from collections import defaultdict
-    import heapq
+class PlanCache:
+    """
+    Content-addressed greedy placement plans, evicted least recently used first
+    once their estimated size passes max_bytes. A plan is keyed by the container
+    hash plus the hash of its sorted item hashes; deadline and seed only affect
+    the improvement phase, which is never cached. Plans for the same containers
+    are also indexed so a near-repeat manifest can find the closest one.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.by_containers = defaultdict(set)
+        self.lock = threading.Lock()
 
-    # Preprocess containers into zone-based buckets
-    zone_containers = defaultdict(list)
-    container_space_map = {}
-    
-    # print(items)
-    # print(containers)
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
 
-    for container in containers:
-        container_id = container['containerId']
-        zone = container['zone']
-        capacity = float(container['width']) * float(container['depth']) * float(container['height'])
-        container['remaining_volume'] = capacity
-        container['occupied_positions'] = []  # 3D tracking (simplified for API)
-        zone_containers[zone].append(container)
-        container_space_map[container_id] = container
+    def nearest(self, containers_key, digests, max_change):
+        # Cached plan for the same containers whose item set differs the least
+        best, best_change = None, max_change * len(digests)
+        with self.lock:
+            for key in self.by_containers.get(containers_key, ()):
+                entry = self.entries[key]
+                change = len(digests ^ entry['digests'])
+                if change <= best_change:
+                    best, best_change = entry, change
+            if best is not None:
+                self.entries.move_to_end(best['key'])
+        return best
 
-    # Sort items by priority descending and volume descending
-    def item_volume(item):
-        return float(item['width']) * float(item['depth']) * float(item['height'])
-    
-    items.sort(key=lambda x: (-x['priority'], -item_volume(x)))
-
-    placements = []
-    rearrangements = []
-
-    for item in items:
-        item_volume_val = item_volume(item)
-        placed = False
-
-        # Try preferred zone first
-        preferred_zone = item['preferredZone']
-        zones_to_check = [preferred_zone] + [z for z in zone_containers if z != preferred_zone]
-
-        for zone in zones_to_check:
-            for container in zone_containers[zone]:
-                if container['remaining_volume'] >= item_volume_val:
-                    # Place item (naive position placement from origin)
-                    pos = _get_next_position(container, item)
-                    if pos is not None:
-                        start, end = pos
-                        container['remaining_volume'] -= item_volume_val
-                        container['occupied_positions'].append((start, end))
-
-                        placements.append({
-                            # "success": True,
-                            # "found": True,
-                            # "item": {
-                            #     "itemId": item['itemId'],
-                            #     "name": item['name'],
-                            #     "containerId": container['containerId'],
-                            #     "zone": container['zone'],
-                            #     "position": {
-                            #         "startCoordinates": start,
-                            #         "endCoordinates": end
-                            #     }
-                            # },
-                          
-                            "itemId": item['itemId'],
-                            "name": item['name'],
-                            "containerId": container['containerId'],
-                            "zone": container['zone'],
-                            "position": {
-                                "startCoordinates": start,
-                                "endCoordinates": end
-                            },
-                    
-                            "retrievalSteps": [
-                                {
-                                    "step": 1,
-                                    "action": "retrieve",
-                                    "itemId": item['itemId'],
-                                    "itemName": item['name']
-                                }
-                            ]
-                        })
-                        placed = True
-                        break
-            if placed:
-                break
+    def put(self, entry):
+        entry['size'] = len(json.dumps([entry['result'], entry['layout']], default=str))
+        if entry['size'] > self.max_bytes:
+            return
+        with self.lock:
+            self._drop(entry['key'])
+            self.entries[entry['key']] = entry
+            self.by_containers[entry['containers']].add(entry['key'])
+            self.size += entry['size']
+            while self.size > self.max_bytes:
+                self._drop(next(iter(self.entries)))
 
-        if not placed:
-            rearrangements.append(item['itemId'])
-            placements.append({
-                # "success": False,
-                # "found": False,
-                "itemId": item['itemId'],
-                "name": item['name'],
-                "retrievalSteps": []
-            })
+    def _drop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        self.size -= entry['size']
+        keys = self.by_containers[entry['containers']]
+        keys.discard(key)
+        if not keys:
+            del self.by_containers[entry['containers']]
+
+plan_cache = PlanCache(PLAN_CACHE_BYTES)
+
+def warm_start(table, records, digests, layout):
+    # Replay the cached rows for items that are unchanged, stacking them in their
+    # cached order, then place only the new or changed items around them
+    waiting = defaultdict(list)
+    for record in records:
+        waiting[digests[id(record)]].append(record)
+    rows = {container_id: row for row, container_id in enumerate(table.ids)}
+    slots = {}
+    for container_id, entries in layout.items():
+        row = rows[container_id]
+        for digest, (width, depth, height) in entries:
+            if not waiting.get(digest):
+                continue  # Removed from the manifest
+            record = waiting[digest].pop()
+            start = float(table.cursor[row])
+            table.occupy(row, width, record.volume)
+            slots[id(record)] = (row, start, width, depth, height)
     
-    return placements, rearrangements
+    changed = [record for record in records if id(record) not in slots]
+    for record, slot in solve_placement(table, changed):
+        slots[id(record)] = slot
+    sort_for_placement(records)
+    return [(record, slots[id(record)]) for record in records], len(records) - len(changed)
 
-def check_expired_items():
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+def plan_layout(table, solved, digests):
+    # Per container, the (item hash, oriented dimensions) entries in stacking order
+    layout = defaultdict(list)
+    for record, slot in sorted((entry for entry in solved if entry[1] is not None), key=lambda entry: (entry[1][0], entry[1][1])):
+        layout[table.ids[slot[0]]].append((digests[id(record)], slot[2:]))
+    return dict(layout)
+
+def calculate_placement(containers, items, deadline=None, seed=None, stop=None):
+    containers_key = content_hash(containers)
+    item_digests = [content_hash(item) for item in items]
+    key = containers_key + ':' + content_hash(sorted(item_digests))
+    
+    # Only greedy plans are cached; an exact repeat without a deadline is already known
+    cached = plan_cache.get(key)
+    if cached is not None and deadline is None:
+        placements, rearrangements, metrics = cached['result']
+        return list(placements), list(rearrangements), {**metrics, "cache": "hit", "reusedItems": len(placements)}
+    
+    table = ContainerTable(containers)
+    records = [table.make_item(item) for item in items]
+    digests = {id(record): digest for record, digest in zip(records, item_digests)}
+    
+    def result(solved, iterations=0):
+        # Results only become dicts here, at the API boundary
+        placements = [table.materialize(record, slot) for record, slot in solved]
+        rearrangements = [record.item_id for record, slot in solved if slot is None]
+        return placements, rearrangements, placement_metrics(table, solved, iterations)
+    
+    # An exact repeat replays its whole greedy layout, a near-repeat the unchanged part
+    near = cached
+    if near is None and items:
+        near = plan_cache.nearest(containers_key, frozenset(item_digests), PLAN_CACHE_MAX_CHANGE)
+    if near is not None:
+        solved, reused = warm_start(table, records, digests, near['layout'])
+    else:
+        solved, reused = solve_placement(table, records), 0
+    
+    placements, rearrangements, metrics = greedy = result(solved)
+    if cached is None:
+        plan_cache.put({
+            "key": key,
+            "containers": containers_key,
+            "digests": frozenset(item_digests),
+            "layout": plan_layout(table, solved, digests),
+            "result": greedy
+        })
     
-    # Mark expired items as waste
+    # The anytime phase runs on top of the greedy plan, whether it was cached or not
+    if deadline is not None:
+        placements, rearrangements, metrics = result(*improve_placement(table, solved, deadline, seed, stop))
+    status = "hit" if cached is not None else "warm" if near is not None else "miss"
+    return list(placements), list(rearrangements), {**metrics, "cache": status, "reusedItems": reused}
+
+def persist_placements(cur, placements):
+    # A fixed handful of statements per batch instead of a set per placement
+    placed = [placement for placement in placements if 'containerId' in placement]
+    if not placed:
+        return
+    # Items placed before give their volume back to the container they leave
+    cur.execute("""
+        UPDATE containers c
+        SET available_volume = LEAST(c.width * c.depth * c.height, c.available_volume + freed.volume)
+        FROM (
+            SELECT p.container_id, SUM(i.width * i.depth * i.height) AS volume
+            FROM placements p
+            JOIN items i ON i.item_id = p.item_id
+            WHERE p.item_id = ANY(%s)
+            AND p.placement_id = (SELECT MAX(q.placement_id) FROM placements q WHERE q.item_id = p.item_id)
+            GROUP BY p.container_id
+        ) freed
+        WHERE c.container_id = freed.container_id
+    """, ([placement['itemId'] for placement in placed],))
+    execute_values(
+        cur,
+        "INSERT INTO placements (item_id, container_id, start_coordinates, end_coordinates) VALUES %s",
+        [
+            (
+                placement['itemId'],
+                placement['containerId'],
+                json.dumps(placement['position']['startCoordinates']),
+                json.dumps(placement['position']['endCoordinates'])
+            )
+            for placement in placed
+        ],
+        template="(%s, %s, %s::json, %s::json)"
+    )
+    execute_values(
+        cur,
+        "UPDATE items SET current_zone = c.zone "
+        "FROM (VALUES %s) AS v(item_id, container_id) "
+        "JOIN containers c ON c.container_id = v.container_id "
+        "WHERE items.item_id = v.item_id",
+        [(placement['itemId'], placement['containerId']) for placement in placed]
+    )
+    used = defaultdict(float)
+    for placement in placed:
+        start, end = placement['position']['startCoordinates'], placement['position']['endCoordinates']
+        used[placement['containerId']] += math.prod(float(end[axis]) - float(start[axis]) for axis in ('width', 'depth', 'height'))
+    execute_values(
+        cur,
+        "UPDATE containers SET available_volume = containers.available_volume - v.volume "
+        "FROM (VALUES %s) AS v(container_id, volume) "
+        "WHERE containers.container_id = v.container_id",
+        sorted(used.items())
+    )
+
+def load_containers_for_placement(cur, container_ids=None):
+    # Streaming requests may omit containers; fall back to the stored ones,
+    # with the width their current items already take up
+    cur.execute("""
+        SELECT c.container_id AS "containerId", c.zone, c.width, c.depth, c.height,
+            COALESCE(MAX((p.end_coordinates->>'width')::float), 0) AS "usedWidth"
+        FROM containers c
+        LEFT JOIN placements p ON p.container_id = c.container_id
+            AND p.placement_id = (SELECT MAX(q.placement_id) FROM placements q WHERE q.item_id = p.item_id)
+    """ + ("WHERE c.container_id = ANY(%s)" if container_ids is not None else "") + """
+        GROUP BY c.container_id
+        ORDER BY c.zone, c.container_id
+    """, (container_ids,) if container_ids is not None else ())
+    return [dict(row) for row in cur.fetchall()]
+
+class ExpiryIndex:
+    """
+    Min-heap of upcoming expiry events for items that are not yet waste.
+    Entries are invalidated lazily: a popped (date, item_id) only counts if it
+    still matches the item's scheduled date, so reschedules and discards are O(log n).
+    Writes from this process update it directly; sync() applies the item
+    changes any process committed since the index's change feed version, so
+    several server processes can share a database.
+    """
+    def __init__(self):
+        self.heap = []
+        self.scheduled = {}
+        self.loaded = False
+        self.version = 0
+        self.lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        if self.loaded:
+            return
+        conn = get_db_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        # The horizon is read first, so the rows loaded are at least that new
+        self.version = change_horizon(cur)
+        cur.execute("""
+            SELECT item_id, expiry_date
+            FROM items
+            WHERE is_waste = FALSE AND expiry_date IS NOT NULL
+        """)
+        self.scheduled = {row['item_id']: row['expiry_date'] for row in cur.fetchall()}
+        self.heap = [(expiry_date, item_id) for item_id, expiry_date in self.scheduled.items()]
+        heapq.heapify(self.heap)
+        cur.close()
+        conn.close()
+        self.loaded = True
+
+    def sync(self, cur):
+        # Re-reads the items the change feed lists since the last load or sync
+        with self.lock:
+            if not self.loaded:
+                return  # The initial load reads everything
+            version, changed = changed_keys(cur, self.version)
+            if changed['items']:
+                cur.execute("""
+                    SELECT item_id, expiry_date, is_waste
+                    FROM items
+                    WHERE item_id = ANY(%s)
+                """, (list(changed['items']),))
+                rows = {row['item_id']: row for row in cur.fetchall()}
+                for item_id in changed['items']:
+                    row = rows.get(item_id)
+                    if row is None or row['is_waste'] or row['expiry_date'] is None:
+                        self.scheduled.pop(item_id, None)
+                    elif self.scheduled.get(item_id) != row['expiry_date']:
+                        self.scheduled[item_id] = row['expiry_date']
+                        heapq.heappush(self.heap, (row['expiry_date'], item_id))
+            self.version = version
+
+    def schedule(self, item_id, expiry_date):
+        with self.lock:
+            if not self.loaded:
+                return  # Picked up by the initial load
+            if expiry_date is None:
+                self.scheduled.pop(item_id, None)
+                return
+            if isinstance(expiry_date, str):
+                expiry_date = datetime.strptime(expiry_date, '%Y-%m-%d').date()
+            self.scheduled[item_id] = expiry_date
+            heapq.heappush(self.heap, (expiry_date, item_id))
+
+    def discard(self, item_id):
+        with self.lock:
+            self.scheduled.pop(item_id, None)
+
+    def invalidate(self):
+        with self.lock:
+            self.heap = []
+            self.scheduled = {}
+            self.loaded = False
+
+    def advance_to(self, date):
+        # Pop every item whose expiry date is before `date`
+        with self.lock:
+            self._ensure_loaded()
+            expired = []
+            while self.heap and self.heap[0][0] < date:
+                expiry_date, item_id = heapq.heappop(self.heap)
+                if self.scheduled.get(item_id) == expiry_date:
+                    del self.scheduled[item_id]
+                    expired.append(item_id)
+            return expired
+
+expiry_index = ShardLocal(lambda shard: ExpiryIndex())
+
+def mark_items_as_waste(cur, item_ids, reason):
+    # One UPDATE and one INSERT no matter how many items are affected
+    if not item_ids:
+        return
     cur.execute("""
         UPDATE items 
         SET is_waste = TRUE 
-        WHERE expiry_date < CURRENT_DATE AND is_waste = FALSE
-        RETURNING item_id
-    """)
-    expired_items = cur.fetchall()
-    
-    # Log the expired items
-    for item in expired_items:
-        cur.execute("""
-            INSERT INTO waste (item_id, reason) 
-            VALUES (%s, 'Expired')
-        """, (item['item_id'],))
+        WHERE item_id = ANY(%s)
+    """, (item_ids,))
+    execute_values(
+        cur,
+        "INSERT INTO waste (item_id, reason) VALUES %s",
+        [(item_id, reason) for item_id in item_ids]
+    )
+
+# Usage statistics: an exponentially decaying uses-per-day rate per item
+USAGE_RATE_WINDOW_DAYS = float(os.getenv('USAGE_RATE_WINDOW_DAYS', 7))
+
+def record_usage(cur, events):
+    """
+    Fold usage events (item_id, uses, used_at, remaining_uses) into item_usage_stats.
+    The rate is decayed to the newest event of each item here and to the stored
+    row in SQL, so a whole batch is one upsert and the stats never need a
+    replay of retrieval history.
+    """
+    folded = {}
+    for item_id, uses, used_at, remaining in events:
+        folded.setdefault(item_id, []).append((used_at, uses, remaining))
+
+    rows = []
+    for item_id, item_events in folded.items():
+        item_events.sort(key=lambda event: event[0])
+        last_used_at = item_events[-1][0]
+        rate = sum(
+            uses / USAGE_RATE_WINDOW_DAYS * math.exp(-(last_used_at - used_at).total_seconds() / 86400 / USAGE_RATE_WINDOW_DAYS)
+            for used_at, uses, remaining in item_events
+        )
+        rows.append((item_id, sum(event[1] for event in item_events), rate, last_used_at, item_events[-1][2]))
+
+    if not rows:
+        return
+    execute_values(cur, f"""
+        INSERT INTO item_usage_stats AS s (item_id, total_uses, usage_rate, last_used_at, remaining_uses)
+        VALUES %s
+        ON CONFLICT (item_id) DO UPDATE SET
+            total_uses = s.total_uses + EXCLUDED.total_uses,
+            usage_rate = s.usage_rate * EXP(
+                -GREATEST(EXTRACT(EPOCH FROM EXCLUDED.last_used_at - s.last_used_at), 0) / 86400 / {USAGE_RATE_WINDOW_DAYS}
+            ) + EXCLUDED.usage_rate,
+            last_used_at = GREATEST(s.last_used_at, EXCLUDED.last_used_at),
+            remaining_uses = EXCLUDED.remaining_uses
+    """, rows)
+
+def check_expired_items(as_of=None):
+    # Only items that crossed their expiry date since the last call are touched
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
     
-    conn.commit()
+    try:
+        expiry_index.sync(cur)
+        expired_items = expiry_index.advance_to(as_of or datetime.now().date())
+        mark_items_as_waste(cur, expired_items, 'Expired')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        expiry_index.invalidate()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+    return len(expired_items)
+
+# Dry-run simulation helpers
+SCENARIO_WORKERS = max(1, int(os.getenv('SCENARIO_WORKERS', min(4, os.cpu_count() or 1))))
+
+_scenario_pool = None
+_scenario_pool_lock = threading.Lock()
+
+def get_scenario_pool():
+    # Worker processes for dry-run scenarios and forecast chunks, started on first use
+    global _scenario_pool
+    with _scenario_pool_lock:
+        if _scenario_pool is None:
+            _scenario_pool = ProcessPoolExecutor(max_workers=SCENARIO_WORKERS)
+            atexit.register(shutdown_scenario_pool)
+        return _scenario_pool
+
+def shutdown_scenario_pool():
+    global _scenario_pool
+    with _scenario_pool_lock:
+        pool, _scenario_pool = _scenario_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def snapshot_inventory():
+    # Fork the live inventory into memory so scenarios never touch the database
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur.execute("""
+        SELECT item_id, name, expiry_date, usage_limit
+        FROM items
+        WHERE is_waste = FALSE
+    """)
+    snapshot = {row['item_id']: dict(row) for row in cur.fetchall()}
     cur.close()
     conn.close()
-    return len(expired_items)
+    return snapshot
+
+def simulate_scenario(snapshot, num_of_days, items_to_be_used_per_day, start_date):
+    # Same rules as simulate_day, replayed against a private copy of the snapshot
+    items = {item_id: dict(item) for item_id, item in snapshot.items()}
+    expiry_events = sorted(
+        (item['expiry_date'], item_id)
+        for item_id, item in items.items() if item['expiry_date']
+    )
+    next_event = 0
+    
+    changes = {
+        "itemsUsed": [],
+        "itemsExpired": [],
+        "itemsDepletedToday": []
+    }
+    
+    for day in range(num_of_days):
+        current_date = start_date + timedelta(days=day)
+        
+        # Walk the expiry events crossed today; depleted items are already gone
+        expired = 0
+        while next_event < len(expiry_events) and expiry_events[next_event][0] < current_date:
+            item_id = expiry_events[next_event][1]
+            next_event += 1
+            if items.pop(item_id, None) is not None:
+                expired += 1
+        if expired:
+            changes["itemsExpired"].append({
+                "day": day + 1,
+                "count": expired
+            })
+        
+        for item_usage in items_to_be_used_per_day:
+            item_id = item_usage['itemId']
+            uses = item_usage.get('uses', 1)
+            item = items.get(item_id)
+            
+            if item and item['usage_limit'] is not None:
+                new_usage_limit = item['usage_limit'] - uses
+                if new_usage_limit <= 0:
+                    del items[item_id]
+                    changes["itemsDepletedToday"].append({
+                        "day": day + 1,
+                        "itemId": item_id,
+                        "name": item['name']
+                    })
+                else:
+                    item['usage_limit'] = new_usage_limit
+                
+                changes["itemsUsed"].append({
+                    "day": day + 1,
+                    "itemId": item_id,
+                    "name": item['name'],
+                    "remainingUses": max(0, new_usage_limit)
+                })
+    
+    return changes
+
+def run_dry_simulation(data):
+    # Each usage schedule is an independent scenario over the same snapshot
+    scenarios = data.get('scenarios') or [{
+        "numOfDays": data.get('numOfDays', 1),
+        "itemsToBeUsedPerDay": data.get('itemsToBeUsedPerDay', [])
+    }]
+    snapshot = snapshot_inventory()
+    start_date = datetime.now().date()
+    
+    args = [
+        (snapshot,
+         scenario.get('numOfDays', data.get('numOfDays', 1)),
+         scenario.get('itemsToBeUsedPerDay', []),
+         start_date)
+        for scenario in scenarios
+    ]
+    
+    if len(args) == 1:
+        results = [simulate_scenario(*args[0])]
+    else:
+        results = list(get_scenario_pool().map(simulate_scenario, *zip(*args)))
+    
+    return [
+        {
+            "scenario": scenario.get('name', index + 1),
+            "daysSimulated": arg[1],
+            "changes": changes
+        }
+        for index, (scenario, arg, changes) in enumerate(zip(scenarios, args, results))
+    ]
+
+# In-process read model kept fresh through LISTEN/NOTIFY
+READ_MODEL_ENABLED = STORAGE_BACKEND == 'postgres' and os.getenv('READ_MODEL_ENABLED', 'true').lower() == 'true'
+READ_MODEL_MAX_STALENESS = float(os.getenv('READ_MODEL_MAX_STALENESS', 2.0))
+READ_MODEL_HEARTBEAT = 1.0
+
+ITEM_COLUMNS = """
+    item_id, name, width, depth, height, mass, priority, expiry_date,
+    usage_limit, preferred_zone, current_zone, is_waste
+"""
+CONTAINER_COLUMNS = """
+    container_id, zone, width, depth, height, available_volume,
+    width * depth * height AS total_volume
+"""
+LATEST_PLACEMENTS = """
+    SELECT DISTINCT ON (p.item_id) p.*, c.zone
+    FROM placements p
+    JOIN containers c ON p.container_id = c.container_id
+"""
+
+# Change feed: every write to items, containers, placements and waste appends a
+# change_feed row (see record_change in psql.sql). Clients hold a version and ask
+# for what changed since; the version is a transaction horizon, so a change from
+# a transaction that commits late is never skipped.
+CHANGE_FEED_MAX_DELTA = int(os.getenv('CHANGE_FEED_MAX_DELTA', 5000))
+CHANGE_FEED_POLL_INTERVAL = float(os.getenv('CHANGE_FEED_POLL_INTERVAL', 1.0))
+CHANGE_STREAM_KEEPALIVE = 15.0
+
+CHANGE_QUERIES = {
+    'items': f"SELECT {ITEM_COLUMNS} FROM items WHERE item_id = ANY(%s)",
+    'containers': f"SELECT {CONTAINER_COLUMNS} FROM containers WHERE container_id = ANY(%s)",
+    'placements': """
+        SELECT p.*, c.zone
+        FROM placements p
+        JOIN containers c ON p.container_id = c.container_id
+        WHERE p.item_id = ANY(%s)
+        AND p.placement_id = (SELECT MAX(q.placement_id) FROM placements q WHERE q.item_id = p.item_id)
+    """,
+    'waste': "SELECT item_id, reason, marked_at FROM waste WHERE item_id = ANY(%s) ORDER BY waste_id",
+}
+
+def change_horizon(cur):
+    # Every transaction with a txid below the horizon has finished
+    if STORAGE_BACKEND == 'sqlite':
+        cur.execute("SELECT COALESCE(MAX(txid), 0) + 1 AS horizon FROM change_feed")
+    else:
+        cur.execute("SELECT txid_snapshot_xmin(txid_current_snapshot()) AS horizon")
+    return int(cur.fetchone()['horizon'])
+
+def changed_keys(cur, since):
+    # Keys changed by transactions in [since, horizon), one entry per row however often it changed
+    horizon = change_horizon(cur)
+    cur.execute("""
+        SELECT DISTINCT table_name, row_key
+        FROM change_feed
+        WHERE txid >= %s AND txid < %s
+    """, (since, horizon))
+    changed = defaultdict(set)
+    for row in cur.fetchall():
+        changed[row['table_name']].add(row['row_key'])
+    return horizon, changed
+
+def read_changes(cur, since):
+    horizon, changed = changed_keys(cur, since)
+    if since > horizon:
+        # A version this feed never handed out, e.g. from before the database was restored
+        return {"version": horizon, "resync": True, "changes": []}
+    if sum(len(keys) for keys in changed.values()) > CHANGE_FEED_MAX_DELTA:
+        # Cheaper for the client to reload the listings than to apply this delta
+        return {"version": horizon, "resync": True, "changes": []}
+    
+    changes = []
+    for table, keys in changed.items():
+        cur.execute(CHANGE_QUERIES[table], (list(keys),))
+        key_column = 'container_id' if table == 'containers' else 'item_id'
+        rows = {row[key_column]: row for row in cur.fetchall()}
+        for key in sorted(keys):
+            changes.append({
+                "table": table,
+                "id": key,
+                "op": "upsert" if key in rows else "delete",
+                "row": rows.get(key)
+            })
+    return {"version": horizon, "resync": False, "changes": changes}
+
+class ReadModel:
+    """
+    In-memory copy of items, containers and each item's latest placement.
+    A background thread LISTENs on the cargo_changes channel (see notify_change
+    in psql.sql) to wake up early, then re-reads only the rows the change feed
+    lists since its version, so it is never ahead of that version. Readers use it while
+    the listener has checked in within READ_MODEL_MAX_STALENESS seconds and
+    fall back to querying Postgres directly otherwise.
+    """
+    def __init__(self):
+        self.items = {}
+        self.containers = {}
+        self.placements = {}
+        self.by_container = defaultdict(set)
+        self.cache = {}
+        self.lock = threading.RLock()
+        self.ready = False
+        self.last_sync = 0.0
+        self.version = 0
+        self.thread = None
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+    def fresh(self):
+        # Mirrors the default module only
+        return current_shard() == DEFAULT_SHARD and self.ready and time.monotonic() - self.last_sync <= READ_MODEL_MAX_STALENESS
+
+    def _run(self):
+        while True:
+            conn = None
+            try:
+                conn = get_db_connection()
+                conn.autocommit = True
+                cur = conn.cursor(cursor_factory=RealDictCursor)
+                # Listen first so nothing committed during the initial load is missed
+                cur.execute("LISTEN cargo_changes")
+                self._load(cur)
+                while True:
+                    if select.select([conn], [], [], READ_MODEL_HEARTBEAT) != ([], [], []):
+                        conn.poll()
+                        conn.notifies.clear()
+                    # Also runs on the heartbeat, which proves the connection is alive
+                    version, changed = changed_keys(cur, self.version)
+                    self._refresh(cur, changed)
+                    self.version = version
+                    self.last_sync = time.monotonic()
+            except Exception:
+                app.logger.exception("Read model listener disconnected")
+                self.ready = False
+                time.sleep(READ_MODEL_HEARTBEAT)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def _load(self, cur):
+        # The horizon is read first, so the rows loaded are at least that new
+        version = change_horizon(cur)
+        cur.execute(f"SELECT {ITEM_COLUMNS} FROM items")
+        items = {row['item_id']: dict(row) for row in cur.fetchall()}
+        cur.execute(f"SELECT {CONTAINER_COLUMNS} FROM containers")
+        containers = {row['container_id']: dict(row) for row in cur.fetchall()}
+        cur.execute(LATEST_PLACEMENTS + " ORDER BY p.item_id, p.placement_id DESC")
+        placements = {row['item_id']: dict(row) for row in cur.fetchall()}
+        with self.lock:
+            self.items, self.containers, self.placements = items, containers, placements
+            self.by_container = defaultdict(set)
+            for item_id, placement in placements.items():
+                self.by_container[placement['container_id']].add(item_id)
+            self.cache = {}
+            self.version = version
+            self.ready = True
+            self.last_sync = time.monotonic()
+
+    def _refresh(self, cur, changed):
+        # One query per changed table, however many rows a transaction touched
+        rows = {}
+        if changed['items']:
+            cur.execute(f"SELECT {ITEM_COLUMNS} FROM items WHERE item_id = ANY(%s)", (list(changed['items']),))
+            rows['items'] = {row['item_id']: dict(row) for row in cur.fetchall()}
+        if changed['containers']:
+            cur.execute(f"SELECT {CONTAINER_COLUMNS} FROM containers WHERE container_id = ANY(%s)", (list(changed['containers']),))
+            rows['containers'] = {row['container_id']: dict(row) for row in cur.fetchall()}
+        if changed['placements']:
+            cur.execute(
+                LATEST_PLACEMENTS + " WHERE p.item_id = ANY(%s) ORDER BY p.item_id, p.placement_id DESC",
+                (list(changed['placements']),)
+            )
+            rows['placements'] = {row['item_id']: dict(row) for row in cur.fetchall()}
+        if not rows:
+            return
+
+        with self.lock:
+            for table, fresh_rows in rows.items():
+                current = getattr(self, table)
+                for key in changed[table]:
+                    if table == 'placements' and key in current:
+                        self.by_container[current[key]['container_id']].discard(key)
+                    if key in fresh_rows:
+                        current[key] = fresh_rows[key]
+                        if table == 'placements':
+                            self.by_container[fresh_rows[key]['container_id']].add(key)
+                    else:
+                        current.pop(key, None)
+            self.cache = {}
+
+    def _cached(self, key, build):
+        with self.lock:
+            if key not in self.cache:
+                self.cache[key] = build()
+            return self.cache[key]
+
+    def get_items(self):
+        return self._cached('items', lambda: sorted(
+            (item for item in self.items.values() if not item['is_waste']),
+            key=lambda item: (-item['priority'], item['name'])
+        ))
+
+    def get_containers(self):
+        return self._cached('containers', lambda: sorted(
+            self.containers.values(),
+            key=lambda container: (container['zone'], container['container_id'])
+        ))
+
+    def get_unplaced_items(self):
+        return self._cached('unplaced', lambda: [
+            {key: value for key, value in item.items() if key not in ('current_zone', 'is_waste')}
+            for item in sorted(
+                (item for item in self.items.values()
+                 if not item['is_waste'] and item['item_id'] not in self.placements),
+                key=lambda item: -item['priority']
+            )
+        ])
+
+    def find_item(self, item_id=None, item_name=None):
+        with self.lock:
+            if item_id:
+                return self.items.get(item_id)
+            needle = item_name.lower()
+            return next((item for item in self.items.values() if needle in item['name'].lower()), None)
+
+    def find_placement(self, item_id):
+        # Latest placement plus the number of items in front of it
+        with self.lock:
+            placement = self.placements.get(item_id)
+            if placement is None:
+                return None, 0
+            target_depth = float(placement['start_coordinates']['depth'])
+            steps = sum(
+                1 for other in self.by_container[placement['container_id']]
+                if float(self.placements[other]['start_coordinates']['depth']) < target_depth
+            )
+            return placement, steps
+
+read_model = ReadModel()
+
+# Single-flight coalescing of identical concurrent GETs
+COALESCE_REUSE_MS = float(os.getenv('COALESCE_REUSE_MS', 0))
+
+class SingleFlight:
+    """
+    Lets concurrent callers with the same key share one computation: the first
+    caller runs it, the rest wait for its result. A finished result is reused
+    for reuse_seconds afterwards (0 disables reuse).
+    """
+    class Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+            self.finished_at = None
+
+    def __init__(self, reuse_seconds=0.0):
+        self.reuse_seconds = reuse_seconds
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def _reusable(self, call, now):
+        return not call.done.is_set() or now - call.finished_at <= self.reuse_seconds
+
+    def do(self, key, compute):
+        now = time.monotonic()
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None or not self._reusable(call, now)
+            if leader:
+                # Drop expired results while we hold the lock anyway
+                for stale in [k for k, c in self.calls.items() if not self._reusable(c, now)]:
+                    del self.calls[stale]
+                call = self.calls[key] = self.Call()
+
+        if leader:
+            try:
+                call.result = compute()
+            except Exception as e:
+                call.error = e
+            finally:
+                call.finished_at = time.monotonic()
+                call.done.set()
+                if self.reuse_seconds <= 0:
+                    with self.lock:
+                        if self.calls.get(key) is call:
+                            del self.calls[key]
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+read_flights = SingleFlight(COALESCE_REUSE_MS / 1000)
+
+def coalesce(view):
+    # Identical GETs (same path, same normalized query) share one response, headers
+    # included. Only for views without side effects: followers never run the view.
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.args.get('stream') == 'true':
+            # Streamed bodies are produced while they are sent, so there is nothing to share
+            return view(*args, **kwargs)
+        key = (request.path, current_shard(), tuple(sorted(request.args.items(multi=True))))
+
+        def compute():
+            response = make_response(view(*args, **kwargs))
+            return response.get_data(), response.status_code, list(response.headers)
+
+        body, status, headers = read_flights.do(key, compute)
+        return Response(body, status=status, headers=headers)
+    return wrapper
+
+# Endpoints that can gather from every module with module=all
+SCATTER_ENDPOINTS = {'search_item'}
+
+@app.before_request
+def route_to_shard():
+    # The module comes from the X-Module header or a module query parameter
+    module = request.headers.get('X-Module') or request.args.get('module')
+    if module == ALL_MODULES:
+        if request.endpoint not in SCATTER_ENDPOINTS:
+            return jsonify({"success": False, "message": "module=all is only supported when searching"}), 400
+        g.all_modules = True
+    elif module is not None and module not in SHARDS:
+        return jsonify({"success": False, "message": f"Unknown module: {module}"}), 404
+    else:
+        g.shard = module
+
+@app.before_request
+def start_background_workers():
+    if READ_MODEL_ENABLED:
+        read_model.start()
+    if DEFRAG_ENABLED:
+        defragmenter.start()
+    if AUTO_PLACE_ENABLED:
+        auto_placer.start()
 
 @app.route('/')
 def home():
@@ -223,59 +1707,444 @@ def home():
 
 
 
+# Background jobs for long placement and simulation runs
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+JOB_TIME_LIMIT = float(os.getenv('JOB_TIME_LIMIT', 600))
+JOB_RESULT_TTL = float(os.getenv('JOB_RESULT_TTL', 3600))
+# Most unfinished (queued or running) jobs at once; further submissions are turned away
+JOB_QUEUE_MAX = int(os.getenv('JOB_QUEUE_MAX', 100))
+JOB_STREAM_KEEPALIVE = 15.0
+
+class JobStopped(Exception):
+    def __init__(self, status):
+        super().__init__(f"Job {status.replace('_', ' ')}")
+        self.status = status
+
+class Job:
+    """
+    One submitted run. The work function receives the job and calls check()
+    at safe points, which raises JobStopped once the job is cancelled or past
+    its time limit, and report() to publish progress to pollers and streams.
+    """
+    FINISHED = ('succeeded', 'failed', 'cancelled', 'timed_out')
+
+    def __init__(self, kind, time_limit):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.shard = current_shard()
+        self.status = 'queued'
+        self.progress = {}
+        self.result = None
+        self.message = None
+        self.time_limit = time_limit
+        self.deadline = None
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self.cancelled = threading.Event()
+        self.condition = threading.Condition()
+        self.revision = 0
+
+    def stopped(self):
+        return self.cancelled.is_set() or (self.deadline is not None and time.monotonic() > self.deadline)
+
+    def check(self):
+        if self.cancelled.is_set():
+            raise JobStopped('cancelled')
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise JobStopped('timed_out')
+
+    def report(self, **progress):
+        with self.condition:
+            self.progress.update(progress)
+            self.revision += 1
+            self.condition.notify_all()
+
+    def transition(self, status, result=None, message=None):
+        with self.condition:
+            if self.status in self.FINISHED:
+                return
+            self.status = status
+            if status == 'running':
+                self.started_at = datetime.now()
+                self.deadline = time.monotonic() + self.time_limit
+            else:
+                self.result = result
+                self.message = message
+                self.finished_at = datetime.now()
+            self.revision += 1
+            self.condition.notify_all()
+
+    def wait(self, seen, timeout):
+        # Returns the newest revision once it differs from seen, or after timeout
+        with self.condition:
+            self.condition.wait_for(lambda: self.revision != seen, timeout)
+            return self.revision
+
+    def describe(self):
+        with self.condition:
+            described = {
+                "success": True,
+                "jobId": self.id,
+                "kind": self.kind,
+                "module": self.shard,
+                "status": self.status,
+                "progress": dict(self.progress),
+                "createdAt": self.created_at.isoformat(),
+                "startedAt": self.started_at.isoformat() if self.started_at else None,
+                "finishedAt": self.finished_at.isoformat() if self.finished_at else None
+            }
+            if self.message is not None:
+                described["message"] = self.message
+            if self.result is not None:
+                described["result"] = self.result
+            return described
+
+class JobQueue:
+    """
+    Local worker pool for jobs; no broker needed. Threads rather than processes,
+    because the work shares this process's caches and indexes and spends much
+    of its time in the database. Finished jobs are dropped after result_ttl.
+    At most max_jobs can be unfinished; submit() returns None beyond that.
+    """
+    def __init__(self, workers, result_ttl, max_jobs):
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self.max_jobs = max_jobs
+        self.jobs = {}
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def submit(self, kind, work, data):
+        time_limit = min(float(data.get('timeLimitSeconds') or JOB_TIME_LIMIT), JOB_TIME_LIMIT)
+        job = Job(kind, time_limit)
+        with self.lock:
+            self._purge()
+            if sum(1 for queued in self.jobs.values() if queued.status not in Job.FINISHED) >= self.max_jobs:
+                return None
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job')
+            self.jobs[job.id] = job
+            job.future = self.executor.submit(self._run, job, work, data)
+        return job
+
+    def _run(self, job, work, data):
+        if job.cancelled.is_set():
+            return
+        job.transition('running')
+        try:
+            with using_shard(job.shard):
+                result = work(data, job)
+            if result.get('success') is False:
+                job.transition('failed', message=result.get('message'))
+            else:
+                job.transition('succeeded', result=result)
+        except JobStopped as e:
+            job.transition(e.status, message=str(e))
+        except Exception as e:
+            job.transition('failed', message=str(e))
+
+    def get(self, job_id):
+        with self.lock:
+            self._purge()
+            return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None:
+            job.cancelled.set()
+            if job.future.cancel():
+                # Never started; a running job stops at its next check()
+                job.transition('cancelled', message="Job cancelled")
+        return job
+
+    def _purge(self):
+        cutoff = datetime.now() - timedelta(seconds=self.result_ttl)
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.finished_at and job.finished_at < cutoff]:
+            del self.jobs[job_id]
+
+job_queue = JobQueue(JOB_WORKERS, JOB_RESULT_TTL, JOB_QUEUE_MAX)
+
+def submit_job(kind, work, data):
+    # 202 with the job's description, or 503 while the queue is full
+    job = job_queue.submit(kind, work, data)
+    if job is None:
+        response = jsonify({"success": False, "message": "Too many jobs are waiting, try again later"})
+        return response, 503, {'Retry-After': '30'}
+    return jsonify(job.describe()), 202
+
+# Job APIs
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "message": "Job not found"}), 404
+    return jsonify(job.describe())
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    job = job_queue.cancel(job_id)
+    if job is None:
+        return jsonify({"success": False, "message": "Job not found"}), 404
+    return jsonify(job.describe())
+
+@app.route('/api/jobs/<job_id>/stream', methods=['GET'])
+def stream_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "message": "Job not found"}), 404
+    
+    def generate():
+        seen = None
+        yield "retry: 2000\n\n"
+        while True:
+            revision = job.wait(seen, JOB_STREAM_KEEPALIVE)
+            if revision == seen:
+                yield ": keepalive\n\n"
+                continue
+            seen = revision
+            described = job.describe()
+            if described['status'] in Job.FINISHED:
+                yield f"event: done\ndata: {app.json.dumps(described)}\n\n"
+                return
+            yield f"event: progress\ndata: {app.json.dumps(described)}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 # Placement Recommendations API
-@app.route('/api/placement', methods=['POST'])
-def placement_recommendations():
-    data = request.json
+def run_placement(data, job=None):
+    started = time.monotonic()
     containers = data.get('containers', [])
     items = data.get('items', [])
     
-    placements, rearrangements = calculate_placement(containers, items)
+    # Optional time budget for the anytime improvement phase, cut short for a job
+    # that is cancelled or reaches its time limit
+    deadline = None
+    if data.get('deadlineMs'):
+        deadline = started + float(data['deadlineMs']) / 1000
+    stop = job.stopped if job else None
+    
+    if job:
+        job.report(phase="solving", items=len(items))
+    placements, rearrangements, metrics = calculate_placement(containers, items, deadline, data.get('seed'), stop)
+    if job:
+        job.check()
+        job.report(phase="saving")
     
     conn = get_db_connection()
     cur = conn.cursor()
     
     try:
-        for placement in placements:
-            # Convert coordinates to proper JSON strings
-            start_coords = json.dumps(placement['position']['startCoordinates'])
-            end_coords = json.dumps(placement['position']['endCoordinates'])
-            
-            cur.execute(
-                "INSERT INTO placements (item_id, container_id, start_coordinates, end_coordinates) "
-                "VALUES (%s, %s, %s::json, %s::json)",
-                (
-                    placement['itemId'],
-                    placement['containerId'],
-                    start_coords,
-                    end_coords
-                )
-            )
-            cur.execute(
-                "UPDATE items SET current_zone = (SELECT zone FROM containers WHERE container_id = %s) "
-                "WHERE item_id = %s",
-                (placement['containerId'], placement['itemId'])
-            )
+        persist_placements(cur, placements)
         conn.commit()
         log_action("placement", details=f"Placement recommendations generated")
-        return jsonify({
+        if data.get('overflow') and rearrangements:
+            overflowed = {placement['itemId']: placement for placement in place_overflow(items, rearrangements)}
+            placements = [overflowed.get(placement['itemId'], placement) for placement in placements]
+            rearrangements = [item_id for item_id in rearrangements if item_id not in overflowed]
+        return {
             "success": True,
             "placements": placements,
-            "rearrangements": rearrangements
-        })
+            "rearrangements": rearrangements,
+            "metrics": metrics
+        }
     except Exception as e:
         conn.rollback()
-        return jsonify({"success": False, "message": str(e)})
+        return {"success": False, "message": str(e)}
+    finally:
+        cur.close()
+        conn.close()
+
+ITEM_ROW_COLUMNS = (
+    "item_id", "name", "width", "depth", "height", "mass", "priority",
+    "expiry_date", "usage_limit", "preferred_zone", "current_zone", "is_waste"
+)
+
+def place_overflow(items, item_ids):
+    """
+    Scatter-gather placement of items the current module has no room for: the
+    stored containers of every other module are gathered and solved over once,
+    then each placed item moves to its new module. The item is written and
+    placed there before it is deleted here, so a failure in between leaves it
+    in both modules rather than in neither.
+    """
+    home = current_shard()
+    others = [shard for shard in SHARDS if shard != home]
+    wanted = set(item_ids)
+    overflow = [item for item in items if item['itemId'] in wanted]
+    if not others or not overflow:
+        return []
+    
+    def load(shard):
+        conn = get_db_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            return load_containers_for_placement(cur)
+        finally:
+            cur.close()
+            conn.close()
+    
+    # Container ids are only unique within a module
+    containers = [
+        {**container, "containerId": f"{shard}/{container['containerId']}"}
+        for shard, stored in zip(others, scatter(load, others))
+        for container in stored
+    ]
+    placements = calculate_placement(containers, overflow)[0]
+    
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"SELECT {', '.join(ITEM_ROW_COLUMNS)} FROM items WHERE item_id = ANY(%s)",
+            ([placement['itemId'] for placement in placements if 'containerId' in placement],)
+        )
+        rows = {row[0]: row for row in cur.fetchall()}
+        by_shard = defaultdict(list)
+        for placement in placements:
+            if 'containerId' in placement and placement['itemId'] in rows:
+                shard, _, container_id = placement['containerId'].partition('/')
+                by_shard[shard].append({**placement, "containerId": container_id, "module": shard})
+        if not by_shard:
+            conn.rollback()
+            return []
+        
+        def adopt(shard):
+            placed = by_shard[shard]
+            target = get_db_connection()
+            target_cur = target.cursor()
+            try:
+                execute_values(
+                    target_cur,
+                    f"INSERT INTO items ({', '.join(ITEM_ROW_COLUMNS)}) VALUES %s "
+                    "ON CONFLICT (item_id) DO UPDATE SET " +
+                    ", ".join(f"{column} = EXCLUDED.{column}" for column in ITEM_ROW_COLUMNS[1:]),
+                    [rows[placement['itemId']] for placement in placed]
+                )
+                persist_placements(target_cur, placed)
+                target.commit()
+            except Exception:
+                target.rollback()
+                raise
+            finally:
+                target_cur.close()
+                target.close()
+            for placement in placed:
+                expiry_index.schedule(placement['itemId'], rows[placement['itemId']][7])
+            log_action("placement", details=f"Received {len(placed)} overflow items from {home}")
+        
+        scatter(adopt, list(by_shard))
+        moved = [placement['itemId'] for placed in by_shard.values() for placement in placed]
+        cur.execute("DELETE FROM items WHERE item_id = ANY(%s)", (moved,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         cur.close()
         conn.close()
+    
+    for item_id in moved:
+        expiry_index.discard(item_id)
+    log_action("placement", details=f"Moved {len(moved)} overflow items to {', '.join(by_shard)}")
+    return [placement for placed in by_shard.values() for placement in placed]
+
+@app.route('/api/placement', methods=['POST'])
+@query_budget(16)
+def placement_recommendations():
+    data = request.json
+    if data.get('async'):
+        return submit_job('placement', run_placement, data)
+    return jsonify(run_placement(data))
         
+PLACEMENT_STREAM_CHUNK_SIZE = int(os.getenv('PLACEMENT_STREAM_CHUNK_SIZE', 1000))
+
+# Streaming Placement API: NDJSON in, NDJSON out, persisted chunk by chunk
+@app.route('/api/placement/stream', methods=['POST'])
+def placement_stream():
+    # The body is read one line at a time while the response streams, so only the
+    # current chunk and the container table are held in memory
+    stream = request.stream
+    lines = io.BufferedReader(stream) if isinstance(stream, io.RawIOBase) else stream
+    records = (json.loads(line) for line in lines if line.strip())
+    # A body that does not start with JSON is rejected before the response starts
+    try:
+        first = next(records, None)
+    except ValueError as e:
+        return jsonify({"success": False, "message": f"Invalid NDJSON: {e}"}), 400
+
+    def generate():
+        conn = get_db_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        table = None
+        chunk = []
+        processed = placed = 0
+
+        def flush():
+            nonlocal table, processed, placed
+            if table is None:
+                table = ContainerTable(load_containers_for_placement(cur))
+            solved = solve_placement(table, [table.make_item(item) for item in chunk])
+            placements = [table.materialize(record, slot) for record, slot in solved]
+            persist_placements(cur, placements)
+            conn.commit()
+            processed += len(placements)
+            for placement in placements:
+                if 'containerId' in placement:
+                    placed += 1
+                yield json.dumps({"type": "placement", **placement}) + "\n"
+            chunk.clear()
+            yield json.dumps({
+                "type": "progress",
+                "processed": processed,
+                "placed": placed,
+                "unplaced": processed - placed
+            }) + "\n"
+
+        try:
+            for record in itertools.chain([first] if first is not None else [], records):
+                if 'itemId' in record:
+                    chunk.append(record)
+                    if len(chunk) >= PLACEMENT_STREAM_CHUNK_SIZE:
+                        yield from flush()
+                else:
+                    # Container lines must come before the items that use them
+                    if table is None:
+                        table = ContainerTable()
+                    table.add(record)
+            if chunk:
+                yield from flush()
+
+            log_action("placement", details=f"Streamed placement of {processed} items")
+            yield json.dumps({
+                "type": "done",
+                "success": True,
+                "processed": processed,
+                "placed": placed,
+                "unplaced": processed - placed
+            }) + "\n"
+        except Exception as e:
+            conn.rollback()
+            yield json.dumps({"type": "error", "success": False, "message": str(e)}) + "\n"
+        finally:
+            cur.close()
+            conn.close()
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 # Item Search and Retrieval API
-@app.route('/api/search', methods=['GET'])
-def search_item():
-    item_id = request.args.get('itemId')
-    item_name = request.args.get('itemName')
-    user_id = request.args.get('userId')
+def find_item(item_id, item_name):
+    # (item, latest placement, retrieval steps) in the current module
+    if read_model.fresh():
+        # Served from memory
+        found_item = read_model.find_item(item_id, item_name)
+        placement, steps = read_model.find_placement(found_item['item_id']) if found_item else (None, 0)
+        return found_item, placement, steps
     
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
@@ -286,14 +2155,14 @@ def search_item():
     if item_id:
         query += "item_id = %s"
         params.append(item_id)
-    elif item_name:
-        query += "name ILIKE %s"
-        params.append(f"%{item_name}%")
     else:
-        return jsonify({"success": False, "message": "Please provide itemId or itemName"})
+        query += "name ILIKE %s"
+        params.append(f"%{item_name}%")
     
     cur.execute(query, params)
     found_item = cur.fetchone()
+    placement = None
+    steps = 0
     
     if found_item:
         # Get placement info
@@ -302,38 +2171,66 @@ def search_item():
             FROM placements p
             JOIN containers c ON p.container_id = c.container_id
             WHERE p.item_id = %s
-            ORDER BY p.placed_at DESC
+            ORDER BY p.placement_id DESC
             LIMIT 1
         """, (found_item['item_id'],))
         
         placement = cur.fetchone()
-        
         if placement:
             steps = calculate_retrieval_steps(found_item['item_id'], placement['container_id'])
-            
+    
+    cur.close()
+    conn.close()
+    return found_item, placement, steps
+
+@app.route('/api/search', methods=['GET'])
+@query_budget(8)
+def search_item():
+    item_id = request.args.get('itemId')
+    item_name = request.args.get('itemName')
+    user_id = request.args.get('userId')
+    
+    if not item_id and not item_name:
+        return jsonify({"success": False, "message": "Please provide itemId or itemName"})
+    
+    if g.get('all_modules'):
+        # Scatter-gather: every module is searched, the first hit in module order wins
+        results = scatter(lambda shard: find_item(item_id, item_name))
+        module, (found_item, placement, steps) = next(
+            ((shard, result) for shard, result in zip(SHARDS, results) if result[0] and result[1]),
+            (DEFAULT_SHARD, (None, None, 0))
+        )
+    else:
+        module = current_shard()
+        found_item, placement, steps = find_item(item_id, item_name)
+    
+    if found_item and placement:
+        with using_shard(module):
             log_action(
                 "search", 
                 item_id=found_item['item_id'], 
                 user_id=user_id, 
                 details=f"Searched for item {found_item['name']}"
             )
-            
-            return jsonify({
-                "success": True,
-                "found": True,
-                "item": found_item,
-                "placement": placement,
-                "retrievalSteps": steps,
-                "instructions": [
-                    f"1. Locate container {placement['container_id']} in {placement['zone']} zone",
-                    f"2. Remove {steps} items in front if necessary",
-                    f"3. Retrieve {found_item['name']} (ID: {found_item['item_id']})"
-                ]
-            })
+        
+        return jsonify({
+            "success": True,
+            "found": True,
+            "module": module,
+            "item": found_item,
+            "placement": placement,
+            "retrievalSteps": steps,
+            "instructions": [
+                f"1. Locate container {placement['container_id']} in {placement['zone']} zone",
+                f"2. Remove {steps} items in front if necessary",
+                f"3. Retrieve {found_item['name']} (ID: {found_item['item_id']})"
+            ]
+        })
     
     return jsonify({"success": True, "found": False})
 
 @app.route('/api/retrieve', methods=['POST'])
+@query_budget(12)
 def retrieve_item():
     data = request.json
     item_id = data['itemId']
@@ -354,7 +2251,7 @@ def retrieve_item():
         FROM placements p
         JOIN containers c ON p.container_id = c.container_id
         WHERE p.item_id = %s
-        ORDER BY p.placed_at DESC
+        ORDER BY p.placement_id DESC
         LIMIT 1
     """, (item_id,))
     
@@ -383,11 +2280,17 @@ def retrieve_item():
             cur.execute("""
                 INSERT INTO waste (item_id, reason) VALUES (%s, 'Out of Uses')
             """, (item_id,))
+            expiry_index.discard(item_id)
         else:
             cur.execute("""
                 UPDATE items SET usage_limit = %s WHERE item_id = %s
             """, (new_usage_limit, item_id))
     
+    record_usage(cur, [(
+        item_id, 1, datetime.now(),
+        max(0, item['usage_limit'] - 1) if item['usage_limit'] is not None else None
+    )])
+    
     conn.commit()
     cur.close()
     conn.close()
@@ -402,7 +2305,126 @@ def retrieve_item():
         "remainingUses": item['usage_limit'] - 1 if item['usage_limit'] else None
     })
 
+def plan_container_retrieval(placed, targets):
+    """
+    Extraction order for the targets in one container. An item blocks another
+    when it starts closer to the open face (lower depth) and their width x height
+    footprints intersect. Everything that has to come out is taken front to back,
+    so each blocker is set aside exactly once and put back at the end.
+    """
+    start = np.array([[float(p['start_coordinates'][axis]) for axis in ('width', 'depth', 'height')] for p in placed])
+    end = np.array([[float(p['end_coordinates'][axis]) for axis in ('width', 'depth', 'height')] for p in placed])
+    
+    def blockers_of(i):
+        return np.flatnonzero(
+            (start[:, 1] < start[i, 1])
+            & (start[:, 0] < end[i, 0]) & (start[i, 0] < end[:, 0])
+            & (start[:, 2] < end[i, 2]) & (start[i, 2] < end[:, 2])
+        )
+    
+    def closure(indices):
+        # A blocker's own blockers have to move first
+        needed = set(indices)
+        pending = list(indices)
+        while pending:
+            for j in blockers_of(pending.pop()):
+                if j not in needed:
+                    needed.add(j)
+                    pending.append(j)
+        return needed
+    
+    target_rows = [i for i, p in enumerate(placed) if p['item_id'] in targets]
+    # Moves if every target were fetched on its own, for comparison
+    separately = sum(len(closure([i])) - 1 for i in target_rows)
+    
+    order = sorted(closure(target_rows), key=lambda i: (start[i, 1], placed[i]['item_id']))
+    removed = [placed[i] for i in order if placed[i]['item_id'] not in targets]
+    steps = [
+        ("retrieve" if placed[i]['item_id'] in targets else "remove", placed[i])
+        for i in order
+    ] + [("placeBack", p) for p in reversed(removed)]
+    return steps, len(removed), separately
+
+# Multi-item Retrieval Plan API
+@app.route('/api/retrieve/plan', methods=['POST'])
+@query_budget(2)
+def retrieval_plan():
+    data = request.json
+    item_ids = list(dict.fromkeys(data.get('itemIds', [])))
+    
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    
+    try:
+        # Everything currently placed in any container that holds a requested item
+        cur.execute("""
+            SELECT p.item_id, p.container_id, p.start_coordinates, p.end_coordinates, i.name, c.zone
+            FROM placements p
+            JOIN items i ON i.item_id = p.item_id
+            JOIN containers c ON c.container_id = p.container_id
+            WHERE p.placement_id = (SELECT MAX(q.placement_id) FROM placements q WHERE q.item_id = p.item_id)
+            AND p.container_id IN (
+                SELECT t.container_id FROM placements t
+                WHERE t.item_id = ANY(%s)
+                AND t.placement_id = (SELECT MAX(q.placement_id) FROM placements q WHERE q.item_id = t.item_id)
+            )
+            ORDER BY c.zone, p.container_id
+        """, (item_ids,))
+        by_container = defaultdict(list)
+        for row in cur.fetchall():
+            by_container[(row['zone'], row['container_id'])].append(row)
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)})
+    finally:
+        cur.close()
+        conn.close()
+    
+    targets = set(item_ids)
+    located = set()
+    containers = []
+    retrieval_steps = []
+    total_moved = 0
+    total_separately = 0
+    for (zone, container_id), placed in by_container.items():
+        container_targets = targets & {p['item_id'] for p in placed}
+        located |= container_targets
+        steps, moved, separately = plan_container_retrieval(placed, container_targets)
+        total_moved += moved
+        total_separately += separately
+        for action, p in steps:
+            retrieval_steps.append({
+                "step": len(retrieval_steps) + 1,
+                "action": action,
+                "itemId": p['item_id'],
+                "itemName": p['name'],
+                "containerId": container_id
+            })
+        containers.append({
+            "containerId": container_id,
+            "zone": zone,
+            "itemIds": sorted(container_targets),
+            "blockersMoved": moved
+        })
+    
+    return jsonify({
+        "success": True,
+        "containers": containers,
+        "retrievalSteps": retrieval_steps,
+        "totalSteps": len(retrieval_steps),
+        "blockersMoved": total_moved,
+        "blockersMovedSeparately": total_separately,
+        "notFound": [item_id for item_id in item_ids if item_id not in located]
+    })
+
+def boxes_overlap(a_start, a_end, b_start, b_end):
+    # Touching faces do not count as overlap
+    return all(
+        a_start[axis] < b_end[axis] and b_start[axis] < a_end[axis]
+        for axis in ('width', 'depth', 'height')
+    )
+
 @app.route('/api/place', methods=['POST'])
+@query_budget(10)
 def place_item():
     data = request.json
     item_id = data['itemId']
@@ -418,10 +2440,13 @@ def place_item():
         cur.execute("SELECT * FROM items WHERE item_id = %s", (item_id,))
         item = cur.fetchone()
         
-        cur.execute("SELECT * FROM containers WHERE container_id = %s", (container_id,))
+        # Lock only this container's row: concurrent placements into it queue up
+        # here until commit, placements into other containers are not blocked
+        cur.execute("SELECT * FROM containers WHERE container_id = %s FOR UPDATE", (container_id,))
         container = cur.fetchone()
         
         if not item or not container:
+            conn.rollback()
             return jsonify({"success": False, "message": "Item or container not found"})
         
         # Calculate item volume
@@ -429,8 +2454,29 @@ def place_item():
         
         # Check if container has enough space
         if container['available_volume'] < item_volume:
+            conn.rollback()
             return jsonify({"success": False, "message": "Not enough space in container"})
         
+        start = {axis: float(position['startCoordinates'][axis]) for axis in ('width', 'depth', 'height')}
+        end = {axis: float(position['endCoordinates'][axis]) for axis in ('width', 'depth', 'height')}
+        if any(start[axis] < 0 or end[axis] <= start[axis] or end[axis] > float(container[axis]) for axis in start):
+            conn.rollback()
+            return jsonify({"success": False, "message": "Position is outside the container"})
+        
+        # Reserve the region: nothing currently placed in the container may intersect it
+        cur.execute("""
+            SELECT p.item_id, p.start_coordinates, p.end_coordinates
+            FROM placements p
+            WHERE p.container_id = %s AND p.item_id <> %s
+            AND p.placement_id = (SELECT MAX(q.placement_id) FROM placements q WHERE q.item_id = p.item_id)
+        """, (container_id, item_id))
+        for placed in cur.fetchall():
+            placed_start = {axis: float(value) for axis, value in placed['start_coordinates'].items()}
+            placed_end = {axis: float(value) for axis, value in placed['end_coordinates'].items()}
+            if boxes_overlap(start, end, placed_start, placed_end):
+                conn.rollback()
+                return jsonify({"success": False, "message": f"Position overlaps item {placed['item_id']}"})
+        
         # Convert coordinates to proper JSON strings
         start_coords = json.dumps(position['startCoordinates'])
         end_coords = json.dumps(position['endCoordinates'])
@@ -475,6 +2521,7 @@ def place_item():
 
 
 @app.route('/api/rearrange', methods=['POST'])
+@query_budget(2)
 def generate_rearrangement_plan():
     data = request.json
     container_id = data['containerId']
@@ -484,14 +2531,24 @@ def generate_rearrangement_plan():
     cur = conn.cursor(cursor_factory=RealDictCursor)
     
     try:
-        # 1. Get all containers with available space
+        # 1. Get all containers with available space, indexed by zone
         cur.execute("""
             SELECT container_id, zone, available_volume 
             FROM containers 
-            WHERE container_id != %s
-            ORDER BY available_volume DESC
-        """, (container_id,))
-        other_containers = cur.fetchall()
+            ORDER BY zone, container_id
+        """)
+        zone_containers = defaultdict(list)
+        source_zone = None
+        for container in cur.fetchall():
+            if container['container_id'] == container_id:
+                source_zone = container['zone']
+            else:
+                zone_containers[container['zone']].append(container)
+        capacity_index = {
+            zone: CapacityIndex(float(container['available_volume']) for container in containers)
+            for zone, containers in zone_containers.items()
+        }
+        zone_order = sorted(zone_containers, key=lambda zone: zone != source_zone)
         
         # 2. Identify low-priority items that can be moved
         movable_items = sorted(
@@ -511,11 +2568,13 @@ def generate_rearrangement_plan():
         
         # 4. Calculate optimal moves
         for item in movable_items:
-            item_volume = item['width'] * item['depth'] * item['height']
+            item_volume = float(item['width']) * float(item['depth']) * float(item['height'])
             
-            # Find first container with enough space
-            for container in other_containers:
-                if container['available_volume'] >= item_volume:
+            # Best fit: the tightest container with enough space, same zone first
+            for zone in zone_order:
+                slot = capacity_index[zone].best_fit(item_volume)
+                if slot is not None:
+                    container = zone_containers[zone][slot]
                     plan['itemsToMove'].append(item['item_id'])
                     plan['spaceFreed'] += item_volume
                     plan['estimatedTime'] += 2  # 2 minutes per item moved
@@ -529,7 +2588,7 @@ def generate_rearrangement_plan():
                     })
                     
                     # Update container's available volume for next calculations
-                    container['available_volume'] -= item_volume
+                    capacity_index[zone].update(slot, capacity_index[zone].capacity[slot] - item_volume)
                     break
         
         # 5. Add rotation suggestions for remaining items
@@ -562,6 +2621,7 @@ def generate_rearrangement_plan():
         conn.close()
 
 @app.route('/api/rearrange/execute', methods=['POST'])
+@query_budget(1)
 def execute_rearrangement():
     data = request.json
     plan_id = data['planId']
@@ -596,36 +2656,386 @@ def execute_rearrangement():
         cur.close()
         conn.close()
 
+# Defragmentation: slide items along the width to merge scattered free space
+DEFRAG_ENABLED = os.getenv('DEFRAG_ENABLED', 'false').lower() == 'true'
+DEFRAG_BATCH_MOVES = int(os.getenv('DEFRAG_BATCH_MOVES', 50))
+DEFRAG_QUIET_SECONDS = float(os.getenv('DEFRAG_QUIET_SECONDS', 30))
+DEFRAG_INTERVAL = float(os.getenv('DEFRAG_INTERVAL', 10))
+
+last_request_at = time.monotonic()
+
+@app.before_request
+def note_activity():
+    global last_request_at
+    last_request_at = time.monotonic()
+
+def plan_compaction(container, placed):
+    """
+    Free space in a container is the width no placement covers (items are
+    stacked along the width, see ContainerTable). Placements that overlap in
+    width form blocks; sliding each block left against the previous one turns
+    all free width into a single slot at the end of the container.
+    """
+    blocks = []
+    for placement in sorted(placed, key=lambda placement: float(placement['start_coordinates']['width'])):
+        start = float(placement['start_coordinates']['width'])
+        end = float(placement['end_coordinates']['width'])
+        if blocks and start < blocks[-1][1]:
+            blocks[-1][1] = max(blocks[-1][1], end)
+            blocks[-1][2].append(placement)
+        else:
+            blocks.append([start, end, [placement]])
+    
+    gaps = []
+    moves = []
+    edge = packed = 0.0
+    for start, end, members in blocks:
+        if start - edge > 1e-9:
+            gaps.append(start - edge)
+        shift = start - packed
+        if shift > 1e-9:
+            moves.extend((placement, shift) for placement in members)
+        packed += end - start
+        edge = end
+    width = float(container['width'])
+    if width - edge > 1e-9:
+        gaps.append(width - edge)
+    
+    face = float(container['depth']) * float(container['height'])
+    free, largest = sum(gaps), max(gaps, default=0.0)
+    return {
+        "containerId": container['container_id'],
+        "zone": container['zone'],
+        "freeVolume": free * face,
+        "largestFreeVolume": largest * face,
+        "fragments": len(gaps),
+        "fragmentation": 1 - largest / free if free > 1e-9 else 0.0,
+        "gain": (free - largest) * face,
+        "moves": moves
+    }
+
+def load_compaction_plans(cur, container_ids=None, lock=False):
+    # Current placements per container, planned and ranked by gained slot volume per move
+    query = "SELECT container_id, zone, width, depth, height FROM containers"
+    params = ()
+    if container_ids is not None:
+        query += " WHERE container_id = ANY(%s)"
+        params = (container_ids,)
+    query += " ORDER BY container_id"
+    if lock:
+        query += " FOR UPDATE"
+    cur.execute(query, params)
+    containers = cur.fetchall()
+    
+    cur.execute("""
+        SELECT p.placement_id, p.item_id, p.container_id, p.start_coordinates, p.end_coordinates
+        FROM placements p
+        WHERE p.placement_id = (SELECT MAX(q.placement_id) FROM placements q WHERE q.item_id = p.item_id)
+    """ + (" AND p.container_id = ANY(%s)" if container_ids is not None else ""), params)
+    placed = defaultdict(list)
+    for row in cur.fetchall():
+        placed[row['container_id']].append(row)
+    
+    plans = [plan_compaction(container, placed[container['container_id']]) for container in containers]
+    plans.sort(key=lambda plan: -plan['gain'] / len(plan['moves']) if plan['moves'] else 0.0)
+    return plans
+
+def select_moves(plans, max_moves):
+    # Best gain per move first; a container that does not fit the batch is compacted from the front
+    batch = []
+    for plan in plans:
+        if len(batch) >= max_moves:
+            break
+        if plan['gain'] > 1e-9 and plan['moves']:
+            batch.extend((plan['containerId'], placement, shift) for placement, shift in plan['moves'][:max_moves - len(batch)])
+    return batch
+
+def shifted(coordinates, shift):
+    return {**coordinates, "width": float(coordinates['width']) - shift}
+
+def apply_moves(cur, batch):
+    # Moves rewrite the items' live placement rows in place, in one statement
+    if not batch:
+        return
+    execute_values(
+        cur,
+        """
+            UPDATE placements
+            SET start_coordinates = v.start_coordinates::json, end_coordinates = v.end_coordinates::json
+            FROM (VALUES %s) AS v(placement_id, start_coordinates, end_coordinates)
+            WHERE placements.placement_id = v.placement_id
+        """,
+        [
+            (
+                placement['placement_id'],
+                json.dumps(shifted(placement['start_coordinates'], shift)),
+                json.dumps(shifted(placement['end_coordinates'], shift))
+            )
+            for container_id, placement, shift in batch
+        ]
+    )
+
+def run_defrag_batch(max_moves):
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        # Pick the containers without locks, then lock them and plan again on current rows
+        chosen = sorted({container_id for container_id, placement, shift in select_moves(load_compaction_plans(cur), max_moves)})
+        if not chosen:
+            conn.rollback()
+            return []
+        batch = select_moves(load_compaction_plans(cur, chosen, lock=True), max_moves)
+        apply_moves(cur, batch)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+    
+    if batch:
+        log_action("rearrangement", details=f"Defragmentation moved {len(batch)} items in {len(chosen)} containers")
+        # The compacted containers now have room at the end
+        auto_placer.notify({container_id for container_id, placement, shift in batch})
+    return batch
+
+def describe_moves(batch):
+    return [
+        {
+            "itemId": placement['item_id'],
+            "containerId": container_id,
+            "from": placement['start_coordinates'],
+            "to": shifted(placement['start_coordinates'], shift)
+        }
+        for container_id, placement, shift in batch
+    ]
+
+class Defragmenter:
+    """
+    Background compaction. Runs at most one bounded batch every DEFRAG_INTERVAL
+    seconds, and only after DEFRAG_QUIET_SECONDS without any API request, so it
+    stays out of the way of interactive traffic.
+    """
+    def __init__(self):
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(DEFRAG_INTERVAL)
+            if time.monotonic() - last_request_at < DEFRAG_QUIET_SECONDS:
+                continue
+            for shard in SHARDS:
+                try:
+                    with using_shard(shard):
+                        run_defrag_batch(DEFRAG_BATCH_MOVES)
+                except Exception:
+                    app.logger.exception("Defragmentation batch failed in %s", shard)
+
+defragmenter = Defragmenter()
+
+# Defragmentation APIs
+@app.route('/api/defrag', methods=['GET'])
+@coalesce
+@query_budget(2)
+def defrag_report():
+    max_moves = request.args.get('maxMoves', default=DEFRAG_BATCH_MOVES, type=int)
+    
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    
+    try:
+        plans = load_compaction_plans(cur)
+        return jsonify({
+            "success": True,
+            "containers": [
+                {**{key: value for key, value in plan.items() if key not in ('gain', 'moves')}, "movesNeeded": len(plan['moves'])}
+                for plan in sorted(plans, key=lambda plan: -plan['fragmentation'])
+            ],
+            "proposedMoves": describe_moves(select_moves(plans, max_moves))
+        })
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        })
+    finally:
+        cur.close()
+        conn.close()
+
+@app.route('/api/defrag/run', methods=['POST'])
+@query_budget(7)
+def defrag_run():
+    data = request.get_json(silent=True) or {}
+    
+    try:
+        batch = run_defrag_batch(int(data.get('maxMoves', DEFRAG_BATCH_MOVES)))
+        return jsonify({
+            "success": True,
+            "itemsMoved": len(batch),
+            "moves": describe_moves(batch)
+        })
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        })
+
+# Auto-placement of the unplaced queue when space frees up
+AUTO_PLACE_ENABLED = os.getenv('AUTO_PLACE_ENABLED', 'false').lower() == 'true'
+AUTO_PLACE_DEBOUNCE = float(os.getenv('AUTO_PLACE_DEBOUNCE', 2.0))
+AUTO_PLACE_MAX_DELAY = float(os.getenv('AUTO_PLACE_MAX_DELAY', 10.0))
+AUTO_PLACE_BATCH = int(os.getenv('AUTO_PLACE_BATCH', 500))
+
+def run_auto_place(container_ids=None):
+    """
+    One pass: place the highest-priority unplaced items into the given
+    containers (every container with room when None), locking only those.
+    Compaction is left to the defragmenter, which runs in bounded batches when
+    DEFRAG_ENABLED and queues a pass for the containers it compacted.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cur.execute("""
+            SELECT i.item_id AS "itemId", i.name, i.width, i.depth, i.height, i.priority,
+                i.preferred_zone AS "preferredZone"
+            FROM items i
+            WHERE i.is_waste = FALSE
+            AND NOT EXISTS (SELECT 1 FROM placements p WHERE p.item_id = i.item_id)
+            ORDER BY i.priority DESC, i.name, i.item_id
+            LIMIT %s
+        """, (AUTO_PLACE_BATCH,))
+        queued = cur.fetchall()
+        if not queued:
+            conn.rollback()
+            return []
+        
+        cur.execute("""
+            SELECT container_id FROM containers
+            WHERE available_volume > 0
+        """ + ("AND container_id = ANY(%s)" if container_ids is not None else "") + """
+            ORDER BY container_id
+            FOR UPDATE
+        """, (container_ids,) if container_ids is not None else ())
+        container_ids = [row['container_id'] for row in cur.fetchall()]
+        placements = []
+        if container_ids:
+            table = ContainerTable(load_containers_for_placement(cur, container_ids))
+            solved = solve_placement(table, [table.make_item(item) for item in queued])
+            placements = [table.materialize(record, slot) for record, slot in solved if slot is not None]
+            persist_placements(cur, placements)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+    
+    if placements:
+        log_action("placement", details=f"Auto-placed {len(placements)} queued items into {len(container_ids)} containers")
+    return placements
+
+class AutoPlacer:
+    """
+    Events that free space only record the containers involved. A pass per
+    module runs once events have been quiet for AUTO_PLACE_DEBOUNCE seconds,
+    or AUTO_PLACE_MAX_DELAY after the first one, so a burst of freed space
+    is placed into in one pass rather than one per event.
+    """
+    def __init__(self):
+        self.pending = defaultdict(set)
+        self.first_at = None
+        self.last_at = None
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def start(self):
+        with self.condition:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+    def notify(self, container_ids):
+        if not AUTO_PLACE_ENABLED or not container_ids:
+            return
+        with self.condition:
+            now = time.monotonic()
+            self.pending[current_shard()].update(container_ids)
+            self.first_at = self.first_at or now
+            self.last_at = now
+            self.condition.notify()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending)
+                while True:
+                    due = min(self.last_at + AUTO_PLACE_DEBOUNCE, self.first_at + AUTO_PLACE_MAX_DELAY)
+                    if time.monotonic() >= due:
+                        break
+                    self.condition.wait(due - time.monotonic())
+                pending, self.pending = self.pending, defaultdict(set)
+                self.first_at = self.last_at = None
+            
+            for shard, container_ids in pending.items():
+                try:
+                    with using_shard(shard):
+                        run_auto_place(sorted(container_ids))
+                except Exception:
+                    app.logger.exception("Auto-placement failed in %s", shard)
+
+auto_placer = AutoPlacer()
+
+@app.route('/api/placement/auto', methods=['POST'])
+@query_budget(9)
+def auto_place():
+    data = request.get_json(silent=True) or {}
+    
+    try:
+        placements = run_auto_place(data.get('containerIds'))
+        return jsonify({
+            "success": True,
+            "placedCount": len(placements),
+            "placements": placements
+        })
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        })
+
 # Waste Management API
 @app.route('/api/waste/identify', methods=['GET'])
+@query_budget(8)
 def identify_waste():
+    # Expired items come from the expiry index instead of a table scan
+    expired_count = check_expired_items()
+    
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
     
-    # Get expired items
+    # Items that were imported or edited with no uses left
     cur.execute("""
-        SELECT i.* 
+        SELECT i.item_id
         FROM items i
         LEFT JOIN waste w ON i.item_id = w.item_id
-        WHERE (i.expiry_date < CURRENT_DATE OR i.usage_limit <= 0)
+        WHERE i.usage_limit <= 0
         AND i.is_waste = FALSE
         AND w.item_id IS NULL
     """)
-    potential_waste = cur.fetchall()
-    
-    # Mark them as waste
-    for item in potential_waste:
-        reason = 'Expired' if item['expiry_date'] and item['expiry_date'] < datetime.now().date() else 'Out of Uses'
-        cur.execute("""
-            UPDATE items 
-            SET is_waste = TRUE 
-            WHERE item_id = %s
-        """, (item['item_id'],))
-        
-        cur.execute("""
-            INSERT INTO waste (item_id, reason) 
-            VALUES (%s, %s)
-        """, (item['item_id'], reason))
+    out_of_uses = [row['item_id'] for row in cur.fetchall()]
+    mark_items_as_waste(cur, out_of_uses, 'Out of Uses')
+    for item_id in out_of_uses:
+        expiry_index.discard(item_id)
     
     conn.commit()
     
@@ -644,10 +3054,11 @@ def identify_waste():
     return jsonify({
         "success": True, 
         "wasteItems": waste_items,
-        "newlyIdentified": len(potential_waste)
+        "newlyIdentified": expired_count + len(out_of_uses)
     })
 
 @app.route('/api/waste/return-plan', methods=['POST'])
+@query_budget(8)
 def return_plan():
     data = request.json
     undocking_container_id = data['undockingContainerId']
@@ -723,6 +3134,14 @@ def return_plan():
     
     plan_id = cur.fetchone()['plan_id']
     
+    # Remember exactly which items the plan returns
+    if waste_items:
+        execute_values(
+            cur,
+            "INSERT INTO return_plan_items (plan_id, item_id) VALUES %s ON CONFLICT DO NOTHING",
+            [(plan_id, item['item_id']) for item in waste_items]
+        )
+    
     # Generate manifest
     manifest = {
         "undockingContainerId": undocking_container_id,
@@ -749,6 +3168,7 @@ def return_plan():
     })
 
 @app.route('/api/waste/complete-undocking', methods=['POST'])
+@query_budget(8)
 def complete_undocking():
     data = request.json
     plan_id = data['planId']
@@ -756,49 +3176,69 @@ def complete_undocking():
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
     
-    # Get the return plan
+    # Get the return plan, locked so it can only be undocked once at a time
     cur.execute("""
         SELECT * FROM return_plans 
         WHERE plan_id = %s
+        FOR UPDATE
     """, (plan_id,))
     plan = cur.fetchone()
     
     if not plan:
         return jsonify({"success": False, "message": "Return plan not found"})
     
-    # Get items in the plan (simplified - in reality you'd have a separate table for plan items)
-    cur.execute("""
-        SELECT i.*
-        FROM items i
-        JOIN waste w ON i.item_id = w.item_id
-        WHERE i.is_waste = TRUE
-        ORDER BY w.marked_at ASC
-        LIMIT (
-            SELECT COUNT(*) 
-            FROM items i
-            JOIN waste w ON i.item_id = w.item_id
-            WHERE i.is_waste = TRUE
-        )
-    """)
-    waste_items = cur.fetchall()
-    
-    # Remove the items (in a real system, you might archive them instead)
-    items_removed = 0
-    for item in waste_items:
-        cur.execute("DELETE FROM placements WHERE item_id = %s", (item['item_id'],))
-        cur.execute("DELETE FROM items WHERE item_id = %s", (item['item_id'],))
-        items_removed += 1
-    
-    # Update container available volume
-    cur.execute("""
-        UPDATE containers 
-        SET available_volume = width * depth * height 
-        WHERE container_id = %s
-    """, (plan['undocking_container_id'],))
+    try:
+        # Archive the plan's items before they leave the station
+        cur.execute("""
+            INSERT INTO undocked_items (plan_id, item_id, name, mass, volume, container_id)
+            SELECT rpi.plan_id, i.item_id, i.name, i.mass, i.width * i.depth * i.height,
+                (SELECT p.container_id FROM placements p
+                 WHERE p.item_id = i.item_id
+                 ORDER BY p.placement_id DESC
+                 LIMIT 1)
+            FROM return_plan_items rpi
+            JOIN items i ON i.item_id = rpi.item_id
+            WHERE rpi.plan_id = %s
+            RETURNING container_id
+        """, (plan_id,))
+        freed_containers = {row['container_id'] for row in cur.fetchall() if row['container_id']}
+        
+        # Give back exactly the volume the removed items occupied
+        cur.execute("""
+            UPDATE containers c
+            SET available_volume = LEAST(c.width * c.depth * c.height, c.available_volume + freed.volume)
+            FROM (
+                SELECT p.container_id, SUM(i.width * i.depth * i.height) AS volume
+                FROM return_plan_items rpi
+                JOIN items i ON i.item_id = rpi.item_id
+                JOIN placements p ON p.item_id = i.item_id
+                    AND p.placement_id = (SELECT MAX(q.placement_id) FROM placements q WHERE q.item_id = i.item_id)
+                WHERE rpi.plan_id = %s
+                GROUP BY p.container_id
+            ) freed
+            WHERE c.container_id = freed.container_id
+        """, (plan_id,))
+        
+        # Remove the items (placements and plan rows cascade)
+        cur.execute("""
+            DELETE FROM items
+            WHERE item_id IN (SELECT item_id FROM return_plan_items WHERE plan_id = %s)
+            RETURNING item_id
+        """, (plan_id,))
+        removed = [row['item_id'] for row in cur.fetchall()]
+        items_removed = len(removed)
+        
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        return jsonify({"success": False, "message": str(e)})
+    finally:
+        cur.close()
+        conn.close()
     
-    conn.commit()
-    cur.close()
-    conn.close()
+    for item_id in removed:
+        expiry_index.discard(item_id)
+    auto_placer.notify(freed_containers)
     
     log_action("disposal", details=f"Undocked {items_removed} waste items")
     
@@ -809,12 +3249,17 @@ def complete_undocking():
     })
 
 # Time Simulation API
-@app.route('/api/simulate/day', methods=['POST'])
-def simulate_day():
-    data = request.json
+def run_simulation(data, job=None):
     num_of_days = data.get('numOfDays', 1)
     items_to_be_used_per_day = data.get('itemsToBeUsedPerDay', [])
     
+    if data.get('dryRun'):
+        return {
+            "success": True,
+            "dryRun": True,
+            "scenarios": run_dry_simulation(data)
+        }
+    
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
     
@@ -824,78 +3269,244 @@ def simulate_day():
         "itemsDepletedToday": []
     }
     
-    # Simulate each day
-    for day in range(num_of_days):
-        # Mark expired items
-        expired_count = check_expired_items()
-        if expired_count > 0:
-            changes["itemsExpired"].append({
-                "day": day + 1,
-                "count": expired_count
-            })
-        
-        # Process items to be used
-        for item_usage in items_to_be_used_per_day:
-            item_id = item_usage['itemId']
-            uses = item_usage.get('uses', 1)
-            
-            cur.execute("""
-                SELECT * FROM items 
-                WHERE item_id = %s AND is_waste = FALSE
-            """, (item_id,))
-            item = cur.fetchone()
-            
-            if item and item['usage_limit'] is not None:
-                new_usage_limit = item['usage_limit'] - uses
-                if new_usage_limit <= 0:
-                    # Mark as waste
-                    cur.execute("""
-                        UPDATE items 
-                        SET is_waste = TRUE, usage_limit = 0 
-                        WHERE item_id = %s
-                    """, (item_id,))
-                    
-                    cur.execute("""
-                        INSERT INTO waste (item_id, reason) 
-                        VALUES (%s, 'Out of Uses')
-                    """, (item_id,))
-                    
-                    changes["itemsDepletedToday"].append({
-                        "day": day + 1,
-                        "itemId": item_id,
-                        "name": item['name']
-                    })
-                else:
-                    cur.execute("""
-                        UPDATE items 
-                        SET usage_limit = %s 
-                        WHERE item_id = %s
-                    """, (new_usage_limit, item_id))
-                
-                changes["itemsUsed"].append({
+    # Expiry changes from other processes, then only the items the usage schedule touches, once
+    expiry_index.sync(cur)
+    cur.execute("""
+        SELECT item_id, name, usage_limit FROM items 
+        WHERE item_id = ANY(%s) AND is_waste = FALSE
+    """, (list({item_usage['itemId'] for item_usage in items_to_be_used_per_day}),))
+    active_items = {item['item_id']: item for item in cur.fetchall()}
+    used_items = set()
+    usage_events = []
+    started_at = datetime.now()
+    expired_items = []
+    depleted_items = []
+    start_date = datetime.now().date()
+    
+    try:
+        # Simulate each day
+        for day in range(num_of_days):
+            if job:
+                job.check()
+                job.report(day=day, days=num_of_days)
+            # Expiry events crossed today, straight from the index
+            expired_today = expiry_index.advance_to(start_date + timedelta(days=day))
+            for item_id in expired_today:
+                active_items.pop(item_id, None)
+            expired_items.extend(expired_today)
+            if expired_today:
+                changes["itemsExpired"].append({
                     "day": day + 1,
-                    "itemId": item_id,
-                    "name": item['name'],
-                    "remainingUses": max(0, new_usage_limit)
+                    "count": len(expired_today)
                 })
+            
+            # Process items to be used
+            for item_usage in items_to_be_used_per_day:
+                item_id = item_usage['itemId']
+                uses = item_usage.get('uses', 1)
+                item = active_items.get(item_id)
+                
+                if item and item['usage_limit'] is not None:
+                    new_usage_limit = item['usage_limit'] - uses
+                    if new_usage_limit <= 0:
+                        # Depletion event: the item becomes waste
+                        del active_items[item_id]
+                        expiry_index.discard(item_id)
+                        depleted_items.append(item_id)
+                        changes["itemsDepletedToday"].append({
+                            "day": day + 1,
+                            "itemId": item_id,
+                            "name": item['name']
+                        })
+                    else:
+                        item['usage_limit'] = new_usage_limit
+                        used_items.add(item_id)
+                    usage_events.append((item_id, uses, started_at + timedelta(days=day), max(0, new_usage_limit)))
+                    
+                    changes["itemsUsed"].append({
+                        "day": day + 1,
+                        "itemId": item_id,
+                        "name": item['name'],
+                        "remainingUses": max(0, new_usage_limit)
+                    })
+        
+        # Persist the outcome of the whole run with set-based statements
+        mark_items_as_waste(cur, expired_items, 'Expired')
+        mark_items_as_waste(cur, depleted_items, 'Out of Uses')
+        if depleted_items:
+            cur.execute("""
+                UPDATE items 
+                SET usage_limit = 0 
+                WHERE item_id = ANY(%s)
+            """, (depleted_items,))
+        remaining = [
+            (item_id, active_items[item_id]['usage_limit'])
+            for item_id in used_items if item_id in active_items
+        ]
+        if remaining:
+            execute_values(cur, """
+                UPDATE items 
+                SET usage_limit = v.usage_limit 
+                FROM (VALUES %s) AS v(item_id, usage_limit) 
+                WHERE items.item_id = v.item_id
+            """, remaining)
+        record_usage(cur, usage_events)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        expiry_index.invalidate()
+        if isinstance(e, JobStopped):
+            raise
+        return {"success": False, "message": str(e)}
+    finally:
+        cur.close()
+        conn.close()
     
-    conn.commit()
-    cur.close()
-    conn.close()
-    
-    return jsonify({
+    return {
         "success": True, 
         "daysSimulated": num_of_days,
         "changes": changes
-    })
+    }
 
-@app.route('/api/items', methods=['GET'])
-def get_items():
+@app.route('/api/simulate/day', methods=['POST'])
+@query_budget(12)
+def simulate_day():
+    data = request.json
+    if data.get('async'):
+        return submit_job('simulation', run_simulation, data)
+    return jsonify(run_simulation(data))
+
+# Listings: the whole table by default, a keyset page with ?limit=&cursor=,
+# or a JSON document streamed from a server-side cursor with ?stream=true
+LISTING_PAGE_MAX = int(os.getenv('LISTING_PAGE_MAX', 1000))
+LISTING_STREAM_BATCH = int(os.getenv('LISTING_STREAM_BATCH', 1000))
+LISTING_ARGS = ('limit', 'cursor', 'stream', 'zone', 'waste')
+
+ITEM_ORDER = (("priority", True), ("name", False), ("item_id", False))
+CONTAINER_ORDER = (("zone", False), ("container_id", False))
+
+def encode_cursor(row, order):
+    return base64.urlsafe_b64encode(json.dumps([row[column] for column, descending in order]).encode()).decode()
+
+def decode_cursor(token, order):
+    # Only the sort key values encode_cursor wrote for this order are accepted
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except ValueError:
+        values = None
+    if not (
+        isinstance(values, list) and len(values) == len(order)
+        and all(isinstance(value, (str, int, float)) and not isinstance(value, bool) for value in values)
+    ):
+        raise ValueError("Invalid cursor")
+    return values
+
+def keyset_after(order, values, alias=""):
+    # Rows strictly after values in the given order. The extra bound on the leading
+    # column gives the planner an index range to start from instead of a filter.
+    conditions, params = [], []
+    for depth in range(len(order) - 1, -1, -1):
+        column, descending = order[depth]
+        condition = f"{alias}{column} {'<' if descending else '>'} %s"
+        params[:0] = [values[depth]]
+        if conditions:
+            condition = f"({condition} OR ({alias}{column} = %s AND {conditions[0]}))"
+            params[1:1] = [values[depth]]
+        conditions = [condition]
+    column, descending = order[0]
+    return f"{alias}{column} {'<=' if descending else '>='} %s AND {conditions[0]}", [values[0]] + params
+
+def item_filters(alias=""):
+    # zone and waste (exclude, only, all) filters shared by the item listings
+    clauses, params = [], []
+    waste = request.args.get('waste', 'exclude')
+    if waste == 'exclude':
+        clauses.append(f"{alias}is_waste = FALSE")
+    elif waste == 'only':
+        clauses.append(f"{alias}is_waste = TRUE")
+    elif waste != 'all':
+        raise ValueError("waste must be exclude, only or all")
+    if request.args.get('zone'):
+        clauses.append(f"{alias}current_zone = %s")
+        params.append(request.args['zone'])
+    return clauses, params
+
+def listing_response(key, select, clauses, params, order, alias=""):
+    order_by = ", ".join(f"{alias}{column}{' DESC' if descending else ''}" for column, descending in order)
+    
+    if request.args.get('stream') == 'true':
+        query = select + (" WHERE " + " AND ".join(clauses) if clauses else "") + " ORDER BY " + order_by
+        
+        def generate():
+            conn = get_db_connection()
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            # Server-side cursor: at most LISTING_STREAM_BATCH rows are held at a time
+            rows = conn.cursor(name=f"listing_{uuid.uuid4().hex}", cursor_factory=RealDictCursor)
+            try:
+                yield '{"success": true, "version": %d, "%s": [' % (change_horizon(cur), key)
+                rows.execute(query, params)
+                separator = ""
+                while True:
+                    batch = rows.fetchmany(LISTING_STREAM_BATCH)
+                    if not batch:
+                        break
+                    yield separator + ",".join(app.json.dumps(row) for row in batch)
+                    separator = ","
+                yield "]}"
+            finally:
+                rows.close()
+                cur.close()
+                conn.close()
+        
+        return Response(stream_with_context(generate()), mimetype='application/json')
+    
+    limit = request.args.get('limit', type=int)
+    if limit is not None:
+        limit = max(1, min(limit, LISTING_PAGE_MAX))
+        if request.args.get('cursor'):
+            try:
+                values = decode_cursor(request.args['cursor'], order)
+            except ValueError as e:
+                return jsonify({"success": False, "message": str(e)}), 400
+            condition, after = keyset_after(order, values, alias)
+            clauses = clauses + [condition]
+            params = params + after
+    query = select + (" WHERE " + " AND ".join(clauses) if clauses else "") + " ORDER BY " + order_by
+    if limit is not None:
+        # One extra row tells whether there is a next page
+        query += " LIMIT %s"
+        params = params + [limit + 1]
+    
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        version = change_horizon(cur)
+        cur.execute(query, params)
+        rows = cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+    
+    response = {"success": True, "version": version, key: rows}
+    if limit is not None:
+        response[key] = rows[:limit]
+        response["nextCursor"] = encode_cursor(rows[limit - 1], order) if len(rows) > limit else None
+    return jsonify(response)
+
+@app.route('/api/items', methods=['GET'])
+@coalesce
+@query_budget(3)
+def get_items():
+    if read_model.fresh() and not any(arg in request.args for arg in LISTING_ARGS):
+        return jsonify({
+            "success": True,
+            "version": read_model.version,
+            "items": read_model.get_items()
+        })
     
     try:
-        cur.execute("""
+        clauses, params = item_filters()
+        return listing_response("items", """
             SELECT 
                 item_id,
                 name,
@@ -909,27 +3520,16 @@ def get_items():
                 preferred_zone,
                 current_zone,
                 is_waste
-            FROM items
-            WHERE is_waste = FALSE
-            ORDER BY priority DESC, name
-        """)
-        items = cur.fetchall()
-        
-        return jsonify({
-            "success": True,
-            "items": items
-        })
+            FROM items""", clauses, params, ITEM_ORDER)
     except Exception as e:
         return jsonify({
             "success": False,
             "message": str(e)
         })
-    finally:
-        cur.close()
-        conn.close()
         
 # Data Export/Import APIs
 @app.route('/api/import/containers', methods=['POST'])
+@query_budget(5)
 def import_containers():
     if 'file' not in request.files:
         return jsonify({"success": False, "message": "No file uploaded"})
@@ -943,21 +3543,18 @@ def import_containers():
     
     try:
         csv_reader = csv.DictReader(file.read().decode('utf-8').splitlines())
+        containers = []
         for row in csv_reader:
-            cur.execute(
+            width, depth, height = float(row['Width (cm)']), float(row['Depth (cm)']), float(row['Height (cm)'])
+            containers.append((row['Container ID'], row['Zone'], width, depth, height, width * depth * height))
+        if containers:
+            execute_values(
+                cur,
                 "INSERT INTO containers (container_id, zone, width, depth, height, available_volume) "
-                "VALUES (%s, %s, %s, %s, %s, %s * %s * %s) "
-                "ON CONFLICT (container_id) DO NOTHING",
-                (
-                    row['Container ID'],
-                    row['Zone'],
-                    float(row['Width (cm)']),
-                    float(row['Depth (cm)']),
-                    float(row['Height (cm)']),
-                    float(row['Width (cm)']),
-                    float(row['Depth (cm)']),
-                    float(row['Height (cm)'])
-                ))
+                "VALUES %s ON CONFLICT (container_id) DO NOTHING",
+                containers,
+                page_size=1000
+            )
         conn.commit()
         log_action("import", details="Containers imported")
         return jsonify({"success": True, "message": "Containers imported successfully"})
@@ -968,7 +3565,20 @@ def import_containers():
         cur.close()
         conn.close()
 
+# Dates in imported files: ISO, or month first as Postgres reads them with its default DateStyle
+IMPORT_DATE_FORMATS = ('%Y-%m-%d', '%m/%d/%Y', '%m-%d-%Y', '%Y/%m/%d')
+
+def parse_import_date(value):
+    # Stored as a date, so both backends hold ISO dates whatever the file used
+    for date_format in IMPORT_DATE_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date: {value}")
+
 @app.route('/api/import/items', methods=['POST'])
+@query_budget(5)
 def import_items():
     if 'file' not in request.files:
         return jsonify({"success": False, "message": "No file uploaded"})
@@ -982,29 +3592,38 @@ def import_items():
     
     try:
         csv_reader = csv.DictReader(file.read().decode('utf-8').splitlines())
+        items = []
         for row in csv_reader:
-            expiry_date = None if row['Expiry Date (ISO Format)'] == 'N/A' else row['Expiry Date (ISO Format)']
+            expiry_date = None if row['Expiry Date (ISO Format)'] == 'N/A' else parse_import_date(row['Expiry Date (ISO Format)'])
             usage_limit = None if row['Usage Limit'] == 'N/A' else int(row['Usage Limit'])
-            
-            cur.execute(
-                "INSERT INTO items (item_id, name, width, depth, height, mass, priority, "
-                "expiry_date, usage_limit, preferred_zone) "
-                "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s) "
-                "ON CONFLICT (item_id) DO NOTHING",
-                (
-                    row['Item ID'],
-                    row['Name'],
-                    float(row['Width (cm)']),
-                    float(row['Depth (cm)']),
-                    float(row['Height (cm)']),
-                    float(row['Mass (kg)']),
-                    int(row['Priority (1-100)']),
-                    expiry_date,
-                    usage_limit,
-                    row['Preferred Zone']
-                )
-            )
+            items.append((
+                row['Item ID'],
+                row['Name'],
+                float(row['Width (cm)']),
+                float(row['Depth (cm)']),
+                float(row['Height (cm)']),
+                float(row['Mass (kg)']),
+                int(row['Priority (1-100)']),
+                expiry_date,
+                usage_limit,
+                row['Preferred Zone']
+            ))
+        
+        # One multi-row INSERT per page; RETURNING skips rows that already existed
+        inserted = execute_values(
+            cur,
+            "INSERT INTO items (item_id, name, width, depth, height, mass, priority, "
+            "expiry_date, usage_limit, preferred_zone) "
+            "VALUES %s ON CONFLICT (item_id) DO NOTHING "
+            "RETURNING item_id, expiry_date",
+            items,
+            page_size=1000,
+            fetch=True
+        ) if items else []
+        imported_expiries = [row for row in inserted if row[1] is not None]
         conn.commit()
+        for item_id, expiry_date in imported_expiries:
+            expiry_index.schedule(item_id, expiry_date)
         log_action("import", details="Items imported")
         return jsonify({"success": True, "message": "Items imported successfully"})
     except Exception as e:
@@ -1015,6 +3634,7 @@ def import_items():
         conn.close()
 
 @app.route('/api/export/arrangement', methods=['GET'])
+@query_budget(5)
 def export_arrangement():
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
@@ -1071,13 +3691,168 @@ def export_arrangement():
         cur.close()
         conn.close()
 
+# Columnar exports: Arrow IPC stream or Parquet, written one batch at a time
+EXPORT_BATCH_ROWS = int(os.getenv('EXPORT_BATCH_ROWS', 65536))
+
+EXPORT_DATASETS = {
+    'placements': {
+        'table': 'placements',
+        'time_column': 'placed_at',
+        'columns': {
+            'placement_id': ('placement_id', pa.int64()),
+            'item_id': ('item_id', pa.string()),
+            'container_id': ('container_id', pa.string()),
+            'start_width': ("(start_coordinates->>'width')::float", pa.float64()),
+            'start_depth': ("(start_coordinates->>'depth')::float", pa.float64()),
+            'start_height': ("(start_coordinates->>'height')::float", pa.float64()),
+            'end_width': ("(end_coordinates->>'width')::float", pa.float64()),
+            'end_depth': ("(end_coordinates->>'depth')::float", pa.float64()),
+            'end_height': ("(end_coordinates->>'height')::float", pa.float64()),
+            'placed_at': ('placed_at', pa.timestamp('us')),
+        },
+    },
+    'logs': {
+        'table': 'logs',
+        'time_column': 'logged_at',
+        'columns': {
+            'log_id': ('log_id', pa.int64()),
+            'action_type': ('action_type', pa.string()),
+            'item_id': ('item_id', pa.string()),
+            'user_id': ('user_id', pa.string()),
+            'details': ('details', pa.string()),
+            'logged_at': ('logged_at', pa.timestamp('us')),
+        },
+    },
+    'retrievals': {
+        'table': 'retrievals',
+        'time_column': 'retrieved_at',
+        'columns': {
+            'retrieval_id': ('retrieval_id', pa.int64()),
+            'item_id': ('item_id', pa.string()),
+            'user_id': ('user_id', pa.string()),
+            'steps': ('steps', pa.int64()),
+            'from_container': ('from_container', pa.string()),
+            'to_container': ('to_container', pa.string()),
+            'retrieved_at': ('retrieved_at', pa.timestamp('us')),
+        },
+    },
+    'waste': {
+        'table': 'waste',
+        'time_column': 'marked_at',
+        'columns': {
+            'waste_id': ('waste_id', pa.int64()),
+            'item_id': ('item_id', pa.string()),
+            'reason': ('reason', pa.string()),
+            'marked_at': ('marked_at', pa.timestamp('us')),
+        },
+    },
+}
+
+class ExportSink:
+    # File-like target for pyarrow writers; drain() hands back what was written since the last call
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+@app.route('/api/export/<dataset>', methods=['GET'])
+def export_dataset(dataset):
+    spec = EXPORT_DATASETS.get(dataset)
+    if spec is None:
+        return jsonify({"success": False, "message": f"Unknown dataset: {dataset}"}), 400
+    
+    export_format = request.args.get('format', 'arrow')
+    if export_format not in ('arrow', 'parquet'):
+        return jsonify({"success": False, "message": "format must be arrow or parquet"}), 400
+    
+    columns = request.args.get('columns')
+    columns = [column.strip() for column in columns.split(',')] if columns else list(spec['columns'])
+    unknown = [column for column in columns if column not in spec['columns']]
+    if unknown:
+        return jsonify({"success": False, "message": f"Unknown columns: {', '.join(unknown)}"}), 400
+    
+    # Only the projected columns are read; the time range prunes log partitions
+    query = "SELECT " + ", ".join(f"{spec['columns'][column][0]} AS {column}" for column in columns)
+    query += f" FROM {spec['table']} WHERE TRUE"
+    params = []
+    if request.args.get('from'):
+        query += f" AND {spec['time_column']} >= %s::timestamp"
+        params.append(request.args['from'])
+    if request.args.get('to'):
+        query += f" AND {spec['time_column']} < %s::timestamp"
+        params.append(request.args['to'])
+    
+    schema = pa.schema([(column, spec['columns'][column][1]) for column in columns])
+    log_action("export", details=f"Exported {dataset} as {export_format}")
+    
+    def generate():
+        conn = get_db_connection()
+        # Server-side cursor: rows arrive EXPORT_BATCH_ROWS at a time
+        cur = conn.cursor(name=f"export_{uuid.uuid4().hex}")
+        sink = ExportSink()
+        writer = pa.ipc.new_stream(sink, schema) if export_format == 'arrow' else pq.ParquetWriter(sink, schema)
+        try:
+            cur.execute(query, params)
+            while True:
+                rows = cur.fetchmany(EXPORT_BATCH_ROWS)
+                if not rows:
+                    break
+                batch = pa.record_batch(
+                    [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)],
+                    schema=schema
+                )
+                writer.write_batch(batch)
+                yield sink.drain()
+            writer.close()
+            yield sink.drain()
+        finally:
+            cur.close()
+            conn.close()
+    
+    extension, mimetype = ('arrow', 'application/vnd.apache.arrow.stream') if export_format == 'arrow' else ('parquet', 'application/vnd.apache.parquet')
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={dataset}.{extension}'}
+    )
+
 @app.route('/api/containers', methods=['GET'])
+@coalesce
+@query_budget(3)
 def get_containers():
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    if read_model.fresh() and not any(arg in request.args for arg in LISTING_ARGS):
+        return jsonify({
+            "success": True,
+            "version": read_model.version,
+            "containers": read_model.get_containers()
+        })
     
     try:
-        cur.execute("""
+        clauses, params = [], []
+        if request.args.get('zone'):
+            clauses.append("zone = %s")
+            params.append(request.args['zone'])
+        return listing_response("containers", """
             SELECT 
                 container_id, 
                 zone, 
@@ -1086,31 +3861,23 @@ def get_containers():
                 height, 
                 available_volume,
                 width * depth * height AS total_volume
-            FROM containers
-            ORDER BY zone, container_id
-        """)
-        containers = cur.fetchall()
-        
-        return jsonify({
-            "success": True,
-            "containers": containers
-        })
+            FROM containers""", clauses, params, CONTAINER_ORDER)
     except Exception as e:
         return jsonify({
             "success": False,
             "message": str(e)
         })
-    finally:
-        cur.close()
-        conn.close()
 
 
 @app.route('/api/containers/with-items', methods=['GET'])
+@coalesce
+@query_budget(3)
 def get_containers_with_items():
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
     
     try:
+        version = change_horizon(cur)
         cur.execute("""
             SELECT 
                 c.container_id,
@@ -1147,14 +3914,19 @@ def get_containers_with_items():
         
         # Parse JSON coordinates
         for container in containers:
+            if isinstance(container['items'], str):
+                container['items'] = json.loads(container['items'])
             for item in container['items']:
                 if isinstance(item['start_coordinates'], str):
                     item['start_coordinates'] = json.loads(item['start_coordinates'])
                 if isinstance(item['end_coordinates'], str):
                     item['end_coordinates'] = json.loads(item['end_coordinates'])
+                # sqlite's json_object has no booleans
+                item['is_waste'] = bool(item['is_waste'])
         
         return jsonify({
             "success": True,
+            "version": version,
             "containers": containers
         })
     except Exception as e:
@@ -1167,12 +3939,21 @@ def get_containers_with_items():
         conn.close()
 
 @app.route('/api/items/unplaced', methods=['GET'])
+@coalesce
+@query_budget(3)
 def get_unplaced_items():
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    if read_model.fresh() and not any(arg in request.args for arg in LISTING_ARGS):
+        return jsonify({
+            "success": True,
+            "version": read_model.version,
+            "items": read_model.get_unplaced_items()
+        })
     
     try:
-        cur.execute("""
+        clauses, params = item_filters("i.")
+        # Anti-join as NOT EXISTS: one probe of idx_placements_item per candidate item
+        clauses.append("NOT EXISTS (SELECT 1 FROM placements p WHERE p.item_id = i.item_id)")
+        return listing_response("items", """
             SELECT 
                 i.item_id,
                 i.name,
@@ -1184,29 +3965,44 @@ def get_unplaced_items():
                 i.expiry_date,
                 i.usage_limit,
                 i.preferred_zone
-            FROM items i
-            LEFT JOIN placements p ON i.item_id = p.item_id
-            WHERE p.item_id IS NULL
-            AND i.is_waste = FALSE
-            ORDER BY i.priority DESC
-        """)
-        items = cur.fetchall()
-        
+            FROM items i""", clauses, params, ITEM_ORDER, "i.")
+    except Exception as e:
         return jsonify({
-            "success": True,
-            "items": items
+            "success": False,
+            "message": str(e)
         })
+
+# Module API
+@app.route('/api/modules', methods=['GET'])
+@coalesce
+def get_modules():
+    def summarize(shard):
+        conn = get_db_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            cur.execute("""
+                SELECT
+                    (SELECT COUNT(*) FROM items WHERE is_waste = FALSE) AS items,
+                    (SELECT COUNT(*) FROM containers) AS containers,
+                    (SELECT COALESCE(SUM(width * depth * height), 0) FROM containers) AS capacity
+            """)
+            return {"module": shard, **cur.fetchone()}
+        finally:
+            cur.close()
+            conn.close()
+    
+    try:
+        return jsonify({"success": True, "default": DEFAULT_SHARD, "modules": scatter(summarize)})
     except Exception as e:
         return jsonify({
             "success": False,
             "message": str(e)
         })
-    finally:
-        cur.close()
-        conn.close()
 
 # Logging API
 @app.route('/api/logs', methods=['GET'])
+@coalesce
+@query_budget(3)
 def get_logs():
     start_date = request.args.get('startDate')
     end_date = request.args.get('endDate')
@@ -1222,11 +4018,12 @@ def get_logs():
     query = "SELECT * FROM logs WHERE TRUE"
     params = []
     
+    # Typed time bounds let the planner prune monthly partitions outside the range
     if start_date:
-        query += " AND logged_at >= %s"
+        query += " AND logged_at >= %s::timestamp"
         params.append(start_date)
     if end_date:
-        query += " AND logged_at <= %s"
+        query += " AND logged_at <= %s::timestamp"
         params.append(end_date)
     if item_id:
         query += " AND item_id = %s"
@@ -1245,14 +4042,14 @@ def get_logs():
     logs = cur.fetchall()
     
     # Get total count for pagination
-    count_query = "SELECT COUNT(*) FROM logs WHERE TRUE"
+    count_query = "SELECT COUNT(*) AS count FROM logs WHERE TRUE"
     count_params = []
     
     if start_date:
-        count_query += " AND logged_at >= %s"
+        count_query += " AND logged_at >= %s::timestamp"
         count_params.append(start_date)
     if end_date:
-        count_query += " AND logged_at <= %s"
+        count_query += " AND logged_at <= %s::timestamp"
         count_params.append(end_date)
     if item_id:
         count_query += " AND item_id = %s"
@@ -1278,5 +4075,452 @@ def get_logs():
         "offset": offset
     })
 
+@app.route('/api/logs/rollups', methods=['GET'])
+@query_budget(2)
+def get_log_rollups():
+    start_date = request.args.get('startDate')
+    end_date = request.args.get('endDate')
+    item_id = request.args.get('itemId')
+    user_id = request.args.get('userId')
+    action_type = request.args.get('actionType')
+    group_by = [
+        column for column in request.args.get('groupBy', 'day,action_type').split(',')
+        if column in ('day', 'action_type', 'user_id', 'item_id')
+    ] or ['day', 'action_type']
+    
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    
+    # Pre-aggregated daily counts, so dashboards never scan the logs partitions
+    columns = ", ".join(group_by)
+    query = f"SELECT {columns}, SUM(count) AS count FROM log_daily_rollups WHERE TRUE"
+    params = []
+    
+    if start_date:
+        query += " AND day >= %s::date"
+        params.append(start_date)
+    if end_date:
+        query += " AND day <= %s::date"
+        params.append(end_date)
+    if item_id:
+        query += " AND item_id = %s"
+        params.append(item_id)
+    if user_id:
+        query += " AND user_id = %s"
+        params.append(user_id)
+    if action_type:
+        query += " AND action_type = %s"
+        params.append(action_type)
+    
+    query += f" GROUP BY {columns} ORDER BY {columns}"
+    
+    try:
+        cur.execute(query, params)
+        rollups = cur.fetchall()
+        return jsonify({
+            "success": True,
+            "rollups": rollups
+        })
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        })
+    finally:
+        cur.close()
+        conn.close()
+
+class ChangeNotifier:
+    """
+    One polling thread per process and module watches the newest change_feed
+    version and wakes every waiting change stream, so streams cost no queries
+    while idle.
+    """
+    def __init__(self, shard):
+        self.shard = shard
+        self.version = 0
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def start(self):
+        with self.condition:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                conn = get_db_connection(self.shard)
+                cur = conn.cursor(cursor_factory=RealDictCursor)
+                cur.execute("SELECT COALESCE(MAX(version), 0) AS version FROM change_feed")
+                version = cur.fetchone()['version']
+                cur.close()
+                conn.close()
+                if version != self.version:
+                    with self.condition:
+                        self.version = version
+                        self.condition.notify_all()
+            except Exception:
+                app.logger.exception("Change notifier failed")
+            time.sleep(CHANGE_FEED_POLL_INTERVAL)
+
+    def wait(self, seen, timeout):
+        # Returns the newest version once it differs from seen, or after timeout
+        with self.condition:
+            self.condition.wait_for(lambda: self.version != seen, timeout)
+            return self.version
+
+change_notifier = ShardLocal(ChangeNotifier)
+
+# Change Feed APIs
+@app.route('/api/changes', methods=['GET'])
+@coalesce
+@query_budget(6)
+def get_changes():
+    since = request.args.get('since', type=int)
+    
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    
+    try:
+        if since is None:
+            # No cursor yet: load the listings, then follow from this version
+            return jsonify({"success": True, "version": change_horizon(cur), "resync": True, "changes": []})
+        return jsonify({"success": True, **read_changes(cur, since)})
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        })
+    finally:
+        cur.close()
+        conn.close()
+
+@app.route('/api/changes/stream', methods=['GET'])
+def stream_changes():
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', type=int)
+    change_notifier.start()
+    
+    def generate():
+        nonlocal since
+        seen = change_notifier.version
+        yield "retry: 2000\n\n"
+        while True:
+            conn = get_db_connection()
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            try:
+                if since is None:
+                    payload = {"version": change_horizon(cur), "resync": True, "changes": []}
+                else:
+                    payload = read_changes(cur, since)
+            finally:
+                cur.close()
+                conn.close()
+            
+            if payload['changes'] or payload['resync']:
+                yield f"id: {payload['version']}\nevent: changes\ndata: {app.json.dumps(payload)}\n\n"
+            else:
+                yield ": keepalive\n\n"
+            since = payload['version']
+            # Wakes on the next committed change, or re-checks after the keepalive interval
+            seen = change_notifier.wait(seen, CHANGE_STREAM_KEEPALIVE)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+# Forecast API
+@app.route('/api/forecast', methods=['GET'])
+@coalesce
+@query_budget(2)
+def get_forecast():
+    days = request.args.get('days', default=30, type=int)
+    
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    
+    try:
+        # Both halves are range scans on an index; no history is replayed
+        cur.execute("""
+            WITH upcoming AS (
+                SELECT s.item_id, 'depleting' AS kind, s.projected_depletion_date AS on_date
+                FROM item_usage_stats s
+                WHERE s.projected_depletion_date <= CURRENT_DATE + %s
+                UNION ALL
+                SELECT i.item_id, 'expiring' AS kind, i.expiry_date AS on_date
+                FROM items i
+                WHERE i.is_waste = FALSE AND i.expiry_date IS NOT NULL
+                AND i.expiry_date <= CURRENT_DATE + %s
+            )
+            SELECT u.kind, u.on_date, i.item_id, i.name,
+                COALESCE(i.current_zone, i.preferred_zone) AS zone
+            FROM upcoming u
+            JOIN items i ON i.item_id = u.item_id
+            WHERE i.is_waste = FALSE
+            ORDER BY u.on_date, i.item_id
+        """, (days, days))
+        
+        forecast = {"depleting": [], "expiring": []}
+        zones = defaultdict(lambda: {"depleting": 0, "expiring": 0})
+        for row in cur.fetchall():
+            forecast[row['kind']].append({
+                "itemId": row['item_id'],
+                "name": row['name'],
+                "zone": row['zone'],
+                "date": row['on_date'].isoformat()
+            })
+            zones[row['zone']][row['kind']] += 1
+        
+        return jsonify({
+            "success": True,
+            "days": days,
+            "depletingCount": len(forecast["depleting"]),
+            "expiringCount": len(forecast["expiring"]),
+            "zones": zones,
+            "depleting": forecast["depleting"],
+            "expiring": forecast["expiring"]
+        })
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        })
+    finally:
+        cur.close()
+        conn.close()
+
+# Capacity forecast: Monte Carlo over consumption and resupply
+CAPACITY_FORECAST_MAX_TRAJECTORIES = int(os.getenv('CAPACITY_FORECAST_MAX_TRAJECTORIES', 20000))
+CAPACITY_FORECAST_CHUNK = 100
+
+def snapshot_capacity():
+    # Containers with their used width, and every stored item with what decides when it leaves
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        containers = load_containers_for_placement(cur)
+        cur.execute("""
+            SELECT p.container_id,
+                (p.end_coordinates->>'width')::float - (p.start_coordinates->>'width')::float AS width,
+                i.width * i.depth * i.height AS volume,
+                i.expiry_date,
+                COALESCE(s.remaining_uses, i.usage_limit) AS remaining_uses,
+                COALESCE(s.usage_rate, 0) AS usage_rate,
+                COALESCE(s.total_uses, 0) AS total_uses,
+                s.last_used_at
+            FROM placements p
+            JOIN items i ON i.item_id = p.item_id
+            LEFT JOIN item_usage_stats s ON s.item_id = i.item_id
+            WHERE i.is_waste = FALSE
+            AND p.placement_id = (SELECT MAX(q.placement_id) FROM placements q WHERE q.item_id = p.item_id)
+        """)
+        rows = cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+    
+    now = datetime.now()
+    today = now.date()
+    return {
+        "containers": containers,
+        "container": [row['container_id'] for row in rows],
+        "width": np.array([float(row['width']) for row in rows]),
+        "volume": np.array([float(row['volume']) for row in rows]),
+        "expires_in": np.array([
+            float((row['expiry_date'] - today).days) if row['expiry_date'] else math.inf
+            for row in rows
+        ]),
+        "remaining": np.array([
+            float(row['remaining_uses']) if row['remaining_uses'] is not None else math.inf
+            for row in rows
+        ]),
+        # Stored rates are as of the last use; decay them to now like record_usage does
+        "rate": np.array([
+            float(row['usage_rate']) * math.exp(-(now - row['last_used_at']).total_seconds() / 86400 / USAGE_RATE_WINDOW_DAYS)
+            if row['last_used_at'] else 0.0
+            for row in rows
+        ]),
+        "observations": np.array([float(row['total_uses']) for row in rows])
+    }
+
+def sample_free_days(rng, snapshot, trajectories):
+    """
+    Day each stored item leaves its container, per trajectory: the earlier of its
+    expiry and running out of uses. The rate is drawn around the observed rate,
+    tighter the more uses were observed, and the remaining uses then take a
+    Gamma-distributed time (the wait for that many Poisson events).
+    """
+    free = np.repeat(snapshot['expires_in'][:, None], trajectories, axis=1)
+    remaining, rate = snapshot['remaining'], snapshot['rate']
+    free[remaining <= 0] = 0.0
+    consumable = np.isfinite(remaining) & (remaining > 0) & (rate > 0)
+    if consumable.any():
+        shape = snapshot['observations'][consumable][:, None] + 1
+        sampled_rate = rng.gamma(shape, rate[consumable][:, None] / shape, (int(consumable.sum()), trajectories))
+        depletion = rng.gamma(remaining[consumable][:, None], 1 / sampled_rate)
+        free[consumable] = np.minimum(free[consumable], depletion)
+    return free
+
+def sample_arrivals(rng, manifests, days):
+    # (day, manifest) for every resupply that actually arrives within the horizon
+    arrivals = []
+    for index, manifest in enumerate(manifests):
+        every = float(manifest.get('everyDays') or 0)
+        first = float(manifest.get('firstDay', every))
+        nominal = np.arange(first, days + 1e-9, every) if every > 0 else np.array([first])
+        actual = nominal + rng.normal(0, float(manifest.get('jitterDays', 0)), len(nominal))
+        arrived = rng.random(len(nominal)) < float(manifest.get('probability', 1))
+        arrivals.extend((max(0.0, day), index) for day in actual[arrived] if day <= days)
+    arrivals.sort()
+    return arrivals
+
+def simulate_capacity_chunk(snapshot, manifests, days, seed, trajectories):
+    """
+    Runs trajectories against in-memory copies of the container table. Returns
+    the zone names and a (trajectories, zones + 1) array with the first day an
+    arriving item could not go into its preferred zone, and in the last column
+    the first day one could not be placed at all (inf when it never happened).
+    """
+    rng = np.random.default_rng(seed)
+    base = ContainerTable(snapshot['containers'])
+    rows = {container_id: row for row, container_id in enumerate(base.ids)}
+    item_rows = np.array([rows[container_id] for container_id in snapshot['container']], dtype=np.intp)
+    free_days = sample_free_days(rng, snapshot, trajectories)
+    
+    # One record per delivered unit, in placement order; zones are interned before cloning
+    deliveries = []
+    for manifest in manifests:
+        records = []
+        for item in manifest.get('items', []):
+            for unit in range(int(item.get('quantity', 1))):
+                record = base.make_item({
+                    "itemId": f"{item.get('itemId', item['name'])}#{unit}",
+                    "name": item['name'],
+                    "width": item['width'],
+                    "depth": item['depth'],
+                    "height": item['height'],
+                    "priority": item.get('priority', 50),
+                    "preferredZone": item['preferredZone']
+                })
+                records.append((record, item.get('usageLimit'), item.get('usesPerDay'), item.get('expiryDays')))
+        records.sort(key=lambda entry: (-entry[0].priority, -entry[0].volume))
+        deliveries.append(records)
+    
+    zones = len(base.zone_names)
+    # A trajectory can stop once every zone that gets deliveries, and the station, has overflowed
+    outcomes = len({record.zone for records in deliveries for record, *lifetime in records}) + 1
+    overflow = np.full((trajectories, zones + 1), math.inf)
+    for trajectory in range(trajectories):
+        table = base.clone()
+        leaving = []
+        previous = -1.0
+        for day, manifest in sample_arrivals(rng, manifests, days):
+            if np.isfinite(overflow[trajectory]).sum() == outcomes:
+                break
+            # Stored items gone since the previous arrival, released per container in one pass
+            gone = (free_days[:, trajectory] > previous) & (free_days[:, trajectory] <= day)
+            if gone.any():
+                widths = np.bincount(item_rows[gone], weights=snapshot['width'][gone], minlength=len(base.ids))
+                volumes = np.bincount(item_rows[gone], weights=snapshot['volume'][gone], minlength=len(base.ids))
+                for row in np.flatnonzero(widths):
+                    table.release(row, widths[row], volumes[row])
+            while leaving and leaving[0][0] <= day:
+                left, row, width, volume = heapq.heappop(leaving)
+                table.release(row, width, volume)
+            previous = day
+            
+            for record, usage_limit, uses_per_day, expiry_days in deliveries[manifest]:
+                slot = table.place(record)
+                if slot is None or table.zones[slot[0]] != record.zone:
+                    overflow[trajectory, record.zone] = min(overflow[trajectory, record.zone], day)
+                if slot is None:
+                    overflow[trajectory, zones] = min(overflow[trajectory, zones], day)
+                    continue
+                stay = float(expiry_days) if expiry_days is not None else math.inf
+                if usage_limit and uses_per_day:
+                    stay = min(stay, rng.gamma(float(usage_limit), 1 / float(uses_per_day)))
+                if day + stay <= days:
+                    heapq.heappush(leaving, (day + stay, slot[0], slot[2], record.volume))
+    return base.zone_names, overflow
+
+def run_capacity_forecast(data, job=None):
+    days = int(data.get('days', 180))
+    trajectories = max(1, min(int(data.get('trajectories', 1000)), CAPACITY_FORECAST_MAX_TRAJECTORIES))
+    confidence = float(data.get('confidence', 0.9))
+    manifests = data.get('resupply', [])
+    
+    try:
+        snapshot = snapshot_capacity()
+        
+        # Independent random streams per chunk, reproducible from the seed
+        sizes = [CAPACITY_FORECAST_CHUNK] * (trajectories // CAPACITY_FORECAST_CHUNK)
+        if trajectories % CAPACITY_FORECAST_CHUNK:
+            sizes.append(trajectories % CAPACITY_FORECAST_CHUNK)
+        seeds = np.random.SeedSequence(data.get('seed')).spawn(len(sizes))
+        if len(sizes) == 1:
+            results = [simulate_capacity_chunk(snapshot, manifests, days, seeds[0], sizes[0])]
+        else:
+            pool = get_scenario_pool()
+            futures = [pool.submit(simulate_capacity_chunk, snapshot, manifests, days, seed, size) for seed, size in zip(seeds, sizes)]
+            results = []
+            try:
+                for done, future in enumerate(futures):
+                    results.append(future.result())
+                    if job:
+                        job.check()
+                        job.report(trajectories=sum(sizes[:done + 1]), of=trajectories)
+            finally:
+                for future in futures:
+                    future.cancel()
+        
+        zone_names = results[0][0]
+        overflow = np.concatenate([days_matrix for names, days_matrix in results])
+        start_date = datetime.now().date()
+        z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+        quantiles = ((1 - confidence) / 2, 0.5, (1 + confidence) / 2)
+        
+        def summarize(days_column):
+            # Wilson interval for the probability; day quantiles past the horizon are null
+            hits = int(np.isfinite(days_column).sum())
+            share = hits / trajectories
+            center = (share + z * z / (2 * trajectories)) / (1 + z * z / trajectories)
+            spread = z * math.sqrt(share * (1 - share) / trajectories + z * z / (4 * trajectories ** 2)) / (1 + z * z / trajectories)
+            days_at = [float(value) if np.isfinite(value) else None for value in np.quantile(days_column, quantiles, method='inverted_cdf')]
+            return {
+                "overflowProbability": share,
+                "probabilityInterval": [max(0.0, center - spread), min(1.0, center + spread)],
+                "overflowDay": dict(zip(("low", "median", "high"), days_at)),
+                "overflowDate": dict(zip(
+                    ("low", "median", "high"),
+                    [(start_date + timedelta(days=math.ceil(day))).isoformat() if day is not None else None for day in days_at]
+                ))
+            }
+        
+        return {
+            "success": True,
+            "days": days,
+            "trajectories": trajectories,
+            "confidence": confidence,
+            "zones": [{"zone": zone, **summarize(overflow[:, index])} for index, zone in enumerate(zone_names)],
+            "station": summarize(overflow[:, len(zone_names)])
+        }
+    except JobStopped:
+        raise
+    except Exception as e:
+        return {"success": False, "message": str(e)}
+
+@app.route('/api/forecast/capacity', methods=['POST'])
+@query_budget(2)
+def capacity_forecast():
+    data = request.get_json(silent=True) or {}
+    if data.get('async'):
+        return submit_job('forecast', run_capacity_forecast, data)
+    return jsonify(run_capacity_forecast(data))
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8000)
\ No newline at end of file
@@ -0,0 +1,247 @@
+-- Schema for the embedded backend (STORAGE_BACKEND=sqlite), loaded by server.py on first connection.
+-- Mirrors psql.sql; logs are not partitioned and there are no LISTEN/NOTIFY triggers.
+-- Writers are serialized here, so change_feed txids simply count up. Each changed row
+-- gets its own txid (MAX + 1), so one transaction spans several txids; a reader only
+-- sees them once the transaction commits, all at once, and only ever hands out
+-- horizons above them, so a transaction's changes never straddle a client's version.
+
+
+CREATE TABLE IF NOT EXISTS items (
+    item_id VARCHAR(50) PRIMARY KEY, -- Unique identifier for the item
+    name VARCHAR(100) NOT NULL, -- Name of the item
+    width NUMERIC NOT NULL, -- Width of the item (cm)
+    depth NUMERIC NOT NULL, -- Depth of the item (cm)
+    height NUMERIC NOT NULL, -- Height of the item (cm)
+    mass NUMERIC NOT NULL, -- Mass of the item (kg)
+    priority INTEGER NOT NULL CHECK (priority BETWEEN 1 AND 100), -- Priority (1-100)
+    expiry_date DATE, -- Expiry date of the item (if applicable)
+    usage_limit INTEGER, -- Number of uses remaining
+    preferred_zone VARCHAR(50) NOT NULL, -- Preferred zone for placement
+    current_zone VARCHAR(50), -- Current zone where the item is placed
+    is_waste BOOLEAN DEFAULT FALSE -- Whether the item is marked as waste
+);
+
+CREATE INDEX IF NOT EXISTS idx_items_expiry ON items (expiry_date) WHERE is_waste = FALSE AND expiry_date IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_items_listing ON items (is_waste, priority DESC, name, item_id);
+CREATE INDEX IF NOT EXISTS idx_items_zone_listing ON items (current_zone, is_waste, priority DESC, name, item_id);
+
+
+CREATE TABLE IF NOT EXISTS containers (
+    container_id VARCHAR(50) PRIMARY KEY, -- Unique identifier for the container
+    zone VARCHAR(50) NOT NULL, -- Zone where the container is located
+    width NUMERIC NOT NULL, -- Width of the container (cm)
+    depth NUMERIC NOT NULL, -- Depth of the container (cm)
+    height NUMERIC NOT NULL, -- Height of the container (cm)
+    available_volume NUMERIC NOT NULL -- Available volume in the container (cm³)
+);
+
+CREATE INDEX IF NOT EXISTS idx_containers_zone ON containers (zone, container_id);
+
+
+CREATE TABLE IF NOT EXISTS placements (
+    placement_id INTEGER PRIMARY KEY AUTOINCREMENT, -- Unique identifier for the placement
+    item_id VARCHAR(50) REFERENCES items(item_id) ON DELETE CASCADE, -- Item placed
+    container_id VARCHAR(50) REFERENCES containers(container_id) ON DELETE CASCADE, -- Container where the item is placed
+    start_coordinates JSON NOT NULL, -- Start coordinates of the item (width, depth, height)
+    end_coordinates JSON NOT NULL, -- End coordinates of the item (width, depth, height)
+    placed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP -- Timestamp when the item was placed
+);
+
+-- Latest placement per item and everything placed in a container
+CREATE INDEX IF NOT EXISTS idx_placements_item ON placements (item_id, placement_id);
+CREATE INDEX IF NOT EXISTS idx_placements_container ON placements (container_id);
+
+
+CREATE TABLE IF NOT EXISTS retrievals (
+    retrieval_id INTEGER PRIMARY KEY AUTOINCREMENT, -- Unique identifier for the retrieval
+    item_id VARCHAR(50) REFERENCES items(item_id) ON DELETE CASCADE, -- Item retrieved
+    user_id VARCHAR(50) NOT NULL, -- Astronaut who retrieved the item
+    retrieved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, -- Timestamp of retrieval
+    steps INTEGER NOT NULL, -- Number of steps required for retrieval
+    from_container VARCHAR(50) REFERENCES containers(container_id) ON DELETE SET NULL, -- Container from which the item was retrieved
+    to_container VARCHAR(50) REFERENCES containers(container_id) ON DELETE SET NULL -- Container where the item was placed back (if applicable)
+);
+
+
+CREATE TABLE IF NOT EXISTS waste (
+    waste_id INTEGER PRIMARY KEY AUTOINCREMENT, -- Unique identifier for the waste entry
+    item_id VARCHAR(50) REFERENCES items(item_id) ON DELETE CASCADE, -- Item marked as waste
+    reason VARCHAR(100) NOT NULL, -- Reason for marking as waste (e.g., "Expired", "Out of Uses")
+    marked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP -- Timestamp when the item was marked as waste
+);
+
+
+CREATE TABLE IF NOT EXISTS item_usage_stats (
+    item_id VARCHAR(50) PRIMARY KEY REFERENCES items(item_id) ON DELETE CASCADE, -- Item the statistics describe
+    total_uses INTEGER NOT NULL DEFAULT 0, -- Uses recorded so far (retrievals and simulated use)
+    usage_rate NUMERIC NOT NULL DEFAULT 0, -- Exponentially decaying uses per day as of last_used_at
+    last_used_at TIMESTAMP NOT NULL, -- Time of the most recent use
+    remaining_uses INTEGER, -- Uses left after the most recent use (NULL when unlimited)
+    projected_depletion_date DATE GENERATED ALWAYS AS (
+        CASE WHEN remaining_uses IS NULL OR usage_rate <= 0 THEN NULL
+        ELSE date(last_used_at, '+' || (
+            CAST(remaining_uses / usage_rate AS INTEGER)
+            + (remaining_uses / usage_rate > CAST(remaining_uses / usage_rate AS INTEGER))
+        ) || ' days') END
+    ) STORED -- When the item runs out at the current rate
+);
+
+CREATE INDEX IF NOT EXISTS idx_usage_stats_depletion ON item_usage_stats (projected_depletion_date);
+
+
+CREATE TABLE IF NOT EXISTS return_plans (
+    plan_id INTEGER PRIMARY KEY AUTOINCREMENT, -- Unique identifier for the return plan
+    undocking_container_id VARCHAR(50) REFERENCES containers(container_id) ON DELETE SET NULL, -- Container used for undocking
+    undocking_date DATE NOT NULL, -- Date of undocking
+    max_weight NUMERIC NOT NULL, -- Maximum weight limit for the undocking container
+    total_volume NUMERIC NOT NULL, -- Total volume of waste in the plan
+    total_weight NUMERIC NOT NULL, -- Total weight of waste in the plan
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP -- Timestamp when the plan was created
+);
+
+
+CREATE TABLE IF NOT EXISTS return_plan_items (
+    plan_id INTEGER REFERENCES return_plans(plan_id) ON DELETE CASCADE, -- Return plan the item belongs to
+    item_id VARCHAR(50) REFERENCES items(item_id) ON DELETE CASCADE, -- Waste item selected for return
+    PRIMARY KEY (plan_id, item_id)
+);
+
+
+CREATE TABLE IF NOT EXISTS undocked_items (
+    undocked_id INTEGER PRIMARY KEY AUTOINCREMENT, -- Unique identifier for the archive entry
+    plan_id INTEGER REFERENCES return_plans(plan_id) ON DELETE SET NULL, -- Return plan that removed the item
+    item_id VARCHAR(50) NOT NULL, -- Item that left the station (no FK, the item row is deleted)
+    name VARCHAR(100) NOT NULL, -- Name of the item
+    mass NUMERIC NOT NULL, -- Mass of the item (kg)
+    volume NUMERIC NOT NULL, -- Volume of the item (cm³)
+    container_id VARCHAR(50), -- Container the item was placed in, if any
+    undocked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP -- Timestamp of the undocking
+);
+
+
+CREATE TABLE IF NOT EXISTS logs (
+    log_id INTEGER PRIMARY KEY AUTOINCREMENT, -- Unique identifier for the log entry
+    action_type VARCHAR(50) NOT NULL, -- Type of action (e.g., "placement", "retrieval", "rearrangement", "disposal")
+    item_id VARCHAR(50) REFERENCES items(item_id) ON DELETE SET NULL, -- Item involved in the action
+    user_id VARCHAR(50), -- Astronaut who performed the action
+    details TEXT, -- Additional details about the action
+    logged_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP -- Timestamp of the action
+);
+
+CREATE INDEX IF NOT EXISTS idx_logs_logged_at ON logs (logged_at);
+
+
+CREATE TABLE IF NOT EXISTS log_daily_rollups (
+    day DATE NOT NULL, -- Day the actions were logged
+    action_type VARCHAR(50) NOT NULL, -- Type of action
+    user_id VARCHAR(50) NOT NULL DEFAULT '', -- Astronaut ('' when none)
+    item_id VARCHAR(50) NOT NULL DEFAULT '', -- Item ('' when none, no FK so counts outlive the item)
+    count BIGINT NOT NULL DEFAULT 0, -- Number of log entries
+    PRIMARY KEY (day, action_type, user_id, item_id)
+);
+
+-- Keeps log_daily_rollups current as log entries are written
+CREATE TRIGGER IF NOT EXISTS logs_rollup
+    AFTER INSERT ON logs
+BEGIN
+    INSERT INTO log_daily_rollups (day, action_type, user_id, item_id, count)
+    VALUES (date(NEW.logged_at), NEW.action_type, COALESCE(NEW.user_id, ''), COALESCE(NEW.item_id, ''), 1)
+    ON CONFLICT (day, action_type, user_id, item_id)
+    DO UPDATE SET count = count + 1;
+END;
+
+
+CREATE TABLE IF NOT EXISTS change_feed (
+    version INTEGER PRIMARY KEY AUTOINCREMENT, -- Order in which the change was recorded
+    txid INTEGER NOT NULL, -- Stands in for the Postgres transaction id
+    table_name VARCHAR(50) NOT NULL, -- Table that changed (items, containers, placements, waste)
+    row_key VARCHAR(50) NOT NULL, -- item_id, or container_id for containers
+    changed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP -- Timestamp of the change
+);
+
+CREATE INDEX IF NOT EXISTS idx_change_feed_txid ON change_feed (txid);
+
+-- Appends the changed row's key to change_feed
+CREATE TRIGGER IF NOT EXISTS items_change_insert
+    AFTER INSERT ON items
+BEGIN
+    INSERT INTO change_feed (txid, table_name, row_key)
+    VALUES ((SELECT COALESCE(MAX(txid), 0) + 1 FROM change_feed), 'items', NEW.item_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS items_change_update
+    AFTER UPDATE ON items
+BEGIN
+    INSERT INTO change_feed (txid, table_name, row_key)
+    VALUES ((SELECT COALESCE(MAX(txid), 0) + 1 FROM change_feed), 'items', NEW.item_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS items_change_delete
+    AFTER DELETE ON items
+BEGIN
+    INSERT INTO change_feed (txid, table_name, row_key)
+    VALUES ((SELECT COALESCE(MAX(txid), 0) + 1 FROM change_feed), 'items', OLD.item_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS containers_change_insert
+    AFTER INSERT ON containers
+BEGIN
+    INSERT INTO change_feed (txid, table_name, row_key)
+    VALUES ((SELECT COALESCE(MAX(txid), 0) + 1 FROM change_feed), 'containers', NEW.container_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS containers_change_update
+    AFTER UPDATE ON containers
+BEGIN
+    INSERT INTO change_feed (txid, table_name, row_key)
+    VALUES ((SELECT COALESCE(MAX(txid), 0) + 1 FROM change_feed), 'containers', NEW.container_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS containers_change_delete
+    AFTER DELETE ON containers
+BEGIN
+    INSERT INTO change_feed (txid, table_name, row_key)
+    VALUES ((SELECT COALESCE(MAX(txid), 0) + 1 FROM change_feed), 'containers', OLD.container_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS placements_change_insert
+    AFTER INSERT ON placements
+BEGIN
+    INSERT INTO change_feed (txid, table_name, row_key)
+    VALUES ((SELECT COALESCE(MAX(txid), 0) + 1 FROM change_feed), 'placements', NEW.item_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS placements_change_update
+    AFTER UPDATE ON placements
+BEGIN
+    INSERT INTO change_feed (txid, table_name, row_key)
+    VALUES ((SELECT COALESCE(MAX(txid), 0) + 1 FROM change_feed), 'placements', NEW.item_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS placements_change_delete
+    AFTER DELETE ON placements
+BEGIN
+    INSERT INTO change_feed (txid, table_name, row_key)
+    VALUES ((SELECT COALESCE(MAX(txid), 0) + 1 FROM change_feed), 'placements', OLD.item_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS waste_change_insert
+    AFTER INSERT ON waste
+BEGIN
+    INSERT INTO change_feed (txid, table_name, row_key)
+    VALUES ((SELECT COALESCE(MAX(txid), 0) + 1 FROM change_feed), 'waste', NEW.item_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS waste_change_update
+    AFTER UPDATE ON waste
+BEGIN
+    INSERT INTO change_feed (txid, table_name, row_key)
+    VALUES ((SELECT COALESCE(MAX(txid), 0) + 1 FROM change_feed), 'waste', NEW.item_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS waste_change_delete
+    AFTER DELETE ON waste
+BEGIN
+    INSERT INTO change_feed (txid, table_name, row_key)
+    VALUES ((SELECT COALESCE(MAX(txid), 0) + 1 FROM change_feed), 'waste', OLD.item_id);
+END;
@@ -0,0 +1,150 @@
+import importlib.util
+import io
+import os
+import sys
+import uuid
+
+import psycopg2
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_PATH = os.path.join(BACKEND_DIR, 'server.py')
+PSQL_SCHEMA = os.path.join(BACKEND_DIR, 'psql.sql')
+
+# Postgres runs need an existing database the server's role owns (createdb -O cargo_admin cargo_test);
+# a second module uses cargo_test_<name>. Without one the postgres cases are skipped.
+TEST_PG_DATABASE = os.getenv('TEST_PG_DATABASE', 'cargo_test')
+
+CONTAINER_HEADER = "Container ID,Zone,Width (cm),Depth (cm),Height (cm)"
+ITEM_HEADER = (
+    "Item ID,Name,Width (cm),Depth (cm),Height (cm),Mass (kg),"
+    "Priority (1-100),Expiry Date (ISO Format),Usage Limit,Preferred Zone"
+)
+
+
+def reset_postgres(database):
+    try:
+        conn = psycopg2.connect(
+            host="localhost", database=database, user="cargo_admin", password="admin", port=5432, connect_timeout=3
+        )
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"Postgres database {database} is not available: {e}")
+    conn.autocommit = True
+    with conn.cursor() as cur, open(PSQL_SCHEMA) as schema:
+        cur.execute("DROP SCHEMA public CASCADE; CREATE SCHEMA public")
+        cur.execute(schema.read())
+    conn.close()
+
+
+@pytest.fixture(params=['sqlite', 'postgres'])
+def backend(request):
+    return request.param
+
+
+@pytest.fixture
+def database(backend):
+    # An empty database for a module: a private in-memory sqlite database or a freshly reset Postgres one
+    def make(name=None):
+        if backend == 'sqlite':
+            return f":memory:{uuid.uuid4().hex}"
+        target = TEST_PG_DATABASE if name is None else f"{TEST_PG_DATABASE}_{name}"
+        reset_postgres(target)
+        return target
+    return make
+
+
+@pytest.fixture
+def load_server(backend, database, monkeypatch):
+    """
+    Imports a private copy of server.py configured by environment variables, so
+    every test gets its own settings, module-level caches and databases.
+    """
+    loaded = []
+
+    def load(shards=None, **env):
+        shards = shards or {'default': database()}
+        settings = {
+            'STORAGE_BACKEND': backend,
+            'SHARDS': ','.join(f"{module}={target}" for module, target in shards.items()),
+            'READ_MODEL_ENABLED': 'false',
+            'QUERY_BUDGET_MODE': 'strict',
+        }
+        settings.update(env)
+        for name, value in settings.items():
+            monkeypatch.setenv(name, str(value))
+
+        name = f"server_{uuid.uuid4().hex}"
+        spec = importlib.util.spec_from_file_location(name, SERVER_PATH)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+        module.app.testing = True
+        loaded.append(name)
+        return module
+
+    yield load
+    for name in loaded:
+        sys.modules.pop(name, None)
+
+
+@pytest.fixture
+def server(load_server):
+    return load_server()
+
+
+@pytest.fixture
+def client(server):
+    return server.app.test_client()
+
+
+def upload(client, kind, header, rows, **kwargs):
+    # POST a CSV file to /api/import/<kind>
+    text = "\n".join([header, *rows]) + "\n"
+    response = client.post(
+        f"/api/import/{kind}", data={'file': (io.BytesIO(text.encode()), f"{kind}.csv")}, **kwargs
+    )
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()
+
+
+def import_containers(client, rows, **kwargs):
+    return upload(client, 'containers', CONTAINER_HEADER, rows, **kwargs)
+
+
+def import_items(client, rows, **kwargs):
+    return upload(client, 'items', ITEM_HEADER, rows, **kwargs)
+
+
+def item_row(item_id, size=10, priority=50, expiry='N/A', usage_limit='N/A', zone='Z'):
+    return f"{item_id},Item {item_id},{size},{size},{size},1,{priority},{expiry},{usage_limit},{zone}"
+
+
+def latest_placements(server, shard=None):
+    # {item_id: (container_id, start, end)} from each item's latest placement row
+    conn = server.get_db_connection(shard)
+    cur = conn.cursor(cursor_factory=server.RealDictCursor)
+    cur.execute("""
+        SELECT p.item_id, p.container_id, p.start_coordinates, p.end_coordinates
+        FROM placements p
+        WHERE p.placement_id = (SELECT MAX(q.placement_id) FROM placements q WHERE q.item_id = p.item_id)
+    """)
+    rows = {
+        row['item_id']: (row['container_id'], row['start_coordinates'], row['end_coordinates'])
+        for row in cur.fetchall()
+    }
+    cur.close()
+    conn.close()
+    return rows
+
+
+def place(client, item_id, container_id, start, size=10, **kwargs):
+    # /api/place a size^3 item at width `start` against the container's back corner
+    return client.post('/api/place', json={
+        'itemId': item_id,
+        'userId': 'tester',
+        'containerId': container_id,
+        'position': {
+            'startCoordinates': {'width': start, 'depth': 0, 'height': 0},
+            'endCoordinates': {'width': start + size, 'depth': size, 'height': size}
+        }
+    }, **kwargs).get_json()
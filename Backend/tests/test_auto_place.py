@@ -0,0 +1,55 @@
+from conftest import import_containers, import_items, item_row, latest_placements, place
+
+
+def available(client):
+    return {container['container_id']: float(container['available_volume']) for container in client.get('/api/containers').get_json()['containers']}
+
+
+def placement_request(container_id, item_ids):
+    return {
+        'containers': [{'containerId': container_id, 'zone': 'Z', 'width': 100, 'depth': 10, 'height': 10}],
+        'items': [
+            {'itemId': item_id, 'name': f"Item {item_id}", 'width': 10, 'depth': 10, 'height': 10, 'priority': 50, 'preferredZone': 'Z'}
+            for item_id in item_ids
+        ]
+    }
+
+
+def test_auto_placement_is_opt_in(server):
+    assert server.AUTO_PLACE_ENABLED is False
+    server.auto_placer.notify({'c1'})
+    assert not server.auto_placer.pending
+
+
+def test_auto_placement_uses_up_volume(client):
+    import_containers(client, ["c1,Z,30,10,10"])
+    import_items(client, [item_row(f"i{n}", priority=90 - n) for n in range(4)])
+
+    placed = client.post('/api/placement/auto', json={}).get_json()
+    assert placed['success'] and placed['placedCount'] == 3
+    assert available(client) == {'c1': 0}
+    # The container is full, so a manual placement is turned away
+    assert place(client, 'i3', 'c1', 0)['message'] == "Not enough space in container"
+    assert client.post('/api/placement/auto', json={}).get_json()['placedCount'] == 0
+
+
+def test_auto_placement_leaves_stored_items_where_they_are(server, client):
+    import_containers(client, ["c1,Z,100,10,10"])
+    import_items(client, [item_row('a'), item_row('b'), item_row('queued')])
+    assert place(client, 'a', 'c1', 20)['success'] and place(client, 'b', 'c1', 60)['success']
+
+    placed = client.post('/api/placement/auto', json={'containerIds': ['c1']}).get_json()
+    assert placed['placedCount'] == 1
+    starts = {item_id: start['width'] for item_id, (_, start, _) in latest_placements(server).items()}
+    assert starts['a'] == 20 and starts['b'] == 60
+    assert starts['queued'] >= 70
+    assert available(client) == {'c1': 7000}
+
+
+def test_placing_again_moves_the_volume(client):
+    import_containers(client, ["a,Z,100,10,10", "b,Z,100,10,10"])
+    import_items(client, [item_row('x'), item_row('y')])
+    assert client.post('/api/placement', json=placement_request('a', ['x', 'y'])).get_json()['success']
+    assert available(client) == {'a': 8000, 'b': 10000}
+    assert client.post('/api/placement', json=placement_request('b', ['x'])).get_json()['success']
+    assert available(client) == {'a': 9000, 'b': 9000}
@@ -0,0 +1,115 @@
+import json
+
+from conftest import import_containers, import_items, item_row, place
+
+
+def changes(client, since=None):
+    query = {} if since is None else {'since': since}
+    feed = client.get('/api/changes', query_string=query).get_json()
+    assert feed['success']
+    return feed
+
+
+def keys(feed):
+    return {(change['table'], change['id'], change['op']) for change in feed['changes']}
+
+
+def test_changes_since_a_version(server, client):
+    start = changes(client)
+    assert start['resync'] and start['changes'] == []
+
+    import_containers(client, ["c1,Z,100,10,10"])
+    import_items(client, [item_row('a'), item_row('b')])
+    feed = changes(client, start['version'])
+    assert not feed['resync'] and feed['version'] > start['version']
+    assert keys(feed) == {('containers', 'c1', 'upsert'), ('items', 'a', 'upsert'), ('items', 'b', 'upsert')}
+    assert {change['id']: change['row']['name'] for change in feed['changes'] if change['table'] == 'items'} == {
+        'a': 'Item a', 'b': 'Item b'
+    }
+    # Nothing new since the version just handed out
+    assert changes(client, feed['version']) == {**feed, 'changes': []}
+
+    assert place(client, 'a', 'c1', 0)['success']
+    conn = server.get_db_connection()
+    cur = conn.cursor()
+    cur.execute("DELETE FROM items WHERE item_id = 'b'")
+    conn.commit()
+    cur.close()
+    conn.close()
+    later = changes(client, feed['version'])
+    assert keys(later) >= {('placements', 'a', 'upsert'), ('containers', 'c1', 'upsert'), ('items', 'b', 'delete')}
+    deleted = next(change for change in later['changes'] if change['id'] == 'b')
+    assert deleted['row'] is None
+
+
+def feed_txids(server, item_ids):
+    conn = server.get_db_connection()
+    cur = conn.cursor(cursor_factory=server.RealDictCursor)
+    cur.execute("SELECT txid FROM change_feed WHERE table_name = 'items' AND row_key = ANY(%s)", (item_ids,))
+    txids = [int(row['txid']) for row in cur.fetchall()]
+    cur.close()
+    conn.close()
+    return txids
+
+
+def test_a_transaction_never_straddles_a_version(backend, server, client):
+    # Every version a client can hold falls between transactions, never inside one
+    versions = [changes(client)['version']]
+    batches = [[f"t{batch}_{n}" for n in range(4)] for batch in range(3)]
+    for batch in batches:
+        import_items(client, [item_row(item_id) for item_id in batch])
+        versions.append(changes(client, versions[-1])['version'])
+
+    for batch, before, after in zip(batches, versions, versions[1:]):
+        txids = feed_txids(server, batch)
+        if backend == 'sqlite':
+            # One txid per row here, unlike Postgres's one per transaction
+            assert len(set(txids)) == len(batch)
+        assert all(before <= txid < after for txid in txids)
+        assert {change['id'] for change in changes(client, before)['changes']} >= set(batch)
+        assert not {change['id'] for change in changes(client, after)['changes']} & set(batch)
+
+
+def test_clients_resync_when_a_delta_is_not_worth_it(load_server):
+    server = load_server(CHANGE_FEED_MAX_DELTA=2)
+    client = server.app.test_client()
+    start = changes(client)
+    import_items(client, [item_row('a'), item_row('b'), item_row('c')])
+    feed = changes(client, start['version'])
+    assert feed['resync'] and feed['changes'] == [] and feed['version'] > start['version']
+    # A version the feed never reached, e.g. held across a database restore
+    ahead = changes(client, feed['version'] + 1000)
+    assert ahead == {**feed, 'resync': True}
+
+
+def events(chunks, count):
+    # The first `count` SSE frames, split into their fields
+    frames = []
+    for chunk in chunks:
+        for frame in chunk.decode().split("\n\n"):
+            if frame:
+                frames.append(dict(line.split(": ", 1) if not line.startswith(":") else ("comment", line[2:]) for line in frame.split("\n")))
+        if len(frames) >= count:
+            return frames[:count]
+    return frames
+
+
+def test_stream_frames_changes_as_server_sent_events(server, client):
+    start = changes(client)
+    import_items(client, [item_row('a')])
+
+    response = client.get('/api/changes/stream', headers={'Last-Event-ID': str(start['version'])}, buffered=False)
+    assert response.mimetype == 'text/event-stream' and response.headers['Cache-Control'] == 'no-cache'
+    retry, first = events(iter(response.response), 2)
+    response.close()
+    assert retry == {'retry': '2000'}
+    assert first['event'] == 'changes'
+    payload = json.loads(first['data'])
+    assert int(first['id']) == payload['version'] > start['version']
+    assert ('items', 'a', 'upsert') in keys(payload)
+
+    # Without a version the stream starts with a resync
+    response = client.get('/api/changes/stream', buffered=False)
+    first = events(iter(response.response), 2)[1]
+    response.close()
+    assert json.loads(first['data'])['resync'] is True
@@ -0,0 +1,130 @@
+import threading
+import time
+
+import pytest
+
+from conftest import import_containers, import_items, item_row, place
+
+FOLLOWERS = 5
+
+
+class WaitCountingEvent(threading.Event):
+    def __init__(self):
+        super().__init__()
+        self.waiting = 0
+
+    def wait(self, timeout=None):
+        self.waiting += 1
+        return super().wait(timeout)
+
+
+def run_flight(server, compute, flights=None):
+    # A leader held inside compute until every follower waits on it; returns each caller's outcome
+    flights = flights or server.SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def leader_compute():
+        calls.append('leader')
+        started.set()
+        release.wait(5)
+        return compute()
+
+    def follower_compute():
+        calls.append('follower')
+        return 'own result'
+
+    outcomes = {}
+
+    def call(name, work):
+        try:
+            outcomes[name] = ('result', flights.do('key', work))
+        except Exception as e:
+            outcomes[name] = ('error', e)
+
+    leader = threading.Thread(target=call, args=('leader', leader_compute))
+    leader.start()
+    assert started.wait(5)
+    shared = flights.calls['key']
+    shared.done = WaitCountingEvent()
+    followers = [threading.Thread(target=call, args=(n, follower_compute)) for n in range(FOLLOWERS)]
+    for thread in followers:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while shared.done.waiting < FOLLOWERS and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+    return calls, outcomes
+
+
+def test_followers_share_the_leaders_result(server):
+    calls, outcomes = run_flight(server, lambda: ['leader result'])
+    assert calls == ['leader']
+    assert len(outcomes) == FOLLOWERS + 1
+    assert all(outcome == ('result', ['leader result']) for outcome in outcomes.values())
+    # Shared, not copied
+    assert len({id(value) for kind, value in outcomes.values()}) == 1
+
+
+def test_followers_get_the_leaders_error(server):
+    failure = ValueError("lookup failed")
+
+    def compute():
+        raise failure
+
+    calls, outcomes = run_flight(server, compute)
+    assert calls == ['leader']
+    assert all(outcome == ('error', failure) for outcome in outcomes.values())
+    # A failed call is not kept: the next caller computes again
+    assert run_flight(server, lambda: 'recovered')[1]['leader'] == ('result', 'recovered')
+
+
+def test_finished_results_are_reused_only_within_the_window(server):
+    computed = []
+
+    def compute():
+        computed.append(1)
+        return len(computed)
+
+    no_reuse = server.SingleFlight()
+    assert [no_reuse.do('key', compute) for _ in range(2)] == [1, 2]
+    assert no_reuse.calls == {}
+
+    reuse = server.SingleFlight(reuse_seconds=0.05)
+    assert [reuse.do('key', compute) for _ in range(2)] == [3, 3]
+    time.sleep(0.1)
+    assert reuse.do('key', compute) == 4
+    # Expired entries are dropped when a new call starts
+    reuse.do('other', compute)
+    time.sleep(0.1)
+    reuse.do('other', compute)
+    assert set(reuse.calls) == {'other'}
+
+
+@pytest.fixture
+def reusing_server(load_server):
+    # Every repeat within a minute is served from the first response
+    return load_server(COALESCE_REUSE_MS=60000)
+
+
+def test_coalesced_responses_keep_the_views_headers(reusing_server):
+    client = reusing_server.app.test_client()
+    import_items(client, [item_row('a'), item_row('b')])
+    first = client.get('/api/items')
+    again = client.get('/api/items')
+    assert again.get_data() == first.get_data()
+    assert again.headers['Content-Type'] == first.headers['Content-Type'] == 'application/json'
+    assert again.headers['X-Query-Count'] == first.headers['X-Query-Count']
+
+
+def test_searches_are_not_coalesced(reusing_server):
+    client = reusing_server.app.test_client()
+    import_containers(client, ["c1,Z,100,10,10"])
+    import_items(client, [item_row('a')])
+    assert place(client, 'a', 'c1', 0)['success']
+    for _ in range(3):
+        assert client.get('/api/search', query_string={'itemId': 'a', 'userId': 'tester'}).get_json()['found']
+    logs = client.get('/api/logs', query_string={'actionType': 'search'}).get_json()
+    assert logs['total'] == 3
@@ -0,0 +1,59 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from conftest import import_containers, import_items, item_row, latest_placements
+
+PLACERS = 40
+
+
+@pytest.fixture(params=['shared', 'file'])
+def concurrent_server(request, backend, load_server, tmp_path):
+    # sqlite runs both ways: one connection shared by all threads, and a connection per caller on a file
+    if backend == 'sqlite' and request.param == 'file':
+        return load_server(shards={'default': str(tmp_path / 'cargo.db')})
+    if backend == 'postgres' and request.param == 'file':
+        pytest.skip("sqlite only")
+    return load_server()
+
+
+def overlaps(a, b):
+    (_, a_start, a_end), (_, b_start, b_end) = a, b
+    return all(
+        float(a_start[axis]) < float(b_end[axis]) and float(b_start[axis]) < float(a_end[axis])
+        for axis in ('width', 'depth', 'height')
+    )
+
+
+def test_parallel_placements_never_overlap_or_overcommit(concurrent_server):
+    server = concurrent_server
+    client = server.app.test_client()
+    import_containers(client, ["c1,Z,100,10,10"])
+    import_items(client, [item_row(f"i{n}") for n in range(PLACERS)])
+
+    # Every placer aims at one of a few overlapping spots in the same container
+    def attempt(n):
+        return server.app.test_client().post('/api/place', json={
+            'itemId': f"i{n}",
+            'userId': 'tester',
+            'containerId': 'c1',
+            'position': {
+                'startCoordinates': {'width': (n % 19) * 5, 'depth': 0, 'height': 0},
+                'endCoordinates': {'width': (n % 19) * 5 + 10, 'depth': 10, 'height': 10}
+            }
+        }).get_json()
+
+    with ThreadPoolExecutor(max_workers=PLACERS) as pool:
+        results = list(pool.map(attempt, range(PLACERS)))
+    assert all('success' in result for result in results)
+
+    placed = list(latest_placements(server).values())
+    assert len(placed) == sum(result['success'] for result in results) > 0
+    for i, box in enumerate(placed):
+        for other in placed[i + 1:]:
+            assert not overlaps(box, other)
+
+    available = float(client.get('/api/containers').get_json()['containers'][0]['available_volume'])
+    assert available >= 0
+    assert available == 10000 - 1000 * len(placed)
+
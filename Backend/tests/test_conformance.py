@@ -0,0 +1,148 @@
+"""
+The same API scenarios against every storage backend (see the backend fixture):
+each assertion is what any backend has to return, so a dialect difference shows
+up as a failure on one parametrization only.
+"""
+import os
+from datetime import date
+
+from conftest import BACKEND_DIR, CONTAINER_HEADER, ITEM_HEADER, import_containers, import_items, item_row, place, upload
+
+SAMPLE_DIR = os.path.dirname(BACKEND_DIR)
+
+
+def sample_rows(name):
+    with open(os.path.join(SAMPLE_DIR, name)) as sample:
+        return [line for line in sample.read().splitlines()[1:] if line]
+
+
+def stored_expiry_dates(server):
+    conn = server.get_db_connection()
+    cur = conn.cursor(cursor_factory=server.RealDictCursor)
+    cur.execute("SELECT item_id, expiry_date FROM items")
+    dates = {row['item_id']: row['expiry_date'] for row in cur.fetchall()}
+    cur.close()
+    conn.close()
+    return dates
+
+
+def test_sample_files_import(server, client):
+    assert upload(client, 'containers', CONTAINER_HEADER, sample_rows('containers.csv'))['success']
+    imported = upload(client, 'items', ITEM_HEADER, sample_rows('items.csv'))
+    assert imported['success'], imported['message']
+
+    dates = stored_expiry_dates(server)
+    assert len(dates) == 10
+    assert dates['ITEM011'] == date(2025, 5, 20)
+    assert dates['ITEM015'] == date(2024, 12, 15)
+    assert dates['ITEM012'] is None
+    assert len(client.get('/api/containers').get_json()['containers']) == 4
+
+
+def test_import_accepts_iso_and_month_first_dates(server, client):
+    import_items(client, [
+        item_row('iso', expiry='2025-05-20'),
+        item_row('slashes', expiry='05/20/2025'),
+        item_row('dashes', expiry='5-20-2025'),
+    ])
+    assert set(stored_expiry_dates(server).values()) == {date(2025, 5, 20)}
+
+
+def test_import_rejects_unreadable_dates(server, client):
+    imported = import_items(client, [item_row('ok'), item_row('bad', expiry='20.05.2025')])
+    assert not imported['success']
+    assert 'Invalid date' in imported['message']
+    assert stored_expiry_dates(server) == {}
+
+
+def test_item_lifecycle(server, client):
+    import_containers(client, ["c1,Z,100,10,10"])
+    import_items(client, [
+        item_row('fresh', priority=90, usage_limit=2),
+        item_row('stale', priority=50, expiry='2020-01-01'),
+        item_row('spare', priority=10),
+    ])
+
+    placed = client.post('/api/placement', json={
+        'containers': [{'containerId': 'c1', 'zone': 'Z', 'width': 100, 'depth': 10, 'height': 10}],
+        'items': [
+            {'itemId': item_id, 'name': f"Item {item_id}", 'width': 10, 'depth': 10, 'height': 10, 'priority': priority, 'preferredZone': 'Z'}
+            for item_id, priority in [('fresh', 90), ('stale', 50), ('spare', 10)]
+        ]
+    }).get_json()
+    assert placed['success']
+    assert {placement['itemId']: placement['containerId'] for placement in placed['placements']} == {
+        'fresh': 'c1', 'stale': 'c1', 'spare': 'c1'
+    }
+
+    found = client.get('/api/search', query_string={'itemId': 'fresh'}).get_json()
+    assert found['success'] and found['found']
+    assert found['placement']['container_id'] == 'c1' and found['retrievalSteps'] == 0
+
+    for _ in range(2):
+        assert client.post('/api/retrieve', json={'itemId': 'fresh', 'userId': 'tester'}).get_json()['success']
+
+    # The last use made 'fresh' waste already; the index finds the expired one
+    waste = client.get('/api/waste/identify').get_json()
+    assert waste['newlyIdentified'] == 1
+    assert {(item['item_id'], item['reason']) for item in waste['wasteItems']} == {
+        ('fresh', 'Out of Uses'), ('stale', 'Expired')
+    }
+
+    listed = client.get('/api/items').get_json()['items']
+    assert [item['item_id'] for item in listed] == ['spare']
+    assert [item['item_id'] for item in client.get('/api/items', query_string={'waste': 'only'}).get_json()['items']] == ['fresh', 'stale']
+
+    actions = [log['action_type'] for log in client.get('/api/logs').get_json()['logs']]
+    assert actions.count('retrieval') == 2 and 'placement' in actions
+
+
+def test_item_pages_follow_the_listing_order(client):
+    import_items(client, [item_row(f"i{n}", priority=priority) for n, priority in enumerate([30, 90, 30, 60, 90])])
+    pages, cursor = [], None
+    while True:
+        query = {'limit': 2, **({'cursor': cursor} if cursor else {})}
+        page = client.get('/api/items', query_string=query).get_json()
+        pages.append([item['item_id'] for item in page['items']])
+        cursor = page['nextCursor']
+        if cursor is None:
+            break
+    assert pages == [['i1', 'i4'], ['i3', 'i0'], ['i2']]
+
+
+def test_container_contents_keep_their_types(client):
+    import_containers(client, ["c1,Z,100,10,10", "c2,Z,100,10,10"])
+    import_items(client, [item_row('a', usage_limit=3)])
+    assert place(client, 'a', 'c2', 20)['success']
+
+    containers = client.get('/api/containers/with-items').get_json()['containers']
+    assert [(container['container_id'], len(container['items'])) for container in containers] == [('c1', 0), ('c2', 1)]
+    item = containers[1]['items'][0]
+    assert item['is_waste'] is False and item['usage_limit'] == 3 and item['name'] == 'Item a'
+    assert {axis: float(value) for axis, value in item['start_coordinates'].items()} == {'width': 20, 'depth': 0, 'height': 0}
+    assert {axis: float(value) for axis, value in item['end_coordinates'].items()} == {'width': 30, 'depth': 10, 'height': 10}
+
+
+def test_name_search_ignores_case(client):
+    import_containers(client, ["c1,Z,100,10,10"])
+    upload(client, 'items', ITEM_HEADER, ["o2,Oxygen Tank,10,10,10,1,50,N/A,N/A,Z"])
+    assert place(client, 'o2', 'c1', 0)['success']
+    found = client.get('/api/search', query_string={'itemName': 'oxygen tank'}).get_json()
+    assert found['found'] and found['item']['item_id'] == 'o2'
+    assert not client.get('/api/search', query_string={'itemName': 'nitrogen'}).get_json()['found']
+
+
+def test_logs_filter_by_time_range(client):
+    import_containers(client, ["c1,Z,100,10,10"])
+    import_items(client, [item_row('a')])
+    assert place(client, 'a', 'c1', 0)['success']
+
+    def total(**query):
+        return client.get('/api/logs', query_string=query).get_json()['total']
+
+    everything = total()
+    assert everything > 0
+    assert total(startDate='2000-01-01') == everything
+    assert total(startDate='2999-01-01') == 0
+    assert total(endDate='2000-01-01') == 0
+    assert total(actionType='placement', itemId='a') == 1
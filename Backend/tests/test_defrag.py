@@ -0,0 +1,31 @@
+from conftest import import_containers, import_items, item_row, latest_placements, place
+
+
+def placement_counts(server):
+    conn = server.get_db_connection()
+    cur = conn.cursor(cursor_factory=server.RealDictCursor)
+    cur.execute("SELECT item_id, COUNT(*) AS rows FROM placements GROUP BY item_id")
+    counts = {row['item_id']: row['rows'] for row in cur.fetchall()}
+    cur.close()
+    conn.close()
+    return counts
+
+
+def test_defrag_moves_keep_one_live_placement_per_item(server, client):
+    import_containers(client, ["c1,Z,100,10,10", "c2,Z,100,10,10"])
+    import_items(client, [item_row(f"i{n}") for n in range(6)])
+    for n, (container_id, start) in enumerate([('c1', 0), ('c1', 20), ('c1', 50), ('c2', 30), ('c2', 60), ('c2', 90)]):
+        assert place(client, f"i{n}", container_id, start)['success']
+
+    moved = client.post('/api/defrag/run', json={'maxMoves': 10}).get_json()
+    assert moved['success'] and moved['itemsMoved'] == 5
+
+    assert placement_counts(server) == {f"i{n}": 1 for n in range(6)}
+    starts = {item_id: start['width'] for item_id, (_, start, _) in latest_placements(server).items()}
+    assert starts == {'i0': 0, 'i1': 10, 'i2': 20, 'i3': 0, 'i4': 10, 'i5': 20}
+
+    listed = client.get('/api/containers/with-items').get_json()['containers']
+    assert sorted(item['item_id'] for container in listed for item in container['items']) == [f"i{n}" for n in range(6)]
+
+    # Nothing left to compact
+    assert client.post('/api/defrag/run', json={}).get_json()['itemsMoved'] == 0
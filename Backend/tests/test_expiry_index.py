@@ -0,0 +1,40 @@
+from datetime import date
+
+from conftest import import_containers, import_items, item_row, place
+
+
+def waste_rows(server, item_id):
+    conn = server.get_db_connection()
+    cur = conn.cursor(cursor_factory=server.RealDictCursor)
+    cur.execute("SELECT COUNT(*) AS count FROM waste WHERE item_id = %s", (item_id,))
+    count = cur.fetchone()['count']
+    cur.close()
+    conn.close()
+    return count
+
+
+def test_expiry_index_follows_writes_from_other_processes(backend, load_server, database, tmp_path):
+    # Two server instances on one database stand in for two processes
+    target = str(tmp_path / 'cargo.db') if backend == 'sqlite' else database()
+    first = load_server(shards={'default': target})
+    second = load_server(shards={'default': target})
+    first_client, second_client = first.app.test_client(), second.app.test_client()
+
+    import_containers(first_client, ["c1,Z,100,10,10"])
+    import_items(first_client, [item_row('used', expiry='2020-01-01', usage_limit=1)])
+    # Loads the first instance's index while nothing has expired yet
+    with first.app.app_context():
+        assert first.check_expired_items(as_of=date(2019, 1, 1)) == 0
+
+    # Items imported by the other instance expire here too
+    import_items(second_client, [item_row('imported', expiry='2020-01-01')])
+    # An item the other instance turned into waste is not marked a second time
+    assert place(second_client, 'used', 'c1', 0)['success']
+    assert second_client.post('/api/retrieve', json={'itemId': 'used', 'userId': 'tester'}).get_json()['success']
+
+    waste = first_client.get('/api/waste/identify').get_json()
+    assert waste['newlyIdentified'] == 1
+    assert {(item['item_id'], item['reason']) for item in waste['wasteItems']} == {
+        ('imported', 'Expired'), ('used', 'Out of Uses')
+    }
+    assert waste_rows(first, 'used') == 1
@@ -0,0 +1,73 @@
+import io
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from conftest import import_containers, import_items, item_row, place
+
+FORMATS = {
+    'arrow': lambda data: pa.ipc.open_stream(data).read_all(),
+    'parquet': lambda data: pq.read_table(io.BytesIO(data)),
+}
+
+
+@pytest.fixture
+def station(server, client):
+    # Two placements, a retrieval, and one expired item marked as waste
+    import_containers(client, ["c1,Z,100,10,10"])
+    import_items(client, [item_row('a'), item_row('b', expiry='2020-01-01')])
+    assert place(client, 'a', 'c1', 0)['success'] and place(client, 'b', 'c1', 10)['success']
+    assert client.post('/api/retrieve', json={'itemId': 'a', 'userId': 'tester'}).get_json()['success']
+    assert client.get('/api/waste/identify').get_json()['newlyIdentified'] == 1
+    return client
+
+
+def export(client, dataset, export_format='arrow', **query):
+    response = client.get(f"/api/export/{dataset}", query_string={'format': export_format, **query})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    assert response.headers['Content-Disposition'] == f"attachment; filename={dataset}.{export_format}"
+    return FORMATS[export_format](response.get_data())
+
+
+def row_count(server, table):
+    conn = server.get_db_connection()
+    cur = conn.cursor(cursor_factory=server.RealDictCursor)
+    cur.execute(f"SELECT COUNT(*) AS count FROM {table}")
+    count = cur.fetchone()['count']
+    cur.close()
+    conn.close()
+    return count
+
+
+@pytest.mark.parametrize('export_format', sorted(FORMATS))
+def test_every_dataset_exports_in_every_format(server, station, export_format):
+    for dataset, spec in server.EXPORT_DATASETS.items():
+        # An export logs itself before streaming, so the logs export includes its own entry
+        expected = row_count(server, spec['table']) + (dataset == 'logs')
+        table = export(station, dataset, export_format)
+        assert table.schema == pa.schema([(column, field_type) for column, (_, field_type) in spec['columns'].items()])
+        assert table.num_rows == expected > 0
+
+
+def test_placement_coordinates_are_projected_columns(station):
+    table = export(station, 'placements', columns='item_id,start_width,end_width')
+    assert table.column_names == ['item_id', 'start_width', 'end_width']
+    assert sorted(zip(*table.to_pydict().values())) == [('a', 0.0, 10.0), ('b', 10.0, 20.0)]
+
+
+def test_time_range_limits_the_rows(station):
+    assert export(station, 'logs', 'parquet', **{'from': '2999-01-01'}).num_rows == 0
+    assert export(station, 'waste', to='2000-01-01').num_rows == 0
+    assert export(station, 'waste', **{'from': '2000-01-01'}).column('reason').to_pylist() == ['Expired']
+
+
+def test_unknown_datasets_columns_and_formats_are_rejected(client):
+    for path, query in [
+        ('/api/export/items', {}),
+        ('/api/export/logs', {'columns': 'log_id,password'}),
+        ('/api/export/logs', {'format': 'csv'}),
+    ]:
+        response = client.get(path, query_string=query)
+        assert response.status_code == 400
+        assert response.get_json()['success'] is False
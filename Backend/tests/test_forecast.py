@@ -0,0 +1,97 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from conftest import import_containers, import_items, item_row, place
+
+
+def use(server, events):
+    # Record (item_id, uses, remaining_uses) as used just now
+    conn = server.get_db_connection()
+    cur = conn.cursor(cursor_factory=server.RealDictCursor)
+    now = datetime.now()
+    server.record_usage(cur, [(item_id, uses, now, remaining) for item_id, uses, remaining in events])
+    conn.commit()
+    cur.close()
+    conn.close()
+    return now.date()
+
+
+def test_forecast_splits_expiring_and_depleting(server, client):
+    today = date.today()
+    soon, late = (today + timedelta(days=5)).isoformat(), (today + timedelta(days=60)).isoformat()
+    import_items(client, [
+        item_row('tool', usage_limit=1, zone='A'),
+        item_row('spare', usage_limit=100, zone='A'),
+        item_row('milk', expiry=soon, zone='B'),
+        item_row('cheese', expiry=late, zone='B'),
+        item_row('ration', expiry=soon, usage_limit=1, zone='B'),
+        item_row('spoiled', expiry=soon, zone='B'),
+    ])
+    # A week's worth of uses in one day is a rate of one a day
+    used_on = use(server, [('tool', 7, 1), ('spare', 7, 100), ('ration', 7, 1)])
+    conn = server.get_db_connection()
+    cur = conn.cursor()
+    cur.execute("UPDATE items SET is_waste = TRUE WHERE item_id = 'spoiled'")
+    conn.commit()
+    cur.close()
+    conn.close()
+
+    forecast = client.get('/api/forecast', query_string={'days': 30}).get_json()
+    assert forecast['success'] and forecast['days'] == 30
+    tomorrow = (used_on + timedelta(days=1)).isoformat()
+    assert forecast['depleting'] == [
+        {'itemId': 'ration', 'name': 'Item ration', 'zone': 'B', 'date': tomorrow},
+        {'itemId': 'tool', 'name': 'Item tool', 'zone': 'A', 'date': tomorrow},
+    ]
+    # An item can run out and expire within the window; waste and later dates are left out
+    assert forecast['expiring'] == [
+        {'itemId': 'milk', 'name': 'Item milk', 'zone': 'B', 'date': soon},
+        {'itemId': 'ration', 'name': 'Item ration', 'zone': 'B', 'date': soon},
+    ]
+    assert forecast['depletingCount'] == 2 and forecast['expiringCount'] == 2
+    assert forecast['zones'] == {'A': {'depleting': 1, 'expiring': 0}, 'B': {'depleting': 1, 'expiring': 2}}
+
+    # A longer window picks up the later expiry and depletion
+    longer = client.get('/api/forecast', query_string={'days': 120}).get_json()
+    assert [row['itemId'] for row in longer['expiring']] == ['milk', 'ration', 'cheese']
+    assert [row['itemId'] for row in longer['depleting']] == ['ration', 'tool', 'spare']
+
+
+def unit(name, zone, quantity, **lifetime):
+    return {'name': name, 'width': 10, 'depth': 10, 'height': 10, 'preferredZone': zone, 'quantity': quantity, **lifetime}
+
+
+def test_capacity_forecast_is_reproducible_from_its_seed(server, client):
+    import_containers(client, ["c1,A,100,10,10", "c2,B,100,10,10"])
+    import_items(client, [item_row(f"s{n}", usage_limit=3, zone='B') for n in range(6)])
+    for n in range(6):
+        assert place(client, f"s{n}", 'c2', 10 * n)['success']
+    use(server, [(f"s{n}", 7, 3) for n in range(6)])
+
+    request = {
+        'days': 60, 'trajectories': 250, 'seed': 7,
+        'resupply': [{'everyDays': 5, 'jitterDays': 2, 'probability': 0.5, 'items': [unit('food', 'B', 3, usageLimit=15, usesPerDay=1)]}]
+    }
+    first = client.post('/api/forecast/capacity', json=request).get_json()
+    assert first['success'] and first['trajectories'] == 250
+    assert client.post('/api/forecast/capacity', json=request).get_json() == first
+    zone = {row['zone']: row for row in first['zones']}['B']
+    assert 0 < zone['overflowProbability'] < 1
+    assert client.post('/api/forecast/capacity', json={**request, 'seed': 8}).get_json() != first
+
+
+def test_an_overfull_zone_always_overflows(server, client):
+    import_containers(client, ["c1,A,100,10,10", "c2,B,100,10,10"])
+    forecast = client.post('/api/forecast/capacity', json={
+        'days': 30, 'trajectories': 50, 'seed': 1,
+        'resupply': [{'firstDay': 10, 'items': [unit('food', 'A', 15)]}]
+    }).get_json()
+    assert forecast['success']
+    zones = {row['zone']: row for row in forecast['zones']}
+    # Ten units fill A; the rest spill into B, so only A overflows
+    assert zones['A']['overflowProbability'] == 1
+    assert zones['A']['overflowDay'] == {'low': 10.0, 'median': 10.0, 'high': 10.0}
+    assert zones['A']['probabilityInterval'][1] == pytest.approx(1)
+    assert zones['B']['overflowProbability'] == forecast['station']['overflowProbability'] == 0
+    assert forecast['station']['overflowDay'] == {'low': None, 'median': None, 'high': None}
@@ -0,0 +1,136 @@
+import threading
+import time
+
+import pytest
+
+from conftest import import_items, item_row
+
+
+def wait_for(job, *statuses, timeout=5):
+    deadline = time.monotonic() + timeout
+    seen = None
+    while job.status not in statuses and time.monotonic() < deadline:
+        seen = job.wait(seen, 0.05)
+    return job.status
+
+
+def checking_work(started=None):
+    # Runs until stopped, checking in the way the placement and simulation runs do
+    def work(data, job):
+        if started is not None:
+            started.set()
+        while True:
+            job.check()
+            job.report(step=job.progress.get('step', 0) + 1)
+            time.sleep(0.005)
+    return work
+
+
+def blocking_work(release):
+    def work(data, job):
+        release.wait(5)
+        return {"success": True}
+    return work
+
+
+@pytest.fixture
+def queue(server):
+    return server.JobQueue(workers=1, result_ttl=60, max_jobs=3)
+
+
+def test_finished_jobs_keep_their_outcome(server, queue):
+    succeeded = queue.submit('test', lambda data, job: {"success": True, "value": data['value']}, {'value': 7})
+    assert wait_for(succeeded, 'succeeded') == 'succeeded'
+    assert succeeded.describe()['result'] == {"success": True, "value": 7}
+
+    reported = queue.submit('test', lambda data, job: {"success": False, "message": "no room"}, {})
+    assert wait_for(reported, 'failed') == 'failed' and reported.message == "no room"
+
+    def broken(data, job):
+        raise RuntimeError("boom")
+
+    raised = queue.submit('test', broken, {})
+    assert wait_for(raised, 'failed') == 'failed' and raised.message == "boom"
+
+
+def test_running_jobs_stop_when_cancelled(server, queue):
+    started = threading.Event()
+    job = queue.submit('test', checking_work(started), {})
+    assert started.wait(5)
+    assert queue.cancel(job.id) is job
+    assert wait_for(job, 'cancelled') == 'cancelled'
+    assert job.message == "Job cancelled" and job.progress['step'] >= 1
+
+
+def test_queued_jobs_never_start_when_cancelled(server, queue):
+    release = threading.Event()
+    first = queue.submit('test', blocking_work(release), {})
+    ran = []
+    second = queue.submit('test', lambda data, job: ran.append(job) or {"success": True}, {})
+    assert second.status == 'queued'
+    queue.cancel(second.id)
+    assert second.status == 'cancelled'
+    release.set()
+    assert wait_for(first, 'succeeded') == 'succeeded'
+    assert second.future.cancelled()
+    assert ran == [] and second.status == 'cancelled' and second.started_at is None
+
+
+def test_jobs_time_out_at_their_limit(server, queue):
+    job = queue.submit('test', checking_work(), {'timeLimitSeconds': 0.05})
+    assert job.time_limit == 0.05
+    assert wait_for(job, 'timed_out') == 'timed_out'
+    assert job.message == "Job timed out"
+    # A request can lower the limit but not raise it past JOB_TIME_LIMIT
+    assert queue.submit('test', lambda data, job: {}, {'timeLimitSeconds': 10 ** 9}).time_limit == server.JOB_TIME_LIMIT
+
+
+def test_finished_jobs_expire_after_the_ttl(server):
+    queue = server.JobQueue(workers=1, result_ttl=0.05, max_jobs=3)
+    job = queue.submit('test', lambda data, job: {"success": True}, {})
+    assert wait_for(job, 'succeeded') == 'succeeded'
+    assert queue.get(job.id) is job
+    time.sleep(0.1)
+    assert queue.get(job.id) is None and queue.jobs == {}
+
+
+def test_submissions_past_the_limit_are_turned_away(server, queue):
+    release = threading.Event()
+    jobs = [queue.submit('test', blocking_work(release), {}) for _ in range(3)]
+    assert queue.submit('test', blocking_work(release), {}) is None
+    release.set()
+    for job in jobs:
+        assert wait_for(job, 'succeeded') == 'succeeded'
+    # Finished jobs no longer count against the limit
+    assert queue.submit('test', lambda data, job: {"success": True}, {}) is not None
+
+
+def test_async_simulation_over_http(server, client):
+    import_items(client, [item_row('tool', usage_limit=5)])
+    submitted = client.post('/api/simulate/day', json={
+        'async': True, 'numOfDays': 2, 'itemsToBeUsedPerDay': [{'itemId': 'tool'}]
+    })
+    assert submitted.status_code == 202
+    job_id = submitted.get_json()['jobId']
+
+    # The stream ends with a done event once the job finishes
+    stream = client.get(f"/api/jobs/{job_id}/stream").get_data(as_text=True)
+    assert stream.startswith("retry: 2000\n\n") and "event: done\n" in stream
+
+    described = client.get(f"/api/jobs/{job_id}").get_json()
+    assert described['status'] == 'succeeded' and described['kind'] == 'simulation'
+    assert described['result']['daysSimulated'] == 2
+    assert client.get('/api/jobs/unknown').status_code == 404
+    assert client.delete('/api/jobs/unknown').status_code == 404
+
+
+def test_full_queue_over_http(server, client):
+    server.job_queue = server.JobQueue(workers=1, result_ttl=60, max_jobs=1)
+    release = threading.Event()
+    server.job_queue.submit('test', blocking_work(release), {})
+    try:
+        response = client.post('/api/forecast/capacity', json={'async': True})
+        assert response.status_code == 503 and response.headers['Retry-After'] == '30'
+        assert response.get_json()['success'] is False
+    finally:
+        release.set()
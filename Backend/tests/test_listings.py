@@ -0,0 +1,70 @@
+import base64
+import json
+
+import pytest
+
+from conftest import import_containers, import_items
+
+
+def same_name_row(item_id, priority=50):
+    # Priority and name tie, so only the item id orders these rows
+    return f"{item_id},Same,10,10,10,1,{priority},N/A,N/A,Z"
+
+
+def pages(client, path, limit, key):
+    pages, cursor = [], None
+    while True:
+        query = {'limit': limit, **({'cursor': cursor} if cursor else {})}
+        page = client.get(path, query_string=query).get_json()
+        assert page['success']
+        pages.append([row[key] for row in page[next(name for name in ('items', 'containers') if name in page)]])
+        cursor = page['nextCursor']
+        if cursor is None:
+            return pages
+
+
+def test_ties_on_the_sort_key_span_page_boundaries(client):
+    import_items(client, [same_name_row(f"i{n}") for n in [3, 0, 4, 1, 2]] + [same_name_row('top', priority=90)])
+    assert pages(client, '/api/items', 2, 'item_id') == [['top', 'i0'], ['i1', 'i2'], ['i3', 'i4']]
+    assert pages(client, '/api/items/unplaced', 4, 'item_id') == [['top', 'i0', 'i1', 'i2'], ['i3', 'i4']]
+
+    import_containers(client, [f"{container_id},{zone},100,10,10" for container_id, zone in [('c2', 'A'), ('c1', 'B'), ('c1a', 'A'), ('c0', 'A')]])
+    assert pages(client, '/api/containers', 3, 'container_id') == [['c0', 'c1a', 'c2'], ['c1']]
+
+
+def test_the_last_page_has_no_cursor(client):
+    import_items(client, [same_name_row(f"i{n}") for n in range(4)])
+    # A page that ends exactly at the last row, and one that is not full
+    assert pages(client, '/api/items', 2, 'item_id') == [['i0', 'i1'], ['i2', 'i3']]
+    assert pages(client, '/api/items', 10, 'item_id') == [['i0', 'i1', 'i2', 'i3']]
+    assert client.get('/api/items', query_string={'limit': 10}).get_json()['nextCursor'] is None
+
+
+def encoded(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+@pytest.mark.parametrize('cursor', [
+    'not a cursor!',
+    base64.urlsafe_b64encode(b'not json').decode(),
+    encoded({'priority': 50}),
+    encoded([50, 'Same']),
+    encoded([50, 'Same', 'i1', 'extra']),
+    encoded([50, ['Same'], 'i1']),
+    encoded([True, 'Same', 'i1']),
+])
+def test_invalid_or_tampered_cursors_are_rejected(client, cursor):
+    import_items(client, [same_name_row('i1')])
+    for path in ['/api/items', '/api/items/unplaced']:
+        response = client.get(path, query_string={'limit': 2, 'cursor': cursor})
+        assert response.status_code == 400
+        assert response.get_json() == {'success': False, 'message': 'Invalid cursor'}
+
+
+def test_cursors_only_fit_their_own_listing(client):
+    import_items(client, [same_name_row(f"i{n}") for n in range(3)])
+    import_containers(client, ["c1,A,100,10,10", "c2,A,100,10,10"])
+    item_cursor = client.get('/api/items', query_string={'limit': 1}).get_json()['nextCursor']
+    container_cursor = client.get('/api/containers', query_string={'limit': 1}).get_json()['nextCursor']
+    assert client.get('/api/containers', query_string={'limit': 1, 'cursor': item_cursor}).status_code == 400
+    assert client.get('/api/items', query_string={'limit': 1, 'cursor': container_cursor}).status_code == 400
@@ -0,0 +1,48 @@
+from collections import Counter
+from datetime import date, datetime, timedelta
+from email.utils import parsedate_to_datetime
+
+from conftest import import_containers, import_items, item_row, place
+
+
+def as_day(value):
+    # Dates come back as date/datetime or ISO text from the database, and as HTTP dates in JSON
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if value[:4].isdigit():
+        return date.fromisoformat(value[:10])
+    return parsedate_to_datetime(value).date()
+
+
+def test_rollups_count_the_logged_actions_per_day(server, client):
+    import_containers(client, ["c1,Z,100,10,10"])
+    import_items(client, [item_row('a'), item_row('b')])
+    assert place(client, 'a', 'c1', 0)['success'] and place(client, 'b', 'c1', 10)['success']
+    assert client.post('/api/retrieve', json={'itemId': 'a', 'userId': 'tester'}).get_json()['success']
+
+    # Entries for the next day as well, which is in this month's or next month's partition
+    tomorrow = (datetime.now() + timedelta(days=1)).replace(hour=12, minute=0, second=0, microsecond=0)
+    conn = server.get_db_connection()
+    cur = conn.cursor(cursor_factory=server.RealDictCursor)
+    for action_type, user_id in [('retrieval', 'x'), ('retrieval', 'y'), ('retrieval', 'x'), ('disposal', None), ('disposal', 'x')]:
+        cur.execute(
+            "INSERT INTO logs (action_type, item_id, user_id, logged_at) VALUES (%s, %s, %s, %s)",
+            (action_type, 'b', user_id, tomorrow.isoformat(sep=' '))
+        )
+    conn.commit()
+    cur.execute("SELECT logged_at, action_type FROM logs")
+    logged = Counter((as_day(row['logged_at']), row['action_type']) for row in cur.fetchall())
+    cur.close()
+    conn.close()
+
+    rollups = client.get('/api/logs/rollups').get_json()
+    assert rollups['success']
+    assert {(as_day(row['day']), row['action_type']): int(row['count']) for row in rollups['rollups']} == logged
+    assert logged[(tomorrow.date(), 'retrieval')] == 3
+
+    by_user = client.get('/api/logs/rollups', query_string={
+        'groupBy': 'user_id', 'actionType': 'retrieval', 'startDate': tomorrow.date().isoformat()
+    }).get_json()['rollups']
+    assert {row['user_id']: int(row['count']) for row in by_user} == {'x': 2, 'y': 1}
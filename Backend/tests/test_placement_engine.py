@@ -0,0 +1,142 @@
+"""
+The placement engine on its own: no requests and no database, so these run once
+rather than per backend.
+"""
+import itertools
+import random
+import time
+
+import pytest
+
+
+@pytest.fixture
+def backend():
+    return 'sqlite'
+
+
+def random_table(server, rng, containers=40, zones=3):
+    table = server.ContainerTable([
+        {
+            'containerId': f"c{n}", 'zone': f"Z{n % zones}",
+            'width': rng.randint(10, 60), 'depth': rng.randint(5, 30), 'height': rng.randint(5, 30)
+        }
+        for n in range(containers)
+    ])
+    # Part-filled containers, so the free slots are not just the containers' shapes
+    for row in range(containers):
+        used = rng.uniform(0, table.width[row])
+        table.occupy(row, used, used * table.depth[row] * table.height[row])
+    return table
+
+
+def random_items(rng, count, zones=3):
+    return [
+        {
+            'itemId': f"i{n}", 'name': f"Item {n}", 'width': rng.randint(1, 40), 'depth': rng.randint(1, 40),
+            'height': rng.randint(1, 40), 'priority': rng.randint(1, 100), 'preferredZone': f"Z{rng.randrange(zones)}"
+        }
+        for n in range(count)
+    ]
+
+
+def scalar_fits(table, record, row, rotate=True):
+    # One container at a time, orientation by orientation
+    free = (table.width[row] - table.cursor[row], table.depth[row], table.height[row])
+    dims = (record.width, record.depth, record.height)
+    orientations = itertools.permutations(dims) if rotate else [dims]
+    return any(all(size <= space + 1e-9 for size, space in zip(oriented, free)) for oriented in orientations)
+
+
+def test_vectorized_fit_matches_the_scalar_check(server):
+    rng = random.Random(7)
+    table = random_table(server, rng)
+    for item in random_items(rng, 300):
+        record = table.make_item(item)
+        for zone_id, rows in enumerate(table.by_zone):
+            fits = list(table.candidates(record.fit, zone_id))
+            assert fits == [scalar_fits(table, record, row) for row in rows]
+            # Everything the unrotated check accepted is still accepted
+            assert all(fit for fit, row in zip(fits, rows) if scalar_fits(table, record, row, rotate=False))
+
+
+def test_items_are_rotated_to_use_the_least_width(server):
+    table = server.ContainerTable([{'containerId': 'tall', 'zone': 'Z', 'width': 100, 'depth': 10, 'height': 30}])
+    upright = table.make_item({'itemId': 'a', 'name': 'A', 'width': 30, 'depth': 10, 'height': 10, 'priority': 1, 'preferredZone': 'Z'})
+    assert table.place(upright) == (0, 0.0, 10.0, 10.0, 30.0)
+    # Two 40 cm sides cannot both fit in the 10 x 30 cross-section, however it is turned
+    deep = table.make_item({'itemId': 'b', 'name': 'B', 'width': 5, 'depth': 40, 'height': 40, 'priority': 1, 'preferredZone': 'Z'})
+    assert table.place(deep) is None
+
+
+def test_capacity_index_queries_match_a_linear_scan(server):
+    rng = random.Random(3)
+    capacities = [rng.uniform(0, 100) for _ in range(5)]
+    index = server.CapacityIndex(capacities)
+    for step in range(500):
+        # Interleave growth past the tree's size with updates to random slots
+        if step % 10 == 0:
+            capacities.append(rng.uniform(0, 100))
+            assert index.append(capacities[-1]) == len(capacities) - 1
+        else:
+            slot = rng.randrange(len(capacities))
+            capacities[slot] = rng.choice([0.0, rng.uniform(0, 100)])
+            index.update(slot, capacities[slot])
+
+        need = rng.uniform(0, 110)
+        enough = [slot for slot, capacity in enumerate(capacities) if capacity >= need]
+        assert index.first_fit(need) == (enough[0] if enough else None)
+        best = index.best_fit(need)
+        if enough:
+            assert capacities[best] == min(capacities[slot] for slot in enough)
+        else:
+            assert best is None
+
+
+def score(solved):
+    # What improve_placement maximizes: placed priority, preferred-zone hits, placed volume
+    placed = [(record, slot) for record, slot in solved if slot is not None]
+    return (
+        sum(record.priority for record, slot in placed),
+        sum(1 for record, slot in placed if slot[5] == record.zone),
+        round(sum(record.volume for record, slot in placed), 6),
+    )
+
+
+def solve(server, seed, deadline=None, stop=None):
+    rng = random.Random(11)
+    table = random_table(server, rng, containers=12)
+    records = [table.make_item(item) for item in random_items(rng, 150)]
+    solved = server.solve_placement(table, records)
+    greedy = [(record, slot and slot + (table.zones[slot[0]],)) for record, slot in solved]
+    improved, iterations = server.improve_placement(
+        table, solved, deadline if deadline is not None else time.monotonic() + 60, seed, stop
+    )
+    improved = [(record, slot and slot + (table.zones[slot[0]],)) for record, slot in improved]
+    return greedy, improved, iterations
+
+
+def stop_after(iterations):
+    calls = itertools.count()
+    return lambda: next(calls) >= iterations
+
+
+def test_improvement_never_scores_below_greedy(server):
+    for seed in range(5):
+        greedy, improved, iterations = solve(server, seed, stop=stop_after(200))
+        assert iterations == 200
+        assert score(improved) >= score(greedy)
+        assert sorted(record.item_id for record, slot in improved) == sorted(record.item_id for record, slot in greedy)
+
+
+def test_improvement_is_reproducible_for_a_seed(server):
+    first = solve(server, 5, stop=stop_after(100))[1]
+    again = solve(server, 5, stop=stop_after(100))[1]
+    assert [(record.item_id, slot) for record, slot in first] == [(record.item_id, slot) for record, slot in again]
+
+
+def test_improvement_stops_at_the_deadline(server):
+    started = time.monotonic()
+    greedy, improved, iterations = solve(server, 1, deadline=started + 0.2)
+    elapsed = time.monotonic() - started
+    assert iterations > 0
+    assert 0.2 <= elapsed < 1.0
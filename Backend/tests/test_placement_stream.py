@@ -0,0 +1,74 @@
+import io
+import json
+
+from conftest import import_containers, import_items, item_row, latest_placements
+
+
+def stream(client, records):
+    body = "".join(json.dumps(record) + "\n" for record in records)
+    response = client.post('/api/placement/stream', data=body, content_type='application/x-ndjson')
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def item_record(item_id, size=10):
+    return {
+        'itemId': item_id, 'name': f"Item {item_id}", 'width': size, 'depth': size, 'height': size,
+        'priority': 50, 'preferredZone': 'Z'
+    }
+
+
+def test_stream_places_after_stored_items(server, client):
+    import_containers(client, ["c1,Z,50,10,10"])
+    import_items(client, [item_row(f"i{n}") for n in range(5)])
+    # Two items already sit in the container from a previous run
+    events = stream(client, [item_record('i0'), item_record('i1')])
+    assert events[-1]['type'] == 'done' and events[-1]['placed'] == 2
+
+    events = stream(client, [item_record('i2'), item_record('i3'), item_record('i4')])
+    assert events[-1]['placed'] == 3
+    starts = sorted(start['width'] for _, start, _ in latest_placements(server).values())
+    assert starts == [0, 10, 20, 30, 40]
+
+
+def test_stream_rejects_invalid_ndjson(client):
+    response = client.post('/api/placement/stream', data="{not json}\n", content_type='application/x-ndjson')
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+class CountingInput(io.BytesIO):
+    # Request body that remembers how far the server has read into it
+    def read(self, size=-1):
+        data = super().read(size)
+        self.furthest = self.tell()
+        return data
+
+    def readinto(self, buffer):
+        count = super().readinto(buffer)
+        self.furthest = self.tell()
+        return count
+
+
+def test_stream_reads_the_body_as_it_goes(load_server):
+    server = load_server(PLACEMENT_STREAM_CHUNK_SIZE=50)
+    client = server.app.test_client()
+    import_containers(client, ["c1,Z,1000,10,10"])
+    import_items(client, [item_row(f"i{n}") for n in range(2000)])
+    body = "".join(json.dumps(item_record(f"i{n}")) + "\n" for n in range(2000)).encode()
+    body_stream = CountingInput(body)
+    body_stream.furthest = 0
+
+    response = client.post(
+        '/api/placement/stream', input_stream=body_stream, content_length=len(body),
+        content_type='application/x-ndjson', buffered=False
+    )
+    output = iter(response.response)
+    first = json.loads(next(output).splitlines()[0])
+    assert first['type'] == 'placement'
+    # The first chunk went out after reading little more than its own 50 lines
+    assert body_stream.furthest < len(body) // 10
+
+    events = [first] + [json.loads(line) for data in output for line in data.splitlines()]
+    response.close()
+    assert events[-1] == {'type': 'done', 'success': True, 'processed': 2000, 'placed': 100, 'unplaced': 1900}
+    assert body_stream.furthest == len(body)
@@ -0,0 +1,87 @@
+import time
+
+import pytest
+
+
+@pytest.fixture
+def backend():
+    # calculate_placement and PlanCache touch no database
+    return 'sqlite'
+
+
+def manifest(count=20, zone='Z'):
+    containers = [{'containerId': f"c{n}", 'zone': 'Z', 'width': 100, 'depth': 10, 'height': 10} for n in range(3)]
+    items = [
+        {'itemId': f"i{n}", 'name': f"Item {n}", 'width': 10 + n % 3, 'depth': 10, 'height': 10, 'priority': 10 + n, 'preferredZone': zone}
+        for n in range(count)
+    ]
+    return containers, items
+
+
+def test_repeats_hit_and_get_their_own_lists(server):
+    containers, items = manifest()
+    placements, rearrangements, metrics = server.calculate_placement(containers, items)
+    assert metrics['cache'] == 'miss'
+
+    placements.clear()
+    rearrangements.append('changed by the caller')
+    again, again_unplaced, again_metrics = server.calculate_placement(containers, items)
+    assert again_metrics['cache'] == 'hit' and again_metrics['reusedItems'] == len(items)
+    assert len(again) == len(items) and 'changed by the caller' not in again_unplaced
+    assert server.calculate_placement(containers, items)[0] is not again
+
+
+def test_near_repeats_warm_start_and_new_containers_miss(server):
+    containers, items = manifest()
+    server.calculate_placement(containers, items)
+
+    changed = items[:-1] + [{**items[-1], 'itemId': 'new', 'name': 'New'}]
+    placements, rearrangements, metrics = server.calculate_placement(containers, changed)
+    assert metrics['cache'] == 'warm' and metrics['reusedItems'] == len(items) - 1
+    assert 'new' in {placement['itemId'] for placement in placements}
+
+    resized = [{**container, 'width': 200} for container in containers]
+    assert server.calculate_placement(resized, items)[2]['cache'] == 'miss'
+
+
+def test_deadline_runs_improve_even_on_a_hit(server):
+    containers, items = manifest(count=40)
+    assert server.calculate_placement(containers, items)[2]['iterations'] == 0
+
+    improved = server.calculate_placement(containers, items, time.monotonic() + 0.05, seed=1)[2]
+    assert improved['cache'] == 'hit' and improved['iterations'] > 0
+
+    # Nor does a plain repeat get the improved run's iterations back
+    plain = server.calculate_placement(containers, items)[2]
+    assert plain['cache'] == 'hit' and plain['iterations'] == 0
+
+
+def test_deadline_results_are_not_cached(server):
+    containers, items = manifest(count=40)
+    server.calculate_placement(containers, items, time.monotonic() + 0.05, seed=1)
+    plain = server.calculate_placement(containers, items)[2]
+    assert plain['cache'] == 'hit' and plain['iterations'] == 0
+
+
+def entry(key, containers='box', size=1):
+    return {'key': key, 'containers': containers, 'digests': frozenset([key]), 'layout': {}, 'result': ['x' * size]}
+
+
+def test_cache_evicts_least_recently_used_past_max_bytes(server):
+    one = len(server.json.dumps([['x' * 100], {}]))
+    cache = server.PlanCache(max_bytes=3 * one)
+    for key in 'abc':
+        cache.put(entry(key, size=100))
+    assert list(cache.entries) == ['a', 'b', 'c'] and cache.size == 3 * one
+
+    # Reading 'a' makes 'b' the oldest, so 'b' goes when 'd' arrives
+    assert cache.get('a') is not None
+    cache.put(entry('d', containers='other', size=100))
+    assert list(cache.entries) == ['c', 'a', 'd'] and cache.size == 3 * one
+    assert cache.by_containers == {'box': {'a', 'c'}, 'other': {'d'}}
+
+    # Storing a key again replaces it; a plan larger than the whole cache is not kept
+    cache.put(entry('c', size=100))
+    assert list(cache.entries) == ['a', 'd', 'c'] and cache.size == 3 * one
+    cache.put(entry('huge', size=4 * one))
+    assert 'huge' not in cache.entries and cache.size == 3 * one
@@ -0,0 +1,148 @@
+"""
+Every budgeted endpoint, run over a small and a larger station. The app runs
+with strict budgets under test, so going over a budget fails the request; the
+statement counts must also not grow with the number of items.
+"""
+import io
+import logging
+
+import pytest
+
+from conftest import item_row
+
+SIZES = (10, 60)
+
+
+def counted(response):
+    assert response.status_code in (200, 202), response.get_data(as_text=True)
+    assert response.get_json(silent=True) is None or response.get_json().get('success', True), response.get_json()
+    return int(response.headers['X-Query-Count'])
+
+
+def run_station(client, n):
+    # Items i0..i<n-1>: every fifth expired, every fifth (offset 1) with one use left,
+    # every fifth (offset 4) left unplaced; containers hold ten items each
+    containers = [f"c{k},Z,100,10,10" for k in range(n // 5)]
+    counts = {}
+    counts['import_containers'] = counted(client.post('/api/import/containers', data=csv_file(
+        "Container ID,Zone,Width (cm),Depth (cm),Height (cm)", containers + ["spare,Z,100,10,10", "dock,Dock,100,100,100"]
+    )))
+    counts['import_items'] = counted(client.post('/api/import/items', data=csv_file(
+        "Item ID,Name,Width (cm),Depth (cm),Height (cm),Mass (kg),Priority (1-100),Expiry Date (ISO Format),Usage Limit,Preferred Zone",
+        [
+            item_row(f"i{i}", priority=10 + i % 90, expiry='2020-01-01' if i % 5 == 0 else 'N/A', usage_limit=1 if i % 5 == 1 else 'N/A')
+            for i in range(n)
+        ]
+    )))
+    placed = [f"i{i}" for i in range(n) if i % 5 != 4]
+    counts['placement'] = counted(client.post('/api/placement', json={
+        'containers': [{'containerId': f"c{k}", 'zone': 'Z', 'width': 100, 'depth': 10, 'height': 10} for k in range(n // 5)],
+        'items': [
+            {'itemId': item_id, 'name': f"Item {item_id}", 'width': 10, 'depth': 10, 'height': 10, 'priority': 50, 'preferredZone': 'Z'}
+            for item_id in placed
+        ]
+    }))
+
+    for name, path in [
+        ('items', '/api/items'),
+        ('items_page', '/api/items?limit=5'),
+        ('containers', '/api/containers'),
+        ('containers_with_items', '/api/containers/with-items'),
+        ('unplaced', '/api/items/unplaced'),
+        ('logs', '/api/logs'),
+        ('log_rollups', '/api/logs/rollups'),
+        ('changes', '/api/changes?since=0'),
+        ('forecast', '/api/forecast'),
+        ('defrag_report', '/api/defrag'),
+        ('search', '/api/search?itemId=i2'),
+    ]:
+        counts[name] = counted(client.get(path))
+
+    counts['retrieve'] = counted(client.post('/api/retrieve', json={'itemId': 'i1', 'userId': 'tester'}))
+    counts['retrieval_plan'] = counted(client.post('/api/retrieve/plan', json={'itemIds': placed}))
+    counts['place'] = counted(client.post('/api/place', json={
+        'itemId': 'i4', 'userId': 'tester', 'containerId': 'spare',
+        'position': {'startCoordinates': {'width': 0, 'depth': 0, 'height': 0}, 'endCoordinates': {'width': 10, 'depth': 10, 'height': 10}}
+    }))
+    in_c0 = client.get('/api/containers/with-items').get_json()['containers']
+    counts['rearrange'] = counted(client.post('/api/rearrange', json={
+        'containerId': 'c0',
+        'items': next(container['items'] for container in in_c0 if container['container_id'] == 'c0')
+    }))
+    counts['rearrange_execute'] = counted(client.post('/api/rearrange/execute', json={'planId': 'plan'}))
+
+    counts['identify_waste'] = counted(client.get('/api/waste/identify'))
+    plan = client.post('/api/waste/return-plan', json={'undockingContainerId': 'dock', 'undockingDate': '2030-01-01', 'maxWeight': 10000})
+    counts['return_plan'] = counted(plan)
+    counts['complete_undocking'] = counted(client.post('/api/waste/complete-undocking', json={'planId': plan.get_json()['returnPlan']['planId']}))
+
+    counts['defrag_run'] = counted(client.post('/api/defrag/run', json={}))
+    counts['auto_place'] = counted(client.post('/api/placement/auto', json={}))
+    counts['simulate'] = counted(client.post('/api/simulate/day', json={
+        'numOfDays': 3, 'itemsToBeUsedPerDay': [{'itemId': item_id, 'uses': 1} for item_id in placed]
+    }))
+    counts['export'] = counted(client.get('/api/export/arrangement'))
+    counts['capacity_forecast'] = counted(client.post('/api/forecast/capacity', json={'days': 30, 'trajectories': 50, 'seed': 1}))
+    return counts
+
+
+def csv_file(header, rows):
+    return {'file': (io.BytesIO(("\n".join([header, *rows]) + "\n").encode()), 'upload.csv')}
+
+
+def test_budgeted_endpoints_stay_flat_as_the_station_grows(load_server, tmp_path, monkeypatch):
+    counts = []
+    for n in SIZES:
+        server = load_server()
+        # The arrangement export is written to the working directory and sent from the app root
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(server.app, 'root_path', str(tmp_path))
+        counts.append(run_station(server.app.test_client(), n))
+    assert counts[0] == counts[1]
+
+
+def test_every_budgeted_endpoint_is_covered(server):
+    budgeted = {
+        rule.endpoint for rule in server.app.url_map.iter_rules()
+        if hasattr(server.app.view_functions[rule.endpoint], 'query_budget')
+    }
+    assert budgeted == {
+        'placement_recommendations', 'search_item', 'retrieve_item', 'retrieval_plan', 'place_item',
+        'generate_rearrangement_plan', 'execute_rearrangement', 'defrag_report', 'defrag_run',
+        'auto_place', 'identify_waste', 'return_plan', 'complete_undocking', 'simulate_day',
+        'get_items', 'import_containers', 'import_items', 'export_arrangement', 'get_containers',
+        'get_containers_with_items', 'get_unplaced_items', 'get_logs', 'get_changes', 'get_forecast',
+        'get_log_rollups', 'capacity_forecast',
+    }
+
+
+def add_greedy_route(server):
+    # Two statements against a budget of one
+    @server.app.route('/test/greedy')
+    @server.query_budget(1)
+    def greedy():
+        conn = server.get_db_connection()
+        cur = conn.cursor()
+        cur.execute("SELECT 1")
+        cur.execute("SELECT 2")
+        cur.close()
+        conn.close()
+        return server.jsonify({"success": True})
+
+
+def test_strict_mode_fails_an_endpoint_over_budget(server):
+    add_greedy_route(server)
+    with pytest.raises(server.QueryBudgetExceeded, match="ran 2 statements, budget is 1"):
+        server.app.test_client().get('/test/greedy')
+
+
+def test_warn_mode_logs_an_endpoint_over_budget(load_server, caplog):
+    server = load_server(QUERY_BUDGET_MODE='warn')
+    server.app.testing = False
+    add_greedy_route(server)
+    with caplog.at_level(logging.WARNING, logger=server.app.logger.name):
+        response = server.app.test_client().get('/test/greedy')
+    assert response.status_code == 200 and response.headers['X-Query-Count'] == '2'
+    assert [record.getMessage() for record in caplog.records] == [
+        "Query budget exceeded: greedy ran 2 statements, budget is 1"
+    ]
@@ -0,0 +1,32 @@
+import json
+
+import pytest
+
+from conftest import import_containers, import_items, item_row
+
+
+def test_read_model_picks_the_latest_placement_row(backend, server, client):
+    if backend != 'postgres':
+        pytest.skip("the read model mirrors Postgres only")
+    import_containers(client, ["a,Z,100,10,10", "b,Z,100,10,10"])
+    import_items(client, [item_row('moved')])
+
+    # Both rows share placed_at (one transaction); the later row is the live one
+    conn = server.get_db_connection()
+    cur = conn.cursor(cursor_factory=server.RealDictCursor)
+    for container_id in ('a', 'b'):
+        cur.execute(
+            "INSERT INTO placements (item_id, container_id, start_coordinates, end_coordinates) VALUES (%s, %s, %s, %s)",
+            ('moved', container_id, json.dumps({'width': 0, 'depth': 0, 'height': 0}), json.dumps({'width': 10, 'depth': 10, 'height': 10}))
+        )
+    conn.commit()
+
+    model = server.ReadModel()
+    model._load(cur)
+    assert model.placements['moved']['container_id'] == 'b'
+
+    model.placements = {}
+    model._refresh(cur, {'items': set(), 'containers': set(), 'placements': {'moved'}})
+    assert model.placements['moved']['container_id'] == 'b'
+    cur.close()
+    conn.close()
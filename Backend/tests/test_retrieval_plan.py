@@ -0,0 +1,51 @@
+from conftest import import_containers, import_items, item_row
+
+
+def place_at(client, item_id, container_id, width, depth, size=10):
+    # /api/place a size^3 item at the given width and depth from the open face
+    return client.post('/api/place', json={
+        'itemId': item_id,
+        'userId': 'tester',
+        'containerId': container_id,
+        'position': {
+            'startCoordinates': {'width': width, 'depth': depth, 'height': 0},
+            'endCoordinates': {'width': width + size, 'depth': depth + size, 'height': size}
+        }
+    }).get_json()
+
+
+def test_plan_groups_steps_per_container(client):
+    import_containers(client, ["c1,A,100,30,10", "c2,B,100,30,10"])
+    import_items(client, [item_row(item_id) for item_id in ['deep', 'front', 'side', 'x', 'y', 'unplaced']])
+    # 'front' blocks 'deep' in c1; 'x' blocks 'y' in c2 but both are wanted
+    for item_id, container_id, width, depth in [
+        ('deep', 'c1', 0, 10), ('front', 'c1', 0, 0), ('side', 'c1', 20, 0),
+        ('x', 'c2', 0, 0), ('y', 'c2', 0, 10),
+    ]:
+        assert place_at(client, item_id, container_id, width, depth)['success']
+
+    plan = client.post('/api/retrieve/plan', json={
+        'itemIds': ['deep', 'y', 'x', 'missing', 'unplaced', 'deep']
+    }).get_json()
+    assert plan['success']
+    assert plan['containers'] == [
+        {'containerId': 'c1', 'zone': 'A', 'itemIds': ['deep'], 'blockersMoved': 1},
+        {'containerId': 'c2', 'zone': 'B', 'itemIds': ['x', 'y'], 'blockersMoved': 0},
+    ]
+    assert [(step['step'], step['action'], step['itemId'], step['containerId']) for step in plan['retrievalSteps']] == [
+        (1, 'remove', 'front', 'c1'),
+        (2, 'retrieve', 'deep', 'c1'),
+        (3, 'placeBack', 'front', 'c1'),
+        (4, 'retrieve', 'x', 'c2'),
+        (5, 'retrieve', 'y', 'c2'),
+    ]
+    assert plan['totalSteps'] == 5 and plan['retrievalSteps'][1]['itemName'] == 'Item deep'
+    # Fetched one at a time, 'y' would also need 'x' moved out of the way
+    assert plan['blockersMoved'] == 1 and plan['blockersMovedSeparately'] == 2
+    assert plan['notFound'] == ['missing', 'unplaced']
+
+
+def test_plan_for_nothing_placed(client):
+    plan = client.post('/api/retrieve/plan', json={'itemIds': ['missing']}).get_json()
+    assert plan['success'] and plan['containers'] == [] and plan['retrievalSteps'] == []
+    assert plan['totalSteps'] == 0 and plan['notFound'] == ['missing']
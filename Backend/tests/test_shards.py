@@ -0,0 +1,90 @@
+from datetime import datetime
+
+import pytest
+
+from conftest import import_containers, import_items, item_row
+
+LAB = {'X-Module': 'lab'}
+
+
+@pytest.fixture
+def sharded(load_server, database):
+    return load_server(shards={'habitat': database(), 'lab': database('b')})
+
+
+def item_ids(response):
+    return [item['item_id'] for item in response.get_json()['items']]
+
+
+def test_modules_keep_their_own_rows(sharded):
+    client = sharded.app.test_client()
+    import_containers(client, ["l1,Z,100,10,10"], headers=LAB)
+    import_items(client, [item_row('tool')])
+    import_items(client, [item_row('sample'), item_row('probe')], headers=LAB)
+
+    assert item_ids(client.get('/api/items')) == ['tool']
+    assert item_ids(client.get('/api/items', headers=LAB)) == ['probe', 'sample']
+    assert item_ids(client.get('/api/items?module=lab')) == ['probe', 'sample']
+    assert [container['container_id'] for container in client.get('/api/containers', headers=LAB).get_json()['containers']] == ['l1']
+
+    modules = client.get('/api/modules').get_json()
+    assert modules['default'] == 'habitat'
+    assert {module['module']: module['items'] for module in modules['modules']} == {'habitat': 1, 'lab': 2}
+
+    assert [log['details'] for log in client.get('/api/logs').get_json()['logs']] == ['Items imported']
+    assert len(client.get('/api/logs', headers=LAB).get_json()['logs']) == 2
+    assert client.get('/api/items?module=nowhere').status_code == 404
+    assert client.get('/api/items?module=all').status_code == 400
+
+
+def test_search_across_modules(sharded):
+    client = sharded.app.test_client()
+    import_containers(client, ["l1,Z,100,10,10"], headers=LAB)
+    import_items(client, [item_row('sample')], headers=LAB)
+    assert client.post('/api/placement', headers=LAB, json={
+        'containers': [{'containerId': 'l1', 'zone': 'Z', 'width': 100, 'depth': 10, 'height': 10}],
+        'items': [{'itemId': 'sample', 'name': 'Item sample', 'width': 10, 'depth': 10, 'height': 10, 'priority': 50, 'preferredZone': 'Z'}]
+    }).get_json()['success']
+
+    assert client.get('/api/search?itemId=sample').get_json()['found'] is False
+    found = client.get('/api/search?itemId=sample&module=all').get_json()
+    assert found['found'] and found['module'] == 'lab'
+    assert found['placement']['container_id'] == 'l1'
+
+
+def test_overflow_moves_items_to_another_module(sharded):
+    client = sharded.app.test_client()
+    import_containers(client, ["h1,Z,10,10,10"])
+    import_containers(client, ["l1,Z,100,10,10"], headers=LAB)
+    import_items(client, [item_row('first', priority=90), item_row('second', priority=10)])
+
+    placed = client.post('/api/placement', json={
+        'overflow': True,
+        'containers': [{'containerId': 'h1', 'zone': 'Z', 'width': 10, 'depth': 10, 'height': 10}],
+        'items': [
+            {'itemId': item_id, 'name': f"Item {item_id}", 'width': 10, 'depth': 10, 'height': 10, 'priority': priority, 'preferredZone': 'Z'}
+            for item_id, priority in [('first', 90), ('second', 10)]
+        ]
+    }).get_json()
+    assert placed['success']
+    assert {placement['itemId']: placement.get('module') for placement in placed['placements']} == {'first': None, 'second': 'lab'}
+    assert item_ids(client.get('/api/items')) == ['first']
+    assert item_ids(client.get('/api/items', headers=LAB)) == ['second']
+
+
+def test_log_partitions_are_kept_per_module(backend, sharded):
+    if backend != 'postgres':
+        pytest.skip("sqlite logs are not partitioned")
+    client = sharded.app.test_client()
+    import_items(client, [item_row('tool')])
+    import_items(client, [item_row('sample')], headers=LAB)
+
+    month = datetime.now().date().replace(day=1)
+    assert sharded._log_partition_months == {'habitat': month, 'lab': month}
+    for shard in ('habitat', 'lab'):
+        conn = sharded.get_db_connection(shard)
+        cur = conn.cursor()
+        cur.execute("SELECT to_regclass(%s) IS NOT NULL", (f"logs_{month:%Y_%m}",))
+        assert cur.fetchone()[0], shard
+        cur.close()
+        conn.close()
@@ -0,0 +1,51 @@
+from conftest import import_items, item_row
+
+
+def inventory(server):
+    conn = server.get_db_connection()
+    cur = conn.cursor(cursor_factory=server.RealDictCursor)
+    cur.execute("SELECT item_id, usage_limit, is_waste FROM items ORDER BY item_id")
+    items = [dict(row) for row in cur.fetchall()]
+    cur.execute("SELECT COUNT(*) AS count FROM waste")
+    waste = cur.fetchone()['count']
+    cur.close()
+    conn.close()
+    return items, waste
+
+
+def test_dry_run_scenarios_leave_the_database_alone(server, client):
+    import_items(client, [
+        item_row('tool', usage_limit=3),
+        item_row('food', expiry='2020-01-01'),
+        item_row('kit', usage_limit=10),
+    ])
+    before = inventory(server)
+
+    try:
+        simulated = client.post('/api/simulate/day', json={
+            'dryRun': True,
+            'scenarios': [
+                {'name': 'light', 'numOfDays': 2, 'itemsToBeUsedPerDay': [{'itemId': 'tool', 'uses': 1}]},
+                {'name': 'heavy', 'numOfDays': 2, 'itemsToBeUsedPerDay': [{'itemId': 'tool', 'uses': 2}, {'itemId': 'kit'}]},
+                {'name': 'idle', 'numOfDays': 1},
+            ]
+        }).get_json()
+    finally:
+        server.shutdown_scenario_pool()
+
+    assert simulated['success'] and simulated['dryRun']
+    light, heavy, idle = simulated['scenarios']
+    assert [scenario['scenario'] for scenario in (light, heavy, idle)] == ['light', 'heavy', 'idle']
+    assert [scenario['daysSimulated'] for scenario in (light, heavy, idle)] == [2, 2, 1]
+
+    assert [use['remainingUses'] for use in light['changes']['itemsUsed']] == [2, 1]
+    assert light['changes']['itemsDepletedToday'] == []
+    assert [(use['itemId'], use['remainingUses']) for use in heavy['changes']['itemsUsed']] == [
+        ('tool', 1), ('kit', 9), ('tool', 0), ('kit', 8)
+    ]
+    assert [(event['day'], event['itemId']) for event in heavy['changes']['itemsDepletedToday']] == [(2, 'tool')]
+    for scenario in (light, heavy, idle):
+        assert scenario['changes']['itemsExpired'] == [{'day': 1, 'count': 1}]
+
+    assert inventory(server) == before
+    assert server._scenario_pool is None
@@ -0,0 +1,43 @@
+import json
+
+from conftest import import_containers, import_items, item_row
+
+
+def container_volumes(server):
+    conn = server.get_db_connection()
+    cur = conn.cursor(cursor_factory=server.RealDictCursor)
+    cur.execute("SELECT container_id, available_volume FROM containers")
+    volumes = {row['container_id']: float(row['available_volume']) for row in cur.fetchall()}
+    cur.close()
+    conn.close()
+    return volumes
+
+
+def test_undocking_refunds_only_the_latest_placement(server, client):
+    import_containers(client, ["a,Z,100,10,10", "b,Z,100,10,10", "u,Z,100,100,100"])
+    import_items(client, [item_row('old', expiry='2020-01-01'), item_row('keep')])
+
+    # 'old' was first stored in a, then moved to b; a now holds 'keep'
+    conn = server.get_db_connection()
+    cur = conn.cursor()
+    for item_id, container_id in [('old', 'a'), ('old', 'b'), ('keep', 'a')]:
+        cur.execute(
+            "INSERT INTO placements (item_id, container_id, start_coordinates, end_coordinates) VALUES (%s, %s, %s, %s)",
+            (item_id, container_id, json.dumps({'width': 0, 'depth': 0, 'height': 0}), json.dumps({'width': 10, 'depth': 10, 'height': 10}))
+        )
+    cur.execute("UPDATE containers SET available_volume = 9000 WHERE container_id IN ('a', 'b')")
+    conn.commit()
+    cur.close()
+    conn.close()
+
+    assert client.get('/api/waste/identify').get_json()['success']
+    plan = client.post('/api/waste/return-plan', json={
+        'undockingContainerId': 'u', 'undockingDate': '2030-01-01', 'maxWeight': 100
+    }).get_json()
+    assert plan['success']
+    undocked = client.post('/api/waste/complete-undocking', json={'planId': plan['returnPlan']['planId']}).get_json()
+    assert undocked['success'] and undocked['itemsRemoved'] == 1
+
+    volumes = container_volumes(server)
+    assert volumes['a'] == 9000
+    assert volumes['b'] == 10000
@@ -74,4 +74,41 @@ export const api = {
     fetch(`${API_BASE}/logs?${new URLSearchParams(params)}`).then((res) =>
       res.json()
     ),
+
+  // Change feed: load a listing once, then apply deltas from its `version`
+  getChanges: (since) =>
+    fetch(`${API_BASE}/changes?${new URLSearchParams({ since })}`).then((res) =>
+      res.json()
+    ),
+
+  subscribeChanges: (since, onChanges) => {
+    const source = new EventSource(
+      `${API_BASE}/changes/stream?${new URLSearchParams({ since })}`
+    );
+    source.addEventListener("changes", (event) =>
+      onChanges(JSON.parse(event.data))
+    );
+    return () => source.close();
+  },
+
+  // Background jobs: pass `async: true` to placement or simulateDay for a jobId
+  getJob: (jobId) =>
+    fetch(`${API_BASE}/jobs/${jobId}`).then((res) => res.json()),
+
+  cancelJob: (jobId) =>
+    fetch(`${API_BASE}/jobs/${jobId}`, { method: "DELETE" }).then((res) =>
+      res.json()
+    ),
+
+  subscribeJob: (jobId, onProgress, onDone) => {
+    const source = new EventSource(`${API_BASE}/jobs/${jobId}/stream`);
+    source.addEventListener("progress", (event) =>
+      onProgress(JSON.parse(event.data))
+    );
+    source.addEventListener("done", (event) => {
+      source.close();
+      onDone(JSON.parse(event.data));
+    });
+    return () => source.close();
+  },
 };